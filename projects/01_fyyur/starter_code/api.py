@@ -0,0 +1,130 @@
+import json
+from datetime import date
+
+from flask import Blueprint, Response, current_app, request
+
+from paging import KeysetPage, decode_cursor, keyset
+
+try:
+  import orjson
+except ImportError:
+  orjson = None
+
+#----------------------------------------------------------------------------#
+# JSON API.
+#----------------------------------------------------------------------------#
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+def isoformat(value):
+  if isinstance(value, date):
+    return value.isoformat()
+  raise TypeError('%r is not JSON serializable' % (value,))
+
+def dumps(value):
+  # orjson writes datetimes itself, in the same ISO 8601 form, several times
+  # faster than the json module
+  if orjson is not None:
+    return orjson.dumps(value)
+  return json.dumps(value, default=isoformat, separators=(',', ':')).encode('utf-8')
+
+def json_response(value, status=200):
+  return Response(dumps(value), status=status, mimetype='application/json')
+
+def error(status, message):
+  return json_response({'error': status, 'message': message}, status)
+
+
+class Resource(object):
+  '''
+  A model listed under /api/v1/<name>. fields maps public field names to
+  columns, of which ?fields= selects a subset; query(columns, args) builds the
+  query for them from any filters in the request args. The listing is paged
+  by the `key` fields, whose cursor values are parsed with cursor_types.
+  related maps fields that are not columns to a loader taking the ids of a
+  page and returning {id: value}.
+  '''
+  def __init__(self, query, fields, default_fields, key=('id',), cursor_types=(int,), related=None):
+    self.query = query
+    self.fields = fields
+    self.default_fields = default_fields
+    self.key = key
+    self.cursor_types = cursor_types
+    self.related = related or {}
+
+  def field_names(self, fields=None):
+    if not fields:
+      return list(self.default_fields)
+    names = [name.strip() for name in fields.split(',') if name.strip()]
+    unknown = [name for name in names if name not in self.fields and name not in self.related]
+    if unknown:
+      raise ValueError('unknown fields: %s' % ', '.join(unknown))
+    return names
+
+  def columns(self, names):
+    # the key (and id, for related fields) is always read, whether or not
+    # it is returned
+    selected = [name for name in names if name in self.fields]
+    for name in tuple(self.key) + ('id',):
+      if name not in selected:
+        selected.append(name)
+    return [self.fields[name].label(name) for name in selected]
+
+  def format(self, rows, names):
+    ids = [row.id for row in rows]
+    related = dict((name, self.related[name](ids)) for name in names if name in self.related)
+    return [dict((name, related[name][row.id] if name in related else getattr(row, name))
+      for name in names) for row in rows]
+
+
+def resource_for(name):
+  return current_app.extensions['api'].get(name)
+
+@api.route('/<name>')
+def index(name):
+  #   ?fields=id,name        only these fields, read from only these columns
+  #   ?after=<cursor>&limit= the page following a previous one
+  resource = resource_for(name)
+  if resource is None:
+    return error(404, 'no such resource')
+  try:
+    names = resource.field_names(request.args.get('fields'))
+    after = request.args.get('after')
+    after = decode_cursor(after, resource.cursor_types) if after else None
+    query = resource.query(resource.columns(names), request.args)
+  except ValueError as e:
+    return error(400, str(e))
+
+  size = current_app.config['API_PAGE_SIZE']
+  size = min(request.args.get('limit', type=int) or size, size)
+  key = [resource.fields[name] for name in resource.key]
+  page = KeysetPage(keyset(query, key, after), size, lambda row: row,
+    key=lambda row: tuple(getattr(row, name) for name in resource.key))
+  rows = list(page)
+
+  return json_response({
+    'data': resource.format(rows, names),
+    'next': page.next_cursor
+  })
+
+@api.route('/<name>/<int:id>')
+def detail(name, id):
+  resource = resource_for(name)
+  if resource is None:
+    return error(404, 'no such resource')
+  try:
+    names = resource.field_names(request.args.get('fields'))
+  except ValueError as e:
+    return error(400, str(e))
+
+  row = resource.query(resource.columns(names), {})\
+    .filter(resource.fields['id'] == id).first()
+  if row is None:
+    return error(404, 'no such %s' % name.rstrip('s'))
+  return json_response({'data': resource.format([row], names)[0]})
+
+
+def init_api(app, resources):
+  '''Serves resources ({name: Resource}) as JSON under /api/v1.'''
+  app.extensions['api'] = resources
+  app.register_blueprint(api)
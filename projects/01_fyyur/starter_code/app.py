@@ -2,487 +2,94 @@
 # Imports
 #----------------------------------------------------------------------------#
 
-import json
-import dateutil.parser
-import babel
-from flask import Flask, render_template, request, Response, flash, redirect, url_for
-from flask_migrate import Migrate
-from flask_sqlalchemy import SQLAlchemy, functools
-from sqlalchemy.dialects.postgresql import array_agg
-from sqlalchemy import or_
-import logging
-from logging import Formatter, FileHandler
-from flask_wtf import Form
-from forms import *
-import sys 
+from datetime import datetime
+from flask import Flask, render_template
+from models import db, Venue, Artist, VENUE_FIELDS, ARTIST_FIELDS, SHOW_FIELDS, \
+  entity_query, init_caches, load_genre_names, show_query, show_window
+from views import main
+from commands import commands
+from filters import format_datetime
+from logs import setup_logging
+from sqlstats import init_sqlstats
+from pool import engine_options, init_pool
+from routing import init_routing
+from api import Resource, init_api
+from assets import init_assets
 
 #----------------------------------------------------------------------------#
 # App Config.
 #----------------------------------------------------------------------------#
 
-app = Flask(__name__)
-app.config.from_object('config')
-db = SQLAlchemy(app)
-
-# TODO: connect to a local postgresql database
-migrate = Migrate(app,db)
-
-#----------------------------------------------------------------------------#
-# Models.
-#----------------------------------------------------------------------------#
-class Venue(db.Model):
-    __tablename__ = 'Venue'
-
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String)
-    city = db.Column(db.String(120))
-    state = db.Column(db.String(120))
-    address = db.Column(db.String(120))
-    phone = db.Column(db.String(120))
-    image_link = db.Column(db.String(500))
-    facebook_link = db.Column(db.String(120))
-
-    # TODO: implement any missing fields, as a database migration using Flask-Migrate
-    genres = db.Column(db.ARRAY(db.String))
-    site_link = db.Column(db.String(120))
-    seeking_talent = db.Column(db.String, nullable=True)
-    seeking_description = db.Column(db.String, nullable=True)
-
-    # Shows Relationship
-    shows = db.relationship('Show', backref='venue')
-
-class Artist(db.Model):
-    __tablename__ = 'Artist'
-
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String)
-    city = db.Column(db.String(120))
-    state = db.Column(db.String(120))
-    phone = db.Column(db.String(120))
-    genres = db.Column(db.ARRAY(db.String))
-    image_link = db.Column(db.String(500))
-    facebook_link = db.Column(db.String(120))
-
-    # TODO: implement any missing fields, as a database migration using Flask-Migrate
-    site_link = db.Column(db.String(120), nullable=True)
-    seeking_venue = db.Column(db.Boolean, default=False)
-    seeking_description = db.Column(db.String)
-    
-    # Shows one-to-many relationship
-    shows = db.relationship('Show', backref='artist')
-
-# TODO Implement Show and Artist models, and complete all model relationships and properties, as a database migration.
-class Show(db.Model):
-  __tablename__ = 'Show'
-
-  id = db.Column(db.Integer, primary_key=True)
-  artist_id = db.Column(db.Integer, db.ForeignKey(Artist.id))
-  venue_id = db.Column(db.Integer, db.ForeignKey(Venue.id))
-  start_time = db.Column(db.DateTime, nullable=False)
-
-
-#----------------------------------------------------------------------------#
-# Filters.
-#----------------------------------------------------------------------------#
-
-def format_datetime(value, format='medium'):
-  date = dateutil.parser.parse(value)
-  if format == 'full':
-      format="EEEE MMMM, d, y 'at' h:mma"
-  elif format == 'medium':
-      format="EE MM, dd, y h:mma"
-  return babel.dates.format_datetime(date, format)
-
-app.jinja_env.filters['datetime'] = format_datetime
-
-#----------------------------------------------------------------------------#
-# Controllers.
-#----------------------------------------------------------------------------#
-
-@app.route('/')
-def index():
-  return render_template('pages/home.html')
-
-
-#  Venues
-#  ----------------------------------------------------------------
-
-@app.route('/venues')
-def venues():
-  # TODO: replace with real venues data.
-  #       num_shows should be aggregated based on number of upcoming shows per venue.  
-  areas = []
-  venues_agg = array_agg(Venue.id).label('venues')
-  areas_data = db.session.query(
-    Venue.city,
-    Venue.state,
-    venues_agg
-  ).group_by(Venue.city, Venue.state).all()
-
-  for (city, state, venue_ids) in areas_data:
-    area_venues = []
-    for vid in venue_ids:
-      v = {}
-      v['name'] = Venue.query.get(vid).name
-      v['id'] = vid
-      area_venues.append(v)
-
-    area = {}
-    area['city'] = city
-    area['state'] = state
-    area['venues'] = area_venues
-
-    areas.append(area)
-
-  return render_template('pages/venues.html', areas=areas)
-
-@app.route('/venues/search', methods=['POST'])
-def search_venues():
-  # TODO: implement search on venues with partial string search. Ensure it is case-insensitive.
-  # seach for "A" should return "Guns N Petals", "Matt Quevado", and "The Wild Sax Band".
-  # search for "band" should return "The Wild Sax Band".
-  
-  search_term = request.form.get('search_term', '')
-  results = Venue.query.filter(\
-    Venue.name.ilike('%' + search_term + '%')
-  ).all()
-  
-  response ={
-    "count": len(results),
-    "data": [{"id": a.id, "name": a.name} for a in results]
+class DeferredMigrate(object):
+  '''
+  Stands in for Flask-Migrate in app.extensions until a `flask db` command
+  first reads it, so a worker never imports it or alembic, the slowest part
+  of booting the app.
+  '''
+  def __init__(self, app, db):
+    self.app = app
+    self.db = db
+
+  def __getattr__(self, name):
+    from flask_migrate import Migrate
+    Migrate(self.app, self.db)
+    return getattr(self.app.extensions['migrate'], name)
+
+def api_resources():
+  return {
+    'venues': Resource(
+      lambda columns, args: entity_query(Venue, columns, args.get('genre') or None),
+      VENUE_FIELDS, ('id', 'name', 'city', 'state'),
+      related={'genres': lambda ids: load_genre_names(Venue, ids)}
+    ),
+    'artists': Resource(
+      lambda columns, args: entity_query(Artist, columns, args.get('genre') or None),
+      ARTIST_FIELDS, ('id', 'name', 'city', 'state'),
+      related={'genres': lambda ids: load_genre_names(Artist, ids)}
+    ),
+    'shows': Resource(
+      lambda columns, args: show_query(columns, *show_window(args)),
+      SHOW_FIELDS, ('id', 'start_time', 'artist_id', 'artist_name', 'venue_id', 'venue_name'),
+      key=('start_time', 'id'), cursor_types=(datetime.fromisoformat, int)
+    ),
   }
-  return render_template('pages/search_venues.html', results=response, search_term=search_term)
-
-@app.route('/venues/<int:venue_id>', methods=['GET'])
-def show_venue(venue_id):
-  # shows venue detail
-  data = {}
-  venue = Venue.query.get(venue_id)
-  g = ""
-
-  data = {
-    "id": venue.id,
-    "name": venue.name,
-    "genres": g.join(venue.genres)[1:-1].split(','),
-    "city": venue.city,
-    "state": venue.state,
-    "phone": venue.phone,
-    "website": venue.site_link,
-    "facebook_link": venue.facebook_link,
-    "seeking_talent": venue.seeking_talent,
-    "seeking_description": venue.seeking_description,
-    "image_link": venue.image_link,
-    "upcoming_shows_count": 0,
-    "upcoming_shows": [],
-    "past_shows_count": 0,
-    "past_shows": []
-  }
-
-  return render_template('pages/show_venue.html', venue=data)
-
-#  Create Venue
-#  ----------------------------------------------------------------
-@app.route('/venues/create', methods=['GET'])
-def create_venue_form():
-  form = VenueForm()
-  return render_template('forms/new_venue.html', form=form)
-
-@app.route('/venues/create', methods=['POST'])
-def create_venue_submission():
-  # TODO: insert form data as a new Venue record in the db, instead
-  error = False
-  body = {}
-
-  try:
-    data = request.form
-
-    venue = Venue(
-      name=data['name'],
-      city=data['city'],
-      state=data['state'],
-      address=data['address'],
-      phone=data['phone'],
-      genres=request.form.getlist('genres'),
-      facebook_link=data['facebook_link'],
-      image_link=data['image_link'],
-      seeking_talent=data['seeking_talent'],
-      seeking_description=data['seeking_description'],
-      site_link=data['site_link']
-    )
-
-    db.session.add(venue)
-    db.session.commit()
-  except: 
-    error = True
-    db.session.rollback()
-    print(sys.exc_info())
-  finally:
-    db.session.close()
 
-  # TODO: modify data to be the data object returned from db insertion
-  body = { 'success': not error }
-
-  # on successful db insert, flash success
-  # TODO: on unsuccessful db insert, flash an error instead.
-  # e.g., flash('An error occurred. Venue ' + data.name + ' could not be listed.')
-  # see: http://flask.pocoo.org/docs/1.0/patterns/flashing/
-  if error:
-    flash('an error occured creating venue ' + data['name'])
-  else:
-    flash('Venue ' + request.form['name'] + ' was successfully listed!')
-  return render_template('pages/home.html', data=body)
-
-@app.route('/venues/<venue_id>', methods=['DELETE'])
-def delete_venue(venue_id):
-  # TODO: Complete this endpoint for taking a venue_id, and using
-  # SQLAlchemy ORM to delete a record. Handle cases where the session commit could fail.
-
-  # BONUS CHALLENGE: Implement a button to delete a Venue on a Venue Page, have it so that
-  # clicking that button delete it from the db then redirect the user to the homepage
-  return None
-
-#  Artists
-#  ----------------------------------------------------------------
-@app.route('/artists')
-def artists():
-  # TODO: replace with real data returned from querying the database
-  data = Artist.query.order_by('name').all()
-
-  return render_template('pages/artists.html', artists=data)
-
-@app.route('/artists/search', methods=['POST'])
-def search_artists():
-  # TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
-  # seach for "A" should return "Guns N Petals", "Matt Quevado", and "The Wild Sax Band".
-  # search for "band" should return "The Wild Sax Band".
-  search_term = request.form.get('search_term', '')
-  results = Artist.query.filter(\
-    Artist.name.ilike('%' + search_term + '%')
-  ).all()
-
-  response ={
-    "count": len(results),
-    "data": [{"id": a.id, "name": a.name} for a in results]
-  }
-  return render_template('pages/search_artists.html', results=response, search_term=search_term)
-
-@app.route('/artists/<int:artist_id>')
-def show_artist(artist_id):
-  # shows the venue page with the given venue_id
-  # TODO: replace with real venue data from the venues table, using venue_id
-  data = {}
-  artist = Artist.query.get(artist_id)
-  g = ""
-
-  data = {
-    "id": artist.id,
-    "name": artist.name,
-    "genres": g.join(artist.genres)[1:-1].split(','),
-    "city": artist.city,
-    "state": artist.state,
-    "phone": artist.phone,
-    "website": artist.site_link,
-    "facebook_link": artist.facebook_link,
-    "seeking_venue": artist.seeking_venue,
-    "seeking_description": artist.seeking_description,
-    "image_link": artist.image_link,
-    "past_shows": [],
-    "upcoming_shows": [],
-    "past_shows_count": 0,
-    "upcoming_shows_count": 0
-  }  
-  return render_template('pages/show_artist.html', artist=data)
-
-#  Update
-#  ----------------------------------------------------------------
-@app.route('/artists/<int:artist_id>/edit', methods=['GET'])
-def edit_artist(artist_id):
-  form = ArtistForm()
-  artist={
-    "id": 4,
-    "name": "Guns N Petals",
-    "genres": ["Rock n Roll"],
-    "city": "San Francisco",
-    "state": "CA",
-    "phone": "326-123-5000",
-    "website": "https://www.gunsnpetalsband.com",
-    "facebook_link": "https://www.facebook.com/GunsNPetals",
-    "seeking_venue": True,
-    "seeking_description": "Looking for shows to perform at in the San Francisco Bay Area!",
-    "image_link": "https://images.unsplash.com/photo-1549213783-8284d0336c4f?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=300&q=80"
-  }
-  # TODO: populate form with fields from artist with ID <artist_id>
-  return render_template('forms/edit_artist.html', form=form, artist=artist)
-
-@app.route('/artists/<int:artist_id>/edit', methods=['POST'])
-def edit_artist_submission(artist_id):
-  # TODO: take values from the form submitted, and update existing
-  # artist record with ID <artist_id> using the new attributes
-
-  return redirect(url_for('show_artist', artist_id=artist_id))
-
-@app.route('/venues/<int:venue_id>/edit', methods=['GET'])
-def edit_venue(venue_id):
-  form = VenueForm()
-  venue={
-    "id": 1,
-    "name": "The Musical Hop",
-    "genres": ["Jazz", "Reggae", "Swing", "Classical", "Folk"],
-    "address": "1015 Folsom Street",
-    "city": "San Francisco",
-    "state": "CA",
-    "phone": "123-123-1234",
-    "website": "https://www.themusicalhop.com",
-    "facebook_link": "https://www.facebook.com/TheMusicalHop",
-    "seeking_talent": True,
-    "seeking_description": "We are on the lookout for a local artist to play every two weeks. Please call us.",
-    "image_link": "https://images.unsplash.com/photo-1543900694-133f37abaaa5?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=400&q=60"
-  }
-  # TODO: populate form with values from venue with ID <venue_id>
-  return render_template('forms/edit_venue.html', form=form, venue=venue)
-
-@app.route('/venues/<int:venue_id>/edit', methods=['POST'])
-def edit_venue_submission(venue_id):
-  # TODO: take values from the form submitted, and update existing
-  # venue record with ID <venue_id> using the new attributes
-  return redirect(url_for('show_venue', venue_id=venue_id))
-
-#  Create Artist
-#  ----------------------------------------------------------------
-
-@app.route('/artists/create', methods=['GET'])
-def create_artist_form():
-  form = ArtistForm()
-  return render_template('forms/new_artist.html', form=form)
-
-@app.route('/artists/create', methods=['POST'])
-def create_artist_submission():
-  # called upon submitting the new artist listing form
-  # TODO: insert form data as a new Venue record in the db, instead
-  # TODO: modify data to be the data object returned from db insertion
-  error = False
-  body = {}
-
-  try:
-    artist=Artist(
-      name=request.form['name'],
-      city=request.form['city'],
-      state=request.form['state'],
-      phone=request.form['phone'],
-      genres=request.form.getlist('genres'),
-      image_link=request.form['image_link'],
-      facebook_link = request.form['facebook_link'],
-      site_link = request.form['site_link']
-    )
-    db.session.add(artist)
-    db.session.commit()
-  except:
-    error = True 
-    db.session.rollback()
-    print(sys.exc_info())
-  finally:
-    db.session.close()
-
-  body = { 'success': not error }
-
-  # on successful db insert, flash success
-  if not error:
-    flash('Artist ' + request.form['name'] + ' was successfully listed!')
-  else:
-    flash('Error adding artist ' + request.form['name'])
-  return render_template('pages/home.html', data=body)
-
-
-#  Shows
-#  ----------------------------------------------------------------
-
-@app.route('/shows')
-def shows():
-  # displays list of shows at /shows
-  # TODO: replace with real venues data.
-  #       num_shows should be aggregated based on number of upcoming shows per venue.
-  data = []
-
-  shows = Show.query.join(Venue, Show.venue_id == Venue.id)\
-    .join(Artist, Show.artist_id == Artist.id)\
-    .all()
-
-  print(shows[0])
-  
-  for s in shows:
-
-    show = {
-      'start_time': str(s.start_time),
-      'artist_name': s.artist.name,
-      'artist_id': s.artist_id,
-      'artist_image_link': s.artist.image_link,
-      'venue_id': s.venue_id,
-      'venue_name': s.venue.name,
-    }
-
-    data.append(show)
-
-  return render_template('pages/shows.html', shows=data)
-
-@app.route('/shows/create')
-def create_shows():
-  # renders form. do not touch.
-  form = ShowForm()
-  return render_template('forms/new_show.html', form=form)
-
-@app.route('/shows/create', methods=['POST'])
-def create_show_submission():
-  # called to create new shows in the db, upon submitting new show listing form
-  # TODO: insert form data as a new Show record in the db, instead
-  error = False
-  body = {}
-
-  try:
-    show = Show(
-      artist_id = request.form['artist_id'],
-      venue_id = request.form['venue_id'],
-      start_time = request.form['start_time']
-    )
-    db.session.add(show)
-    db.session.commit()
-  except:
-    error = True
-    db.session.rollback()
-    print(sys.exc_info())
-  finally:
-    db.session.close()
-  
-  if error:
-    flash('Error creating show')
-  else:
-  # on successful db insert, flash success
-    flash('Show was successfully listed!')
-
-  body['success'] = not error 
-
-  # TODO: on unsuccessful db insert, flash an error instead.
-  # e.g., flash('An error occurred. Show could not be listed.')
-  # see: http://flask.pocoo.org/docs/1.0/patterns/flashing/
-  return render_template('pages/home.html', data=body)
-
-@app.errorhandler(404)
 def not_found_error(error):
     return render_template('errors/404.html'), 404
 
-@app.errorhandler(500)
 def server_error(error):
     return render_template('errors/500.html'), 500
 
-
-if not app.debug:
-    file_handler = FileHandler('error.log')
-    file_handler.setFormatter(
-        Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
-    )
-    app.logger.setLevel(logging.INFO)
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
-    app.logger.info('errors')
+def create_app(config='config'):
+  '''
+  Builds the app. Workers and `flask` commands each call it once; imports
+  only some views or commands need (forms, babel, dateutil, Flask-Migrate)
+  are left to those, see benchmarks/bench_boot.py.
+  '''
+  app = Flask(__name__)
+  app.config.from_object(config)
+  app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config))
+  db.init_app(app)
+
+  # TODO: connect to a local postgresql database
+  app.extensions['migrate'] = DeferredMigrate(app, db)
+  init_sqlstats(app)
+  init_pool(app, db)
+  init_routing(app, db)
+  init_assets(app)
+  init_caches(app)
+
+  app.jinja_env.filters['datetime'] = format_datetime
+  app.register_blueprint(main)
+  app.register_blueprint(commands)
+  init_api(app, api_resources())
+  app.register_error_handler(404, not_found_error)
+  app.register_error_handler(500, server_error)
+
+  if not app.debug:
+      setup_logging(app)
+      app.logger.info('errors')
+  return app
 
 #----------------------------------------------------------------------------#
 # Launch.
@@ -490,11 +97,11 @@ if not app.debug:
 
 # Default port:
 if __name__ == '__main__':
-    app.run()
+    create_app().run()
 
 # Or specify port manually:
 '''
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port)
+    create_app().run(host='0.0.0.0', port=port)
 '''
@@ -0,0 +1,158 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+
+from flask import request, send_from_directory
+
+try:
+  import brotli
+except ImportError:
+  brotli = None
+
+try:
+  from rjsmin import jsmin
+except ImportError:
+  jsmin = None
+
+#----------------------------------------------------------------------------#
+# Static assets.
+#----------------------------------------------------------------------------#
+
+MANIFEST = 'manifest.json'
+
+# worth compressing; images and woff fonts already are
+COMPRESSIBLE = ('.css', '.js', '.map', '.svg', '.json', '.txt', '.eot', '.ttf', '.otf')
+
+# precompressed variants, best first
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+CSS_COMMENT = re.compile(r'/\*(?!!).*?\*/', re.S)
+CSS_SPACE = re.compile(r'\s*([{};:,>])\s*')
+CSS_URL = re.compile(r'''url\(\s*(['"]?)([^'")?#]+)([^'")]*)\1\s*\)''')
+SOURCE_MAP = re.compile(r'(//[#@] sourceMappingURL=)(\S+)')
+
+
+def minify_css(text):
+  # comments (bar /*! licences) and whitespace around punctuation only;
+  # anything cleverer belongs to a real minifier
+  text = CSS_COMMENT.sub('', text)
+  text = CSS_SPACE.sub(r'\1', text)
+  return re.sub(r'\s+', ' ', text).replace(';}', '}').strip()
+
+def fingerprint(path, content):
+  (root, ext) = posixpath.splitext(path)
+  return '%s.%s%s' % (root, hashlib.sha256(content).hexdigest()[:10], ext)
+
+def rewrite_references(path, text, manifest):
+  # point url(...) and sourceMappingURL at the fingerprinted files
+  base = posixpath.dirname(path)
+
+  def hashed(reference):
+    target = posixpath.normpath(posixpath.join(base, reference))
+    if target not in manifest:
+      return reference
+    return posixpath.relpath(manifest[target], base)
+
+  text = CSS_URL.sub(lambda m: 'url(%s%s%s%s)' % (m.group(1), hashed(m.group(2)), m.group(3), m.group(1)), text)
+  return SOURCE_MAP.sub(lambda m: m.group(1) + hashed(m.group(2)), text)
+
+def compress(path, content):
+  # writes the .gz and .br siblings that come out smaller than the original
+  variants = [('.gz', gzip.compress(content, 9, mtime=0))]
+  if brotli is not None:
+    variants.append(('.br', brotli.compress(content, quality=11)))
+  for (suffix, compressed) in variants:
+    if len(compressed) < len(content):
+      with open(path + suffix, 'wb') as f:
+        f.write(compressed)
+
+def build(source, dest, skip=('dist',)):
+  '''
+  Copies every file under source into dest under a content-hashed name,
+  minifying CSS (and JS when rjsmin is installed) and precompressing text
+  files, and writes dest/manifest.json mapping original paths to new ones.
+  Earlier builds' files are kept for pages still referring to them.
+  Returns the manifest.
+  '''
+  paths = []
+  for (dirpath, dirnames, filenames) in os.walk(source):
+    dirnames[:] = sorted(d for d in dirnames if d not in skip)
+    for filename in sorted(filenames):
+      if not filename.startswith('.'):
+        paths.append(os.path.relpath(os.path.join(dirpath, filename), source).replace(os.sep, '/'))
+  # stylesheets and scripts last, so the files they refer to are hashed first
+  paths.sort(key=lambda path: (path.endswith(('.css', '.js')), path))
+
+  manifest = {}
+  for path in paths:
+    with open(os.path.join(source, path), 'rb') as f:
+      content = f.read()
+    if path.endswith(('.css', '.js')):
+      text = content.decode('utf-8')
+      if path.endswith('.css') and not path.endswith('.min.css'):
+        text = minify_css(text)
+      elif path.endswith('.js') and not path.endswith('.min.js') and jsmin is not None:
+        text = jsmin(text)
+      content = rewrite_references(path, text, manifest).encode('utf-8')
+
+    manifest[path] = fingerprint(path, content)
+    out = os.path.join(dest, manifest[path])
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, 'wb') as f:
+      f.write(content)
+    if path.endswith(COMPRESSIBLE):
+      compress(out, content)
+
+  with open(os.path.join(dest, MANIFEST), 'w') as f:
+    json.dump(manifest, f, indent=2, sort_keys=True)
+  return manifest
+
+def load_manifest(dest):
+  try:
+    with open(os.path.join(dest, MANIFEST)) as f:
+      return json.load(f)
+  except FileNotFoundError:
+    return {}
+
+
+def init_assets(app):
+  '''
+  Makes url_for('static', filename=...) point at the fingerprinted copy from
+  the last build, when there is one, and serves those copies with immutable
+  cache headers, precompressed to match Accept-Encoding.
+  '''
+  app.extensions['assets'] = load_manifest(app.config['ASSETS_DIR'])
+  serve_static = app.view_functions['static']
+
+  @app.url_defaults
+  def fingerprinted_url(endpoint, values):
+    if endpoint == 'static':
+      hashed = app.extensions['assets'].get(values.get('filename'))
+      if hashed is not None:
+        values['filename'] = 'dist/' + hashed
+
+  def static(filename):
+    if not filename.startswith('dist/'):
+      return serve_static(filename=filename)
+    filename = filename[len('dist/'):]
+    dest = app.config['ASSETS_DIR']
+    response = None
+    for (encoding, suffix) in ENCODINGS:
+      if request.accept_encodings[encoding] and os.path.isfile(os.path.join(dest, filename + suffix)):
+        # typed as the file it decodes to, not as .gz or .br
+        response = send_from_directory(dest, filename + suffix,
+          mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+        response.headers['Content-Encoding'] = encoding
+        break
+    if response is None:
+      response = send_from_directory(dest, filename)
+    # the name changes whenever the content does
+    response.headers['Cache-Control'] = 'public, max-age=%d, immutable' % app.config['ASSETS_MAX_AGE']
+    response.vary.add('Accept-Encoding')
+    return response
+
+  app.view_functions['static'] = static
@@ -0,0 +1,159 @@
+import logging
+import time
+from datetime import datetime
+
+import sqlalchemy as sa
+from alembic import op
+from flask import current_app, has_app_context
+from sqlalchemy.exc import OperationalError
+
+#----------------------------------------------------------------------------#
+# Online backfills.
+#----------------------------------------------------------------------------#
+# A change that rewrites existing rows is made in three revisions instead of
+# one, so no table is locked for longer than a batch:
+#
+#   expand    add the new column (nullable, or with a constant default) and
+#             deploy code that writes it alongside the old one
+#   backfill  run_backfill() fills it in for existing rows, resumably
+#   contract  add NOT NULL or constraints, then drop the old column once
+#             nothing reads it
+
+logger = logging.getLogger('alembic.backfill')
+
+LOCK_NOT_AVAILABLE = '55P03'
+
+metadata = sa.MetaData()
+
+progress = sa.Table('backfill_progress', metadata,
+  sa.Column('name', sa.String(120), primary_key=True),
+  sa.Column('last_key', sa.BigInteger),
+  sa.Column('rows', sa.BigInteger, nullable=False, default=0),
+  sa.Column('started_at', sa.DateTime, nullable=False, default=datetime.now),
+  sa.Column('updated_at', sa.DateTime, nullable=False, default=datetime.now, onupdate=datetime.now),
+  sa.Column('finished_at', sa.DateTime)
+)
+
+DEFAULTS = {
+  'BACKFILL_BATCH_SIZE': 1000,
+  'BACKFILL_SLEEP': 0.1,
+  'BACKFILL_LOCK_TIMEOUT_MS': 2000,
+  'BACKFILL_RETRIES': 5,
+}
+
+def setting(name, value=None):
+  if value is not None:
+    return value
+  if has_app_context():
+    return current_app.config.get(name, DEFAULTS[name])
+  return DEFAULTS[name]
+
+def lock_timed_out(error):
+  return getattr(error.orig, 'pgcode', None) == LOCK_NOT_AVAILABLE
+
+def lock_timeout_statement(ms):
+  return "SET LOCAL lock_timeout = '%dms'" % ms
+
+
+def backfill(engine, name, table, values, where=None, key='id',
+             batch_size=None, sleep=None, lock_timeout=None, retries=None):
+  '''
+  Runs UPDATE table SET values [WHERE where] over batch_size rows at a time,
+  in key order, each batch in its own transaction with sleep seconds between
+  them so replicas and other writers keep up. On PostgreSQL a batch waits at
+  most lock_timeout ms for row locks; one that times out is retried with
+  backoff, up to retries times. Progress is recorded under name with each
+  batch: an interrupted run resumes after the last committed batch, and a
+  finished one does nothing. Returns the number of rows updated.
+  '''
+  batch_size = setting('BACKFILL_BATCH_SIZE', batch_size)
+  sleep = setting('BACKFILL_SLEEP', sleep)
+  lock_timeout = setting('BACKFILL_LOCK_TIMEOUT_MS', lock_timeout)
+  retries = setting('BACKFILL_RETRIES', retries)
+
+  quote = engine.dialect.identifier_preparer.quote
+  column = sa.table(table, sa.column(key)).c[key]
+  update = sa.text('UPDATE %s SET %s WHERE %s > :lower AND %s <= :upper%s' % (
+    quote(table), values, quote(key), quote(key), ' AND (%s)' % where if where else ''))
+
+  metadata.create_all(engine)
+  with engine.begin() as conn:
+    state = conn.execute(sa.select([progress]).where(progress.c.name == name)).first()
+    if state is not None and state.finished_at is not None:
+      return 0
+    if state is None:
+      conn.execute(progress.insert().values(name=name))
+    last = state.last_key if state is not None else None
+    if last is None:
+      first = conn.execute(sa.select([sa.func.min(column)])).scalar()
+      last = first - 1 if first is not None else None
+
+  total = 0
+  while last is not None:
+    batch = sa.select([column]).where(column > last).order_by(column).limit(batch_size).alias('batch')
+    with engine.connect() as conn:
+      upper = conn.execute(sa.select([sa.func.max(batch.c[key])])).scalar()
+    if upper is None:
+      break
+
+    attempt = 0
+    while True:
+      try:
+        with engine.begin() as conn:
+          if conn.dialect.name == 'postgresql' and lock_timeout:
+            conn.execute(lock_timeout_statement(lock_timeout))
+          rows = conn.execute(update, lower=last, upper=upper).rowcount
+          conn.execute(progress.update().where(progress.c.name == name)
+            .values(last_key=upper, rows=progress.c.rows + rows))
+        break
+      except OperationalError as e:
+        if not lock_timed_out(e) or attempt >= retries:
+          raise
+        attempt += 1
+        logger.warning('backfill %s: rows after %s are locked, retry %d', name, last, attempt)
+        time.sleep((sleep or 0.1) * 2 ** attempt)
+
+    total += rows
+    last = upper
+    logger.info('backfill %s: %d rows updated, up to %s %s', name, total, key, last)
+    if sleep:
+      time.sleep(sleep)
+
+  with engine.begin() as conn:
+    conn.execute(progress.update().where(progress.c.name == name).values(finished_at=datetime.now()))
+  return total
+
+def run_backfill(name, table, values, where=None, **options):
+  '''
+  backfill() from a migration. The transactions of this and earlier
+  revisions are committed first so the batches can see their columns; keep
+  the backfill in a revision of its own after the one adding them, so a
+  rerun after an interruption resumes it rather than repeating DDL. With
+  --sql, writes one UPDATE of the whole table instead.
+  '''
+  context = op.get_context()
+  if context.as_sql:
+    op.execute('UPDATE "%s" SET %s%s' % (table, values, ' WHERE %s' % where if where else ''))
+    return None
+  with context.autocommit_block():
+    return backfill(op.get_bind().engine, name, table, values, where, **options)
+
+def forget_backfills(*names):
+  '''Lets a downgraded backfill run again on the next upgrade.'''
+  if not op.get_context().as_sql and not op.get_bind().engine.has_table(progress.name):
+    return
+  op.execute(progress.delete().where(progress.c.name.in_(names)))
+
+def set_lock_timeout(ms=None):
+  '''
+  Makes this revision's DDL give up after ms rather than queue behind a long
+  transaction, holding up every query on the table while it waits.
+  '''
+  if op.get_context().dialect.name == 'postgresql':
+    op.execute(lock_timeout_statement(setting('BACKFILL_LOCK_TIMEOUT_MS', ms)))
+
+def backfill_status(engine):
+  if not engine.has_table(progress.name):
+    return []
+  with engine.connect() as conn:
+    return conn.execute(sa.select([progress]).order_by(progress.c.started_at)).fetchall()
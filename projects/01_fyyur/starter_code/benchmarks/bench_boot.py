@@ -0,0 +1,91 @@
+'''
+Worker boot time: importing app and calling create_app() in a fresh
+interpreter, as every gunicorn worker and flask command does.
+
+    python -m benchmarks.bench_boot --runs 10 --budget-ms 500
+    python -m benchmarks.bench_boot --profile
+
+Prints the median and slowest of --runs boots and exits 1 if the median is
+over the budget (BOOT_BUDGET_MS by default) or a module meant to be imported
+on first use was imported at boot. --profile first prints where one boot's
+import time goes, summed by top-level package (python -X importtime).
+'''
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from collections import defaultdict
+
+if 'DATABASE_URL' not in os.environ:
+  os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+
+from config import BOOT_BUDGET_MS
+
+# left to the views and commands that use them
+DEFERRED = ('flask_migrate', 'alembic', 'forms', 'wtforms', 'flask_wtf', 'babel', 'dateutil',
+  'numpy', 'recommend')
+
+BOOT = '''
+import sys, time
+started = time.perf_counter()
+from app import create_app
+create_app()
+print(round((time.perf_counter() - started) * 1000, 2))
+print(' '.join(sorted(set(name.split('.')[0] for name in sys.modules) & set(%r))))
+''' % (DEFERRED,)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def boot(*options):
+  # a fresh interpreter each time, with nothing imported yet
+  return subprocess.run([sys.executable] + list(options) + ['-c', BOOT],
+    cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, check=True)
+
+def boot_time():
+  '''(milliseconds, deferred modules imported anyway) of one boot.'''
+  (ms, imported) = boot().stdout.split('\n')[:2]
+  return float(ms), imported.split()
+
+def import_profile():
+  # [(package, microseconds)], slowest first, from the self time of each
+  # module imported during a boot
+  totals = defaultdict(int)
+  for line in boot('-X', 'importtime').stderr.splitlines():
+    if line.startswith('import time:') and 'self [us]' not in line:
+      (self_us, cumulative_us, name) = line[len('import time:'):].split('|')
+      totals[name.strip().split('.')[0]] += int(self_us)
+  return sorted(totals.items(), key=lambda item: -item[1])
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument('--runs', type=int, default=10)
+  parser.add_argument('--budget-ms', type=float, default=BOOT_BUDGET_MS)
+  parser.add_argument('--profile', action='store_true', help='print the import-time breakdown')
+  parser.add_argument('--top', type=int, default=15, help='packages in the breakdown')
+  args = parser.parse_args()
+
+  if args.profile:
+    packages = import_profile()
+    total = sum(us for (package, us) in packages)
+    print('%-24s %10s %7s' % ('package', 'ms', 'share'))
+    for (package, us) in packages[:args.top]:
+      print('%-24s %10.1f %6.1f%%' % (package, us / 1000.0, 100.0 * us / total))
+    print('%-24s %10.1f\n' % ('all imports', total / 1000.0))
+
+  runs = [boot_time() for _ in range(args.runs)]
+  times = [ms for (ms, imported) in runs]
+  imported = sorted(set(name for (ms, names) in runs for name in names))
+  median = statistics.median(times)
+  print('boot ms: median %.1f, slowest %.1f, budget %.0f' % (median, max(times), args.budget_ms))
+  if imported:
+    print('imported at boot, should be deferred: %s' % ', '.join(imported))
+  if median > args.budget_ms or imported:
+    sys.exit(1)
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,70 @@
+'''
+Render cost of the `datetime` Jinja filter over a 10k-show listing.
+
+    python -m benchmarks.bench_datetime_filter --shows 10000 --slots 500
+
+Compares the original filter (dateutil parse + babel format on every string)
+with filters.format_datetime fed native datetimes. Shows are spread over
+--slots distinct start times, as real listings repeat popular slots.
+'''
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+import babel.dates
+import dateutil.parser
+from jinja2 import Environment
+
+from filters import format_datetime, format_cached, parse_datetime
+
+TEMPLATE = "{% for show in shows %}<h4>{{ show.start_time|datetime('full') }}</h4>{% endfor %}"
+
+
+def original_format_datetime(value, format='medium'):
+  date = dateutil.parser.parse(value)
+  if format == 'full':
+      format="EEEE MMMM, d, y 'at' h:mma"
+  elif format == 'medium':
+      format="EE MM, dd, y h:mma"
+  return babel.dates.format_datetime(date, format)
+
+
+def render(filter, shows, repeat):
+  env = Environment()
+  env.filters['datetime'] = filter
+  template = env.from_string(TEMPLATE)
+  best = None
+  for _ in range(repeat):
+    format_cached.cache_clear()
+    parse_datetime.cache_clear()
+    start = time.perf_counter()
+    html = template.render(shows=shows)
+    elapsed = time.perf_counter() - start
+    best = elapsed if best is None else min(best, elapsed)
+  return best, html
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__)
+  parser.add_argument('--shows', type=int, default=10000)
+  parser.add_argument('--slots', type=int, default=500)
+  parser.add_argument('--repeat', type=int, default=3)
+  args = parser.parse_args()
+
+  rng = random.Random(42)
+  base = datetime(2020, 5, 1, 20, 0)
+  slots = [base + timedelta(hours=3 * i) for i in range(args.slots)]
+  starts = [rng.choice(slots) for _ in range(args.shows)]
+
+  old, old_html = render(original_format_datetime, [{'start_time': str(t)} for t in starts], args.repeat)
+  new, new_html = render(format_datetime, [{'start_time': t} for t in starts], args.repeat)
+  assert old_html == new_html
+
+  print('%d shows over %d start times, best of %d' % (args.shows, args.slots, args.repeat))
+  print('  original filter %8.1f ms' % (old * 1000))
+  print('  cached filter   %8.1f ms  (%.1fx)' % (new * 1000, old / new))
+
+
+if __name__ == '__main__':
+  main()
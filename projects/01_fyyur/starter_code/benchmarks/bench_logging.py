@@ -0,0 +1,79 @@
+'''
+Request latency while the log disk is slow.
+
+    python -m benchmarks.bench_logging --disk-ms 20 --requests 200
+
+Every request logs one line to a handler that stalls --disk-ms per write.
+Compares a plain FileHandler on the request thread (the old setup) with
+logs.setup_logging, which queues records for a background writer.
+'''
+import argparse
+import logging
+import os
+import tempfile
+import time
+from logging import FileHandler
+
+from flask import Flask
+from flask.logging import default_handler
+
+from logs import setup_logging
+
+
+class SlowFileHandler(FileHandler):
+  stall = 0.0
+
+  def emit(self, record):
+    time.sleep(self.stall)
+    FileHandler.emit(self, record)
+
+
+def make_app(name):
+  app = Flask(name)
+  app.logger.removeHandler(default_handler)
+
+  @app.route('/')
+  def index():
+    app.logger.info('served index')
+    return 'ok'
+
+  return app
+
+
+def measure(app, requests):
+  client = app.test_client()
+  samples = []
+  for _ in range(requests):
+    start = time.perf_counter()
+    client.get('/')
+    samples.append((time.perf_counter() - start) * 1000)
+  samples.sort()
+  return samples[len(samples) // 2], samples[int(len(samples) * 0.95)]
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__)
+  parser.add_argument('--disk-ms', type=float, default=20)
+  parser.add_argument('--requests', type=int, default=200)
+  args = parser.parse_args()
+  SlowFileHandler.stall = args.disk_ms / 1000.0
+  path = os.path.join(tempfile.mkdtemp(), 'error.log')
+
+  sync_app = make_app('bench_sync')
+  sync_app.logger.setLevel(logging.INFO)
+  sync_app.logger.addHandler(SlowFileHandler(path))
+  sync = measure(sync_app, args.requests)
+
+  queued_app = make_app('bench_queued')
+  listener = setup_logging(queued_app, SlowFileHandler(path))
+  queued = measure(queued_app, args.requests)
+  listener.stop()
+
+  print('%d requests, %.0fms per log write' % (args.requests, args.disk_ms))
+  print('%-22s %8s %8s' % ('', 'p50 ms', 'p95 ms'))
+  print('%-22s %8.2f %8.2f' % ('FileHandler', sync[0], sync[1]))
+  print('%-22s %8.2f %8.2f' % ('queued (setup_logging)', queued[0], queued[1]))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,99 @@
+'''
+Latency of venue and artist name search at scale.
+
+    python -m benchmarks.bench_search --rows 1000000 --queries 500
+
+Seeds --rows artists with generated names, then times search_names() for a
+mix of exact, substring and misspelt terms and reports p50/p95/p99. Runs
+against DATABASE_URL (pg_trgm index) or a throwaway sqlite file (in-process
+n-gram fallback) when it is unset.
+'''
+import argparse
+import os
+import random
+import tempfile
+import time
+
+if 'DATABASE_URL' not in os.environ:
+  os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+
+from app import create_app
+from models import db, Artist, search_names, search_indexes
+
+WORDS = ['wild', 'sax', 'band', 'guns', 'petals', 'matt', 'quevedo', 'blue',
+         'velvet', 'echo', 'river', 'static', 'lunar', 'brass', 'neon', 'hollow',
+         'crimson', 'parade', 'signal', 'garden', 'thunder', 'mirror', 'golden']
+
+
+def name(rng):
+  return ' '.join(rng.choice(WORDS).title() for _ in range(rng.randint(2, 4)))
+
+
+def misspell(rng, text):
+  i = rng.randrange(len(text) - 1)
+  return text[:i] + text[i + 1] + text[i] + text[i + 2:]
+
+
+def seed(rows, rng, batch=10000):
+  db.drop_all()
+  if db.engine.dialect.name == 'postgresql':
+    db.session.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+  db.create_all()
+  for start in range(0, rows, batch):
+    db.session.bulk_insert_mappings(Artist, [
+      {'name': name(rng)} for _ in range(min(batch, rows - start))
+    ])
+    db.session.commit()
+  if db.engine.dialect.name == 'postgresql':
+    db.session.execute('ANALYZE "Artist"')
+    db.session.commit()
+
+
+def percentile(samples, p):
+  samples = sorted(samples)
+  return samples[min(len(samples) - 1, int(len(samples) * p / 100.0))]
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__)
+  parser.add_argument('--rows', type=int, default=1000000)
+  parser.add_argument('--queries', type=int, default=500)
+  parser.add_argument('--seed', type=int, default=42)
+  args = parser.parse_args()
+  rng = random.Random(args.seed)
+
+  app = create_app()
+  with app.app_context():
+    start = time.perf_counter()
+    seed(args.rows, rng)
+    print('seeded %d artists in %.1fs' % (args.rows, time.perf_counter() - start))
+
+    start = time.perf_counter()
+    search_indexes.invalidate()
+    search_names(Artist, 'warm up')
+    print('first search (index build on sqlite) %.1fms' % ((time.perf_counter() - start) * 1000))
+
+    terms = []
+    for _ in range(args.queries):
+      kind = rng.choice(['exact', 'substring', 'typo'])
+      term = name(rng)
+      if kind == 'substring':
+        term = rng.choice(WORDS)
+      elif kind == 'typo':
+        term = misspell(rng, term)
+      terms.append(term)
+
+    samples = []
+    for term in terms:
+      start = time.perf_counter()
+      search_names(Artist, term)
+      samples.append((time.perf_counter() - start) * 1000)
+      db.session.rollback()
+
+    print('%s, %d rows, %d queries' % (db.engine.dialect.name, args.rows, len(samples)))
+    for p in (50, 95, 99):
+      print('  p%d %8.2f ms' % (p, percentile(samples, p)))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,193 @@
+'''
+Concurrent buyers for one show's tickets, over real HTTP.
+
+    python -m benchmarks.bench_tickets --buyers 500 --capacity 2000
+
+Each buyer places up to --orders orders of a few tickets, stopping early
+when the show is sold out, and confirms most holds, releasing some and
+abandoning the rest to expire. Afterwards every ticket has to be on sale,
+held or confirmed, and no inventory bucket below zero; the exit status is 1
+if any was sold twice or lost.
+
+Runs against DATABASE_URL, or a throwaway sqlite file when it is unset;
+only postgres takes row locks, sqlite serialises every write.
+'''
+import argparse
+import http.client
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from urllib.parse import urlencode
+
+if 'DATABASE_URL' not in os.environ:
+  os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+
+from werkzeug.serving import make_server
+
+from benchmarks.load.drivers import QuietHandler, percentile
+
+FORM = {'Content-Type': 'application/x-www-form-urlencoded'}
+
+
+def seed(capacity):
+  from models import db, Venue, Artist, Show, open_ticket_sales
+  db.drop_all()
+  db.create_all()
+  venue = Venue(name='Bench Venue', city='Austin', state='TX')
+  artist = Artist(name='Bench Artist', city='Austin', state='TX')
+  db.session.add_all([venue, artist])
+  db.session.flush()
+  start = datetime.now() + timedelta(days=30)
+  show = Show(venue_id=venue.id, artist_id=artist.id, start_time=start, end_time=start + timedelta(hours=2))
+  db.session.add(show)
+  db.session.flush()
+  open_ticket_sales(show, capacity)
+  show_id = show.id
+  db.session.commit()
+  return show_id
+
+
+def tally(show_id):
+  # tickets (on sale, held, confirmed) and the lowest bucket
+  from models import db, ticket_inventory, ticket_reservations
+  (remaining, lowest) = db.session.query(db.func.sum(ticket_inventory.c.remaining),
+      db.func.min(ticket_inventory.c.remaining))\
+    .filter(ticket_inventory.c.show_id == show_id).one()
+  taken = dict(db.session.query(ticket_reservations.c.status, db.func.sum(ticket_reservations.c.quantity))
+    .filter(ticket_reservations.c.show_id == show_id)
+    .group_by(ticket_reservations.c.status).all())
+  db.session.rollback()
+  return (remaining, taken.get('held', 0), taken.get('confirmed', 0), lowest)
+
+
+class Buyers(object):
+  def __init__(self, port, show_id, args):
+    self.port = port
+    self.show_id = show_id
+    self.args = args
+    self.lock = threading.Lock()
+    self.latencies = []
+    self.statuses = {}
+    self.reserved = 0
+    self.confirmed = 0
+
+  def request(self, method, url, data=None):
+    start = time.perf_counter()
+    conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=60)
+    try:
+      conn.request(method, url, urlencode(data) if data else None, FORM if data else {})
+      res = conn.getresponse()
+      (status, body) = (res.status, res.read())
+    except (OSError, http.client.HTTPException):
+      (status, body) = (0, b'')
+    finally:
+      conn.close()
+    elapsed = (time.perf_counter() - start) * 1000
+    with self.lock:
+      key = '%s %d' % (method, status)
+      self.statuses[key] = self.statuses.get(key, 0) + 1
+      if method == 'POST' and url.endswith('/tickets'):
+        self.latencies.append(elapsed)
+    return (status, json.loads(body) if body.startswith(b'{') else None)
+
+  def buy(self, seed):
+    rng = random.Random(seed)
+    url = '/shows/%d/tickets' % self.show_id
+    quantity = rng.randint(1, self.args.max_quantity)
+    (orders, failures) = (0, 0)
+    while orders < self.args.orders and failures < 3:
+      (status, body) = self.request('POST', url, {'quantity': quantity})
+      if status == 409:
+        if not body['available']:
+          return
+        # too few left in any one bucket for this order; ask for less
+        quantity = max(1, min(quantity - 1, body['largest_order']))
+        continue
+      if status != 201:
+        failures += 1
+        continue
+      (orders, failures) = (orders + 1, 0)
+      with self.lock:
+        self.reserved += quantity
+      roll = rng.random()
+      if roll < self.args.abandon:
+        pass
+      elif roll < self.args.abandon + self.args.release:
+        self.request('DELETE', '/reservations/' + body['reservation'])
+      elif self.request('POST', body['confirm'])[0] == 200:
+        with self.lock:
+          self.confirmed += quantity
+      quantity = rng.randint(1, self.args.max_quantity)
+
+  def run(self):
+    threads = [threading.Thread(target=self.buy, args=(i,)) for i in range(self.args.buyers)]
+    start = time.perf_counter()
+    for t in threads:
+      t.start()
+    for t in threads:
+      t.join()
+    return time.perf_counter() - start
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument('--buyers', type=int, default=500)
+  parser.add_argument('--capacity', type=int, default=2000, help='fewer than the buyers would take')
+  parser.add_argument('--orders', type=int, default=4, help='per buyer')
+  parser.add_argument('--max-quantity', type=int, default=4, help='tickets per order, 1 to TICKETS_PER_ORDER')
+  parser.add_argument('--abandon', type=float, default=0.1, help='share of holds left to expire')
+  parser.add_argument('--release', type=float, default=0.1, help='share of holds released')
+  parser.add_argument('--hold-seconds', type=int, default=30, help='TICKET_HOLD_SECONDS for the run')
+  parser.add_argument('--pool-size', type=int, default=20, help='DB_POOL_SIZE for the run')
+  args = parser.parse_args()
+
+  # read by config when the app is created
+  os.environ['TICKET_HOLD_SECONDS'] = str(args.hold_seconds)
+  os.environ.setdefault('DB_POOL_SIZE', str(args.pool_size))
+  from app import create_app
+
+  app = create_app()
+  with app.app_context():
+    from models import db
+    show_id = seed(args.capacity)
+    server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietHandler)
+    # every buyer connects at once; the default backlog of 5 would drop them
+    server.socket.listen(args.buyers)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    buyers = Buyers(server.server_port, show_id, args)
+    try:
+      elapsed = buyers.run()
+    finally:
+      server.shutdown()
+    (remaining, held, confirmed, lowest) = tally(show_id)
+    dialect = db.engine.dialect.name
+
+  requests = len(buyers.latencies)
+  print('%d buyers, %d tickets, %s' % (args.buyers, args.capacity, dialect))
+  print('reservation requests  %8d  %8.1f/s' % (requests, requests / elapsed))
+  print('tickets reserved      %8d  %8.1f/s' % (buyers.reserved, buyers.reserved / elapsed))
+  print('reservation latency   p50 %.1f  p95 %.1f  p99 %.1f ms' % tuple(
+    percentile(buyers.latencies, p) for p in (50, 95, 99)))
+  print('statuses              %s' % ', '.join('%s: %d' % item for item in sorted(buyers.statuses.items())))
+  print('on sale %d + held %d + confirmed %d = %d of %d, lowest bucket %d' % (
+    remaining, held, confirmed, remaining + held + confirmed, args.capacity, lowest))
+
+  problems = []
+  if remaining + held + confirmed != args.capacity:
+    problems.append('tickets sold twice or lost')
+  if lowest < 0:
+    problems.append('a bucket went below zero')
+  if confirmed != buyers.confirmed:
+    problems.append('%d tickets confirmed to buyers, %d in the database' % (buyers.confirmed, confirmed))
+  for problem in problems:
+    print('OVERSOLD: %s' % problem)
+  sys.exit(1 if problems else 0)
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,77 @@
+'''
+Queries and latency of GET /venues as the number of venues grows.
+
+    python -m benchmarks.bench_venues --sizes 10 100 1000 10000
+
+Runs against DATABASE_URL, or a throwaway sqlite file when it is unset.
+The query count should stay the same for every size.
+'''
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+if 'DATABASE_URL' not in os.environ:
+  os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+
+from app import create_app
+from models import db, Venue, Artist, Show, area_cache
+from sqlstats import capture
+
+CITIES = [('San Francisco', 'CA'), ('New York', 'NY'), ('Austin', 'TX'), ('Seattle', 'WA')]
+
+
+def seed(num_venues):
+  db.drop_all()
+  db.create_all()
+  db.session.bulk_insert_mappings(Artist, [{'id': 1, 'name': 'Bench Artist'}])
+  db.session.bulk_insert_mappings(Venue, [{
+    'id': i,
+    'name': 'Venue %d' % i,
+    'city': CITIES[i % len(CITIES)][0],
+    'state': CITIES[i % len(CITIES)][1],
+  } for i in range(1, num_venues + 1)])
+  now = datetime.now()
+  db.session.bulk_insert_mappings(Show, [{
+    'artist_id': 1,
+    'venue_id': i,
+    'start_time': now + timedelta(days=(i % 7) - 3),
+  } for i in range(1, num_venues + 1)])
+  db.session.commit()
+
+
+def run(num_venues, client):
+  seed(num_venues)
+  area_cache.invalidate()
+  with capture() as cold_stats:
+    start = time.perf_counter()
+    res = client.get('/venues')
+    cold = time.perf_counter() - start
+
+  with capture() as warm_stats:
+    start = time.perf_counter()
+    client.get('/venues')
+    warm = time.perf_counter() - start
+
+  assert res.status_code == 200
+  return cold_stats.count, warm_stats.count, cold, warm
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__)
+  parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000, 10000])
+  args = parser.parse_args()
+
+  print('%10s %12s %12s %10s %10s' % ('venues', 'queries', 'cached', 'cold ms', 'warm ms'))
+  app = create_app()
+  with app.app_context():
+    client = app.test_client()
+    for size in args.sizes:
+      cold_queries, warm_queries, cold, warm = run(size, client)
+      print('%10d %12d %12d %10.1f %10.1f' % (
+        size, cold_queries, warm_queries, cold * 1000, warm * 1000))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,13 @@
+'''
+Load benchmark for every Fyyur route, over reproducible synthetic data.
+
+    python -m benchmarks.load --shows 100000 --requests 200 --threads 8 \
+        --out results.json --compare baseline.json
+
+Seeds --shows shows (with venues and artists to match) through the models,
+then requests each route --requests times, first in-process with the Flask
+test client and then over HTTP from --threads threads against a local
+server. Reports p50/p95/p99 latency, queries per request and process RSS
+per route, and writes them as JSON to --out. Runs against DATABASE_URL, or
+a throwaway sqlite file when it is unset.
+'''
@@ -0,0 +1,86 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+if 'DATABASE_URL' not in os.environ:
+  os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+
+from app import create_app
+from models import db
+
+from . import __doc__ as usage
+from .data import seed, sizes
+from .drivers import ClientDriver, HTTPDriver
+from .routes import missing, targets
+
+COLUMNS = ('p50_ms', 'p95_ms', 'p99_ms', 'queries_per_request', 'rss_mb')
+
+
+def table(driver, results, baseline=None):
+  print('\n%s' % driver)
+  print('%-58s %8s %8s %8s %8s %8s  %s' % (('route',) + tuple(c.split('_')[0] for c in COLUMNS) + ('statuses',)))
+  for (route, result) in results.items():
+    cells = ['%8s' % ('-' if result[c] is None else '%.1f' % result[c]) for c in COLUMNS]
+    old = (baseline or {}).get(route)
+    if old and old['p95_ms']:
+      cells[1] += ' (%+.0f%%)' % ((result['p95_ms'] / old['p95_ms'] - 1) * 100)
+    print('%-58s %s  %s' % (route[:58], ' '.join(cells), result['statuses']))
+
+
+def main():
+  parser = argparse.ArgumentParser(description=usage, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument('--shows', type=int, default=1000, help='1e3 to 1e6')
+  parser.add_argument('--seed', type=int, default=0)
+  parser.add_argument('--requests', type=int, default=50, help='per route and driver')
+  parser.add_argument('--threads', type=int, default=8, help='for the HTTP driver; 0 skips it')
+  parser.add_argument('--out', default='load_results.json')
+  parser.add_argument('--compare', help='an earlier --out file to compare p95 against')
+  args = parser.parse_args()
+
+  app = create_app()
+  # a failing route is counted as a 500, not raised
+  app.config['PROPAGATE_EXCEPTIONS'] = False
+  with app.app_context():
+    started = time.perf_counter()
+    sample = seed(args.shows, args.seed)
+    seeded = time.perf_counter() - started
+    routes = targets(sample)
+    unknown = missing(app, routes)
+    if unknown:
+      sys.exit('routes without a benchmark target: %s' % unknown)
+
+    drivers = [ClientDriver(app, args.requests)]
+    if args.threads:
+      drivers.append(HTTPDriver(app, args.requests, args.threads))
+    (venues, artists) = sizes(args.shows)
+    run = {
+      'started': time.strftime('%Y-%m-%dT%H:%M:%S'),
+      'python': platform.python_version(),
+      'database': db.engine.dialect.name,
+      'shows': args.shows,
+      'venues': venues,
+      'artists': artists,
+      'seed': args.seed,
+      'seed_seconds': round(seeded, 2),
+      'requests': args.requests,
+      'threads': args.threads,
+      'results': dict((driver.name, driver.run(routes)) for driver in drivers),
+    }
+
+  baseline = None
+  if args.compare:
+    with open(args.compare) as f:
+      baseline = json.load(f)['results']
+  for (name, results) in run['results'].items():
+    table(name, results, (baseline or {}).get(name))
+  with open(args.out, 'w') as f:
+    json.dump(run, f, indent=2, sort_keys=True)
+  print('\nwrote %s' % args.out)
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,83 @@
+import random
+from datetime import datetime, time, timedelta
+
+from models import db, Genre, Venue, Artist, Show, open_ticket_sales, repair_show_counts
+
+WORDS = ['wild', 'sax', 'band', 'guns', 'petals', 'blue', 'velvet', 'echo',
+         'river', 'static', 'lunar', 'brass', 'neon', 'hollow', 'crimson',
+         'parade', 'signal', 'garden', 'thunder', 'mirror', 'golden', 'hop']
+CITIES = [('San Francisco', 'CA'), ('New York', 'NY'), ('Austin', 'TX'),
+          ('Seattle', 'WA'), ('Chicago', 'IL'), ('Nashville', 'TN')]
+GENRES = ['Alternative', 'Blues', 'Classical', 'Country', 'Electronic', 'Folk',
+          'Funk', 'Hip-Hop', 'Jazz', 'Pop', 'Punk', 'R&B', 'Reggae', 'Rock n Roll']
+
+
+class Sample(object):
+  # ids and names the routes are requested with
+  def __init__(self, venue_id, artist_id, venue_name, artist_name, genre, show_day, show_id):
+    self.venue_id = venue_id
+    self.artist_id = artist_id
+    self.venue_name = venue_name
+    self.artist_name = artist_name
+    self.genre = genre
+    self.show_day = show_day
+    self.show_id = show_id
+
+
+def name(rng):
+  return ' '.join(rng.choice(WORDS).title() for _ in range(rng.randint(2, 4)))
+
+def sizes(shows):
+  # about 50 shows per venue and 25 per artist
+  return (max(10, shows // 50), max(10, shows // 25))
+
+def seed(shows, seed=0, today=None, batch=10000, tickets=1000000):
+  '''
+  Recreates the tables with `shows` shows spread over venues and
+  artists, the same ones for the same arguments. Each venue plays one show
+  a night, half of them before `today` and half after, so no bookings
+  overlap, and the first show after `today` has `tickets` on sale.
+  Returns a Sample.
+  '''
+  rng = random.Random(seed)
+  today = datetime.combine(today or datetime.now().date(), time(20, 0))
+  (num_venues, num_artists) = sizes(shows)
+
+  db.drop_all()
+  db.create_all()
+  genres = [Genre(name=genre) for genre in GENRES]
+  db.session.add_all(genres)
+
+  for (model, count) in ((Venue, num_venues), (Artist, num_artists)):
+    for first in range(1, count + 1, batch):
+      for _ in range(first, min(first + batch, count + 1)):
+        (city, state) = rng.choice(CITIES)
+        db.session.add(model(name=name(rng), city=city, state=state,
+          phone='555-%03d-%04d' % (rng.randrange(1000), rng.randrange(10000)),
+          genres=rng.sample(genres, rng.randint(1, 3))))
+      db.session.commit()
+
+  nights = [0] * (num_venues + 1)
+  half = shows // num_venues // 2
+  now = datetime.now()
+  for first in range(0, shows, batch):
+    rows = []
+    for _ in range(first, min(first + batch, shows)):
+      venue_id = rng.randint(1, num_venues)
+      start_time = today + timedelta(days=nights[venue_id] - half)
+      nights[venue_id] += 1
+      rows.append(Show(venue_id=venue_id, artist_id=rng.randint(1, num_artists),
+        start_time=start_time, end_time=start_time + timedelta(hours=2),
+        is_past=start_time <= now))
+    # counters are filled in by repair_show_counts below, once
+    db.session.bulk_save_objects(rows)
+    db.session.commit()
+  repair_show_counts()
+
+  show = Show.query.filter(Show.start_time > now).order_by(Show.start_time, Show.id).first()
+  open_ticket_sales(show, tickets)
+  db.session.commit()
+
+  venue = Venue.query.get(1)
+  artist = Artist.query.get(1)
+  return Sample(venue.id, artist.id, venue.name, artist.name, venue.genres[0].name, today.date(), show.id)
@@ -0,0 +1,132 @@
+import http.client
+import math
+import resource
+import threading
+import time
+from urllib.parse import urlencode
+
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+from .routes import rule_for
+
+
+def percentile(values, p):
+  # nearest rank
+  values = sorted(values)
+  return values[max(0, int(math.ceil(p / 100.0 * len(values))) - 1)] if values else None
+
+def rss_mb():
+  # current resident set size; the peak where /proc is unavailable
+  try:
+    with open('/proc/self/status') as f:
+      for line in f:
+        if line.startswith('VmRSS:'):
+          return int(line.split()[1]) / 1024.0
+  except OSError:
+    pass
+  return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+class Driver(object):
+  '''
+  Requests each target `requests` times and summarises it. Queries come from
+  the app's sqlstats route report, so both drivers count them the same way.
+  '''
+  def __init__(self, app, requests):
+    self.app = app
+    self.requests = requests
+    self.report = app.extensions['sqlstats']
+
+  def run(self, targets):
+    results = {}
+    for (endpoint, method, url, data) in targets:
+      rule = rule_for(self.app, endpoint, method)
+      before = self.report.summary().get(rule, {'requests': 0, 'queries': 0})
+      (latencies, statuses) = self.send(method, url, data)
+      after = self.report.summary().get(rule, {'requests': 0, 'queries': 0})
+      served = after['requests'] - before['requests']
+      results['%s %s' % (method, url)] = {
+        'endpoint': endpoint,
+        'requests': len(latencies),
+        'statuses': dict((str(s), statuses.count(s)) for s in sorted(set(statuses))),
+        'p50_ms': percentile(latencies, 50),
+        'p95_ms': percentile(latencies, 95),
+        'p99_ms': percentile(latencies, 99),
+        'mean_ms': sum(latencies) / len(latencies),
+        'queries_per_request': (after['queries'] - before['queries']) / float(served) if served else None,
+        'rss_mb': rss_mb(),
+      }
+    return results
+
+
+class ClientDriver(Driver):
+  # in-process, one request at a time, with the Flask test client
+  name = 'client'
+
+  def send(self, method, url, data):
+    client = self.app.test_client()
+    latencies, statuses = [], []
+    for _ in range(self.requests):
+      start = time.perf_counter()
+      res = client.open(url, method=method, data=data)
+      res.get_data()
+      latencies.append((time.perf_counter() - start) * 1000)
+      statuses.append(res.status_code)
+      res.close()
+    return latencies, statuses
+
+
+class QuietHandler(WSGIRequestHandler):
+  def log_request(self, *args):
+    pass
+
+
+class HTTPDriver(Driver):
+  # real HTTP from `threads` threads against a threaded local server
+  name = 'http'
+
+  def __init__(self, app, requests, threads):
+    Driver.__init__(self, app, requests)
+    self.threads = threads
+
+  def run(self, targets):
+    server = make_server('127.0.0.1', 0, self.app, threaded=True, request_handler=QuietHandler)
+    self.port = server.server_port
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+      return Driver.run(self, targets)
+    finally:
+      server.shutdown()
+
+  def send(self, method, url, data):
+    body = urlencode(data, doseq=True) if data else None
+    headers = {'Content-Type': 'application/x-www-form-urlencoded'} if data else {}
+    latencies, statuses = [], []
+    lock = threading.Lock()
+
+    def worker(count):
+      for _ in range(count):
+        start = time.perf_counter()
+        conn = http.client.HTTPConnection('127.0.0.1', self.port)
+        try:
+          conn.request(method, url, body, headers)
+          res = conn.getresponse()
+          res.read()
+          status = res.status
+        except (OSError, http.client.HTTPException):
+          status = 0
+        finally:
+          conn.close()
+        with lock:
+          latencies.append((time.perf_counter() - start) * 1000)
+          statuses.append(status)
+
+    counts = [self.requests // self.threads + (i < self.requests % self.threads)
+      for i in range(self.threads)]
+    workers = [threading.Thread(target=worker, args=(n,)) for n in counts if n]
+    for w in workers:
+      w.start()
+    for w in workers:
+      w.join()
+    return latencies, statuses
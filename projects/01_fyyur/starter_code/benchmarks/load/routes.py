@@ -0,0 +1,68 @@
+from datetime import timedelta
+
+# (endpoint, method, url, form data) for every route, built from a Sample.
+# Unknown endpoints fail the coverage check, so new routes get added here.
+def targets(sample):
+  venue = '/venues/%d' % sample.venue_id
+  artist = '/artists/%d' % sample.artist_id
+  tickets = '/shows/%d/tickets' % sample.show_id
+  missing_reservation = '0' * 32
+  later = (sample.show_day + timedelta(days=400)).isoformat()
+  artist_form = {'name': 'Bench Artist', 'city': 'Austin', 'state': 'TX', 'phone': '',
+                 'genres': [sample.genre], 'image_link': '', 'facebook_link': '', 'site_link': ''}
+  venue_form = dict(artist_form, name='Bench Venue', address='1 Main St',
+                    seeking_talent='', seeking_description='')
+  return [
+    ('main.index', 'GET', '/', None),
+    ('main.venues', 'GET', '/venues', None),
+    ('main.venues', 'GET', '/venues?genre=' + sample.genre, None),
+    ('main.venues', 'GET', '/venues?order=trending', None),
+    ('main.show_venue', 'GET', venue, None),
+    ('main.venue_conflicts', 'GET', venue + '/conflicts?start_time=' + sample.show_day.isoformat(), None),
+    ('main.nearby_venues', 'GET', '/venues/nearby?lat=37.77&lng=-122.42&radius=50', None),
+    ('main.venue_typeahead', 'GET', '/venues/typeahead?q=' + sample.venue_name[:2], None),
+    ('main.search_venues', 'POST', '/venues/search', {'search_term': sample.venue_name.split()[0]}),
+    ('main.create_venue_form', 'GET', '/venues/create', None),
+    ('main.create_venue_submission', 'POST', '/venues/create', venue_form),
+    ('main.edit_venue', 'GET', venue + '/edit', None),
+    ('main.edit_venue_submission', 'POST', venue + '/edit', venue_form),
+    ('main.delete_venue', 'DELETE', '/venues/0', None),
+    ('main.artists', 'GET', '/artists', None),
+    ('main.artists', 'GET', '/artists?order=trending', None),
+    ('main.show_artist', 'GET', artist, None),
+    ('main.artist_typeahead', 'GET', '/artists/typeahead?q=' + sample.artist_name[:2], None),
+    ('main.search_artists', 'POST', '/artists/search', {'search_term': sample.artist_name.split()[0]}),
+    ('main.create_artist_form', 'GET', '/artists/create', None),
+    ('main.create_artist_submission', 'POST', '/artists/create', artist_form),
+    ('main.edit_artist', 'GET', artist + '/edit', None),
+    ('main.edit_artist_submission', 'POST', artist + '/edit', artist_form),
+    ('main.shows', 'GET', '/shows', None),
+    ('main.shows', 'GET', '/shows?from=' + sample.show_day.isoformat(), None),
+    ('main.create_shows', 'GET', '/shows/create', None),
+    ('main.create_show_submission', 'POST', '/shows/create', {'artist_id': sample.artist_id,
+      'venue_id': sample.venue_id, 'start_time': later, 'duration': 60}),
+    ('main.show_tickets', 'GET', tickets, None),
+    ('main.reserve_show_tickets', 'POST', tickets, {'quantity': 1}),
+    # a reservation that was never made, so nothing is held or confirmed
+    ('main.confirm_show_reservation', 'POST', '/reservations/%s/confirm' % missing_reservation, None),
+    ('main.release_show_reservation', 'DELETE', '/reservations/' + missing_reservation, None),
+    ('api.index', 'GET', '/api/v1/venues?fields=id,name,genres', None),
+    ('api.index', 'GET', '/api/v1/shows', None),
+    ('api.detail', 'GET', '/api/v1/artists/%d' % sample.artist_id, None),
+    ('static', 'GET', '/static/css/main.css', None),
+    ('sqlstats_report', 'GET', '/_sqlstats', None),
+    ('pool_stats', 'GET', '/_pool', None),
+  ]
+
+def missing(app, targets):
+  # (endpoint, method) pairs app serves that no target requests
+  covered = set((endpoint, method) for (endpoint, method, url, data) in targets)
+  return sorted((rule.endpoint, method) for rule in app.url_map.iter_rules()
+    for method in rule.methods - {'HEAD', 'OPTIONS'}
+    if (rule.endpoint, method) not in covered)
+
+def rule_for(app, endpoint, method):
+  # the key sqlstats' RouteReport files this target's requests under
+  for rule in app.url_map.iter_rules():
+    if rule.endpoint == endpoint and method in rule.methods:
+      return '%s %s' % (method, rule.rule)
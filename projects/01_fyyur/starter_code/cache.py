@@ -0,0 +1,54 @@
+import threading
+import time
+
+#----------------------------------------------------------------------------#
+# Read-through cache.
+#----------------------------------------------------------------------------#
+
+class ReadThroughCache(object):
+  '''
+  Keeps the result of loader(key) in memory until it expires or is
+  invalidated. Loads run outside the lock; a load that races with an
+  invalidation is returned to its caller but never stored. A caller that
+  knows the version of the data it wants, e.g. read from the database,
+  passes it to get(), and an entry loaded for another version is reloaded:
+  other processes' writes invalidate nothing here.
+  '''
+  def __init__(self, loader, ttl=60):
+    self.loader = loader
+    self.ttl = ttl
+    self._lock = threading.Lock()
+    self._entries = {}
+    self._generation = 0
+
+  def get(self, key=None, version=None):
+    now = time.monotonic()
+    with self._lock:
+      entry = self._entries.get(key)
+      if entry is not None and (self.ttl is None or entry[0] > now) and entry[2] == version:
+        return entry[1]
+      generation = self._generation
+
+    value = self.loader() if key is None else self.loader(key)
+
+    with self._lock:
+      if generation == self._generation:
+        expires = None if self.ttl is None else now + self.ttl
+        self._entries[key] = (expires, value, version)
+    return value
+
+  def peek(self, key=None):
+    # the cached value, or None without loading it
+    with self._lock:
+      entry = self._entries.get(key)
+      if entry is not None and (self.ttl is None or entry[0] > time.monotonic()):
+        return entry[1]
+    return None
+
+  def invalidate(self, key=None):
+    with self._lock:
+      self._generation += 1
+      if key is None:
+        self._entries.clear()
+      else:
+        self._entries.pop(key, None)
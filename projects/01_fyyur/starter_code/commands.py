@@ -0,0 +1,104 @@
+import sys
+
+import click
+from flask import Blueprint, current_app
+from models import db, expire_all_reservations, locate_all_venues, maintain_show_partitions, recommend_all, \
+  roll_past_shows, repair_show_counts
+from assets import brotli, build
+
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
+
+# registered as top-level `flask <command>`s
+commands = Blueprint('commands', __name__, cli_group=None)
+
+@commands.cli.command('build-assets')
+def build_assets_command():
+  '''Fingerprints and precompresses static/ into ASSETS_DIR.'''
+  if brotli is None:
+    # in requirements.txt; without it clients that accept br get gzip
+    click.echo('warning: brotli is not installed, no .br files are written', err=True)
+  manifest = build(current_app.static_folder, current_app.config['ASSETS_DIR'])
+  click.echo('%d assets built into %s' % (len(manifest), current_app.config['ASSETS_DIR']))
+
+@commands.cli.command('roll-shows')
+def roll_shows_command():
+  '''Moves started shows to the past show counts; run it from cron.'''
+  click.echo('%d shows moved to past' % roll_past_shows())
+
+@commands.cli.command('partition-shows')
+def partition_shows_command():
+  '''Adds next months' Show partitions and archives old ones; run it from cron.'''
+  if db.engine.dialect.name != 'postgresql':
+    raise click.ClickException('Show is only partitioned on postgresql')
+  (created, archived) = maintain_show_partitions()
+  for name in created:
+    click.echo('created %s' % name)
+  for name in archived:
+    click.echo('archived %s to %s' % (name, current_app.config['SHOW_ARCHIVE_SCHEMA']))
+  click.echo('%d partitions created, %d archived' % (len(created), len(archived)))
+
+@commands.cli.command('repair-show-counts')
+@click.option('--dry-run', is_flag=True, help='Report drift without fixing it.')
+def repair_show_counts_command(dry_run):
+  '''Recomputes the show counters from the Show table.'''
+  drift = repair_show_counts(fix=not dry_run)
+  for (model, id, stored, actual) in drift:
+    click.echo('%s %d: upcoming/past %d/%d, should be %d/%d' % ((model, id) + stored + actual))
+  click.echo('%d counters %s' % (len(drift), 'drifted' if dry_run else 'repaired'))
+
+@commands.cli.command('locate-venues')
+@click.option('--all', 'everything', is_flag=True, help='Relocate every venue, not just new ones.')
+def locate_venues_command(everything):
+  '''Sets venue coordinates from the gazetteer (GAZETTEER_PATH).'''
+  (located, unknown) = locate_all_venues(everything)
+  for ((city, state), count) in sorted(unknown.items(), key=lambda item: -item[1]):
+    click.echo('not in the gazetteer: %s, %s (%d venues)' % (city, state, count))
+  click.echo('%d venues located' % located)
+
+@commands.cli.command('recommend')
+def recommend_command():
+  '''Recomputes every genre-similarity recommendation.'''
+  (artists, venues) = recommend_all()
+  click.echo('recommendations changed for %d artists and %d venues' % (artists, venues))
+
+@commands.cli.command('expire-reservations')
+def expire_reservations_command():
+  '''Puts expired ticket holds back on sale; run it from cron.'''
+  click.echo('%d reservations expired' % expire_all_reservations())
+
+@commands.cli.command('backfills')
+def backfills_command():
+  '''Shows how far each migration backfill has got.'''
+  # backfill imports alembic, which only migrations need
+  from backfill import backfill_status
+  for row in backfill_status(db.engine):
+    state = 'finished %s' % row.finished_at if row.finished_at else 'at key %s since %s' % (row.last_key, row.updated_at)
+    click.echo('%s: %d rows, %s' % (row.name, row.rows, state))
+
+@commands.cli.command('lock-report')
+@click.argument('revisions', default='base:head')
+@click.option('--threshold-ms', type=int, help='Flag statements that block a table for longer (LOCK_REPORT_THRESHOLD_MS).')
+@click.option('--verbose', is_flag=True, help='List every statement, not just flagged ones.')
+@click.option('--strict', is_flag=True, help='Exit with status 1 when a statement is flagged.')
+def lock_report_command(revisions, threshold_ms, verbose, strict):
+  '''Estimates each migration's locks and duration at this database's size.'''
+  # lockcheck runs alembic, which only migrations need
+  from lockcheck import analyze, offline_sql, revision_docs, table_sizes
+  if db.engine.dialect.name != 'postgresql':
+    raise click.ClickException('lock levels are only known for postgresql')
+  if threshold_ms is None:
+    threshold_ms = current_app.config['LOCK_REPORT_THRESHOLD_MS']
+  config = current_app.extensions['migrate'].migrate.get_config()
+  with db.engine.connect() as connection:
+    sizes = table_sizes(connection)
+  reports = analyze(offline_sql(config, revisions), sizes, revision_docs(config))
+  flagged = 0
+  for report in reports:
+    click.echo(report.describe(threshold_ms, verbose))
+    flagged += len(report.flagged(threshold_ms))
+  click.echo('%d revisions, %.3fs estimated, %d statements blocking a table over %dms' % (
+    len(reports), sum(report.seconds for report in reports), flagged, threshold_ms))
+  if strict and flagged:
+    sys.exit(1)
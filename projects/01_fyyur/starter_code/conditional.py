@@ -0,0 +1,44 @@
+import functools
+import hashlib
+from datetime import timezone
+
+from flask import request, make_response, Response
+
+#----------------------------------------------------------------------------#
+# Conditional GET.
+#----------------------------------------------------------------------------#
+
+def conditional(validator):
+  '''
+  Decorates a view with ETag and Last-Modified handling. validator receives
+  the view's arguments and returns (parts, last_modified): parts is anything
+  with a stable repr that changes whenever the rendered page would, and
+  last_modified a naive local datetime or None. When the client already
+  holds that version the view is not called at all.
+  '''
+  def decorator(view):
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+      (parts, last_modified) = validator(*args, **kwargs)
+      etag = hashlib.sha1(repr((request.full_path, parts)).encode('utf-8')).hexdigest()
+      if last_modified is not None:
+        last_modified = last_modified.astimezone(timezone.utc).replace(microsecond=0)
+
+      if request.if_none_match:
+        fresh = request.if_none_match.contains(etag)
+      elif last_modified is not None and request.if_modified_since:
+        since = request.if_modified_since
+        if since.tzinfo is None:
+          since = since.replace(tzinfo=timezone.utc)
+        fresh = last_modified <= since
+      else:
+        fresh = False
+
+      response = Response(status=304) if fresh else make_response(view(*args, **kwargs))
+      response.set_etag(etag)
+      if last_modified is not None:
+        response.last_modified = last_modified
+      response.cache_control.no_cache = True
+      return response
+    return wrapper
+  return decorator
@@ -9,4 +9,133 @@ DEBUG = True
 
 # Connect to the database
 # IMPLEMENT DATABASE URL
-SQLALCHEMY_DATABASE_URI = 'postgres://maryjac@localhost:5432/fyurr'
+SQLALCHEMY_DATABASE_URI = os.environ.get(
+    'DATABASE_URL', 'postgres://maryjac@localhost:5432/fyurr')
+
+# Optional read replica. GET and HEAD requests read from it (unless
+# READ_REPLICA_ROUTING = 0); a client that just wrote reads from the primary
+# for REPLICA_LAG_SECONDS so it sees its own change.
+if os.environ.get('DATABASE_REPLICA_URL'):
+    SQLALCHEMY_BINDS = {'replica': os.environ['DATABASE_REPLICA_URL']}
+READ_REPLICA_ROUTING = os.environ.get('READ_REPLICA_ROUTING', '1') == '1'
+REPLICA_LAG_SECONDS = int(os.environ.get('REPLICA_LAG_SECONDS', 5))
+
+# Connection pool (ignored for sqlite). Connections are checked before use
+# (DB_POOL_PRE_PING) and replaced after DB_POOL_RECYCLE seconds; every
+# transaction is cancelled after DB_STATEMENT_TIMEOUT_MS (0 disables).
+# DB_PGBOUNCER = 1 when connecting through pgbouncer in transaction mode:
+# the timeout is then set in each transaction rather than once per
+# connection. POOL_STATS = 1 serves /_pool outside debug mode; keep it
+# away from the public, e.g. with the proxy in front.
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 30))
+DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', '1') == '1'
+DB_STATEMENT_TIMEOUT_MS = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 30000))
+DB_PGBOUNCER = os.environ.get('DB_PGBOUNCER', '0') == '1'
+POOL_STATS = os.environ.get('POOL_STATS', '0') == '1'
+
+# Seconds the /venues area listing is served from memory between writes.
+AREA_CACHE_TTL = int(os.environ.get('AREA_CACHE_TTL', 60))
+
+# Venue and artist search: most results returned, and how close a typo must
+# be (pg_trgm similarity, 0-1) to still match.
+SEARCH_RESULT_LIMIT = int(os.environ.get('SEARCH_RESULT_LIMIT', 20))
+SEARCH_SIMILARITY_THRESHOLD = float(os.environ.get('SEARCH_SIMILARITY_THRESHOLD', 0.3))
+
+# Show form artist and venue pickers: most suggestions returned, and seconds
+# before a process reloads its index to pick up other processes' renames.
+TYPEAHEAD_LIMIT = int(os.environ.get('TYPEAHEAD_LIMIT', 10))
+TYPEAHEAD_TTL = int(os.environ.get('TYPEAHEAD_TTL', 300))
+
+# Venue coordinates come from GAZETTEER_PATH, a city,state,latitude,longitude
+# csv, rather than a geocoding service. /venues/nearby searches
+# NEARBY_DEFAULT_RADIUS_KM around a point unless given a radius, at most
+# NEARBY_MAX_RADIUS_KM, and returns at most NEARBY_LIMIT venues.
+GAZETTEER_PATH = os.environ.get('GAZETTEER_PATH', os.path.join(basedir, 'gazetteer.csv'))
+NEARBY_DEFAULT_RADIUS_KM = float(os.environ.get('NEARBY_DEFAULT_RADIUS_KM', 25))
+NEARBY_MAX_RADIUS_KM = float(os.environ.get('NEARBY_MAX_RADIUS_KM', 500))
+NEARBY_LIMIT = int(os.environ.get('NEARBY_LIMIT', 50))
+
+# Venues recommended on an artist's page, and artists on a venue's, by
+# genre similarity (see `flask recommend`).
+RECOMMENDATIONS_LIMIT = int(os.environ.get('RECOMMENDATIONS_LIMIT', 6))
+
+# Venue and artist page views are counted in each worker and written every
+# PAGEVIEW_FLUSH_SECONDS, and when it exits (0 turns the writer off, for
+# tests). ?order=trending on /venues and /artists ranks by unique visitors
+# over the last TRENDING_DAYS, a day's weight halving every
+# TRENDING_HALF_LIFE_DAYS, recomputed at most every TRENDING_TTL seconds.
+PAGEVIEW_FLUSH_SECONDS = int(os.environ.get('PAGEVIEW_FLUSH_SECONDS', 10))
+TRENDING_DAYS = int(os.environ.get('TRENDING_DAYS', 7))
+TRENDING_HALF_LIFE_DAYS = float(os.environ.get('TRENDING_HALF_LIFE_DAYS', 2))
+TRENDING_TTL = int(os.environ.get('TRENDING_TTL', 300))
+
+# Most upcoming (and most past) shows listed on a venue or artist page.
+DETAIL_SHOWS_LIMIT = int(os.environ.get('DETAIL_SHOWS_LIMIT', 50))
+
+# Show bookings: length of a show when the form leaves it out, and the
+# longest allowed, which bounds how far back the overlap check looks.
+SHOW_DEFAULT_MINUTES = int(os.environ.get('SHOW_DEFAULT_MINUTES', 120))
+SHOW_MAX_MINUTES = int(os.environ.get('SHOW_MAX_MINUTES', 24 * 60))
+
+# Monthly Show partitions on postgres (see partitions.py): made
+# SHOW_PARTITION_MONTHS_AHEAD months ahead by `flask partition-shows`, which
+# also detaches those ending more than SHOW_ARCHIVE_AFTER_MONTHS ago into
+# the SHOW_ARCHIVE_SCHEMA schema, and moves them onto
+# SHOW_ARCHIVE_TABLESPACE if one is set. Archived shows are no longer
+# listed or counted.
+SHOW_PARTITION_MONTHS_AHEAD = int(os.environ.get('SHOW_PARTITION_MONTHS_AHEAD', 3))
+SHOW_ARCHIVE_AFTER_MONTHS = int(os.environ.get('SHOW_ARCHIVE_AFTER_MONTHS', 24))
+SHOW_ARCHIVE_SCHEMA = os.environ.get('SHOW_ARCHIVE_SCHEMA', 'archive')
+SHOW_ARCHIVE_TABLESPACE = os.environ.get('SHOW_ARCHIVE_TABLESPACE')
+
+# Ticket sales: a show's tickets are split over up to TICKET_BUCKETS rows,
+# orders are of at most TICKETS_PER_ORDER, and a reservation holds its
+# tickets for TICKET_HOLD_SECONDS unless confirmed. `flask expire-reservations`
+# (from cron) returns lapsed holds, as does a show that looks sold out.
+TICKET_BUCKETS = int(os.environ.get('TICKET_BUCKETS', 16))
+TICKETS_PER_ORDER = int(os.environ.get('TICKETS_PER_ORDER', 8))
+TICKET_HOLD_SECONDS = int(os.environ.get('TICKET_HOLD_SECONDS', 600))
+
+# Shows rendered per /shows page.
+SHOWS_PAGE_SIZE = int(os.environ.get('SHOWS_PAGE_SIZE', 100))
+
+# Output of `flask build-assets`: fingerprinted, precompressed copies of
+# static/, served with a Cache-Control max-age of ASSETS_MAX_AGE seconds.
+ASSETS_DIR = os.environ.get('ASSETS_DIR', os.path.join(basedir, 'static', 'dist'))
+ASSETS_MAX_AGE = int(os.environ.get('ASSETS_MAX_AGE', 365 * 24 * 3600))
+
+# Batched migration backfills (backfill.py): rows updated per transaction,
+# seconds slept between batches, and how long a batch (or the DDL of a
+# migration or of `flask partition-shows`) waits for locks before giving up.
+# Batches back off and retry up to BACKFILL_RETRIES times.
+BACKFILL_BATCH_SIZE = int(os.environ.get('BACKFILL_BATCH_SIZE', 1000))
+BACKFILL_SLEEP = float(os.environ.get('BACKFILL_SLEEP', 0.1))
+BACKFILL_LOCK_TIMEOUT_MS = int(os.environ.get('BACKFILL_LOCK_TIMEOUT_MS', 2000))
+BACKFILL_RETRIES = int(os.environ.get('BACKFILL_RETRIES', 5))
+
+# `flask lock-report` flags migration statements that keep a table from being
+# read or written for longer than this, at the seeded database's row counts.
+LOCK_REPORT_THRESHOLD_MS = int(os.environ.get('LOCK_REPORT_THRESHOLD_MS', 1000))
+
+# Most rows per /api/v1 listing page.
+API_PAGE_SIZE = int(os.environ.get('API_PAGE_SIZE', 100))
+
+# error.log, written from a background thread when DEBUG is off. Rotates at
+# LOG_MAX_BYTES, or on LOG_ROTATE_WHEN ('midnight', 'H', ...) when set, and
+# gzips rolled-over files. LOG_FORMAT = 'json' writes one JSON object per
+# line; LOG_REQUESTS adds an access line with request id and latency.
+LOG_FILE = os.environ.get('LOG_FILE', os.path.join(basedir, 'error.log'))
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text')
+LOG_MAX_BYTES = int(os.environ.get('LOG_MAX_BYTES', 10 * 1024 * 1024))
+LOG_ROTATE_WHEN = os.environ.get('LOG_ROTATE_WHEN')
+LOG_BACKUP_COUNT = int(os.environ.get('LOG_BACKUP_COUNT', 5))
+LOG_COMPRESS = os.environ.get('LOG_COMPRESS', '1') == '1'
+LOG_REQUESTS = os.environ.get('LOG_REQUESTS', '0') == '1'
+
+# Most milliseconds a worker may take to import the app and run create_app(),
+# checked by benchmarks/bench_boot.py.
+BOOT_BUDGET_MS = int(os.environ.get('BOOT_BUDGET_MS', 500))
@@ -0,0 +1,46 @@
+import functools
+from datetime import datetime
+
+#----------------------------------------------------------------------------#
+# Datetime filter.
+#----------------------------------------------------------------------------#
+
+PATTERNS = {
+  'full': "EEEE MMMM, d, y 'at' h:mma",
+  'medium': "EE MM, dd, y h:mma",
+}
+
+# distinct formatted timestamps kept in memory
+CACHE_SIZE = 4096
+
+# babel and dateutil are imported on first use rather than by every worker
+# at boot; pages without dates never load them
+
+@functools.lru_cache(maxsize=64)
+def compile_pattern(format, locale):
+  from babel import Locale
+  from babel.dates import parse_pattern
+  return parse_pattern(PATTERNS.get(format, format)), Locale.parse(locale)
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def parse_datetime(value):
+  import dateutil.parser
+  return dateutil.parser.parse(value)
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def format_cached(value, format, locale):
+  from babel.util import UTC
+  (pattern, locale) = compile_pattern(format, locale)
+  if value.tzinfo is None:
+    # what babel.dates.format_datetime does with naive values
+    value = value.replace(tzinfo=UTC)
+  return pattern.apply(value, locale)
+
+def format_datetime(value, format='medium', locale=None):
+  # datetimes are formatted as they are; strings are parsed first
+  if not isinstance(value, datetime):
+    value = parse_datetime(value)
+  if locale is None:
+    from babel.dates import LC_TIME
+    locale = LC_TIME
+  return format_cached(value, format, locale)
@@ -1,13 +1,22 @@
 from datetime import datetime
+from flask import current_app
 from flask_wtf import Form
-from wtforms import BooleanField, StringField, SelectField, SelectMultipleField, DateTimeField, TextAreaField
-from wtforms.validators import DataRequired, AnyOf, URL
+from wtforms import BooleanField, StringField, HiddenField, IntegerField, SelectField, SelectMultipleField, DateTimeField, TextAreaField
+from wtforms.validators import DataRequired, URL, NumberRange, Optional
 
 class ShowForm(Form):
-    artist_id = StringField(
+    # the names are looked up with /artists/typeahead and /venues/typeahead,
+    # which fill in the ids
+    artist_name = StringField(
+        'artist_name'
+    )
+    artist_id = HiddenField(
         'artist_id'
     )
-    venue_id = StringField(
+    venue_name = StringField(
+        'venue_name'
+    )
+    venue_id = HiddenField(
         'venue_id'
     )
     start_time = DateTimeField(
@@ -15,6 +24,16 @@ class ShowForm(Form):
         validators=[DataRequired()],
         default= datetime.today()
     )
+    # minutes; SHOW_DEFAULT_MINUTES when the form is built
+    duration = IntegerField(
+        'duration',
+        default=lambda: current_app.config['SHOW_DEFAULT_MINUTES']
+    )
+    # tickets on sale, none when left empty
+    capacity = IntegerField(
+        'capacity',
+        validators=[Optional(), NumberRange(min=1)]
+    )
     
 class VenueForm(Form):
     name = StringField(
@@ -89,29 +108,9 @@ class VenueForm(Form):
         'image_link'
     )
     genres = SelectMultipleField(
-        # TODO implement enum restriction
+        # choices are read from the Genre table, see genre_choices in models.py
         'genres', validators=[DataRequired()],
-        choices=[
-            ('Alternative', 'Alternative'),
-            ('Blues', 'Blues'),
-            ('Classical', 'Classical'),
-            ('Country', 'Country'),
-            ('Electronic', 'Electronic'),
-            ('Folk', 'Folk'),
-            ('Funk', 'Funk'),
-            ('Hip-Hop', 'Hip-Hop'),
-            ('Heavy Metal', 'Heavy Metal'),
-            ('Instrumental', 'Instrumental'),
-            ('Jazz', 'Jazz'),
-            ('Musical Theatre', 'Musical Theatre'),
-            ('Pop', 'Pop'),
-            ('Punk', 'Punk'),
-            ('R&B', 'R&B'),
-            ('Reggae', 'Reggae'),
-            ('Rock n Roll', 'Rock n Roll'),
-            ('Soul', 'Soul'),
-            ('Other', 'Other'),
-        ]
+        choices=[]
     )
     facebook_link = StringField(
         'facebook_link', validators=[URL()]
@@ -197,29 +196,9 @@ class ArtistForm(Form):
         'image_link'
     )
     genres = SelectMultipleField(
-        # TODO implement enum restriction
+        # choices are read from the Genre table, see genre_choices in models.py
         'genres', validators=[DataRequired()],
-        choices=[
-            ('Alternative', 'Alternative'),
-            ('Blues', 'Blues'),
-            ('Classical', 'Classical'),
-            ('Country', 'Country'),
-            ('Electronic', 'Electronic'),
-            ('Folk', 'Folk'),
-            ('Funk', 'Funk'),
-            ('Hip-Hop', 'Hip-Hop'),
-            ('Heavy Metal', 'Heavy Metal'),
-            ('Instrumental', 'Instrumental'),
-            ('Jazz', 'Jazz'),
-            ('Musical Theatre', 'Musical Theatre'),
-            ('Pop', 'Pop'),
-            ('Punk', 'Punk'),
-            ('R&B', 'R&B'),
-            ('Reggae', 'Reggae'),
-            ('Rock n Roll', 'Rock n Roll'),
-            ('Soul', 'Soul'),
-            ('Other', 'Other'),
-        ]
+        choices=[]
     )
     facebook_link = StringField(
         # TODO implement enum restriction
@@ -0,0 +1,91 @@
+import csv
+import functools
+import math
+
+from search import normalize
+
+#----------------------------------------------------------------------------#
+# Venue locations.
+#----------------------------------------------------------------------------#
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+# characters of geohash stored per venue; cells a few metres across
+PRECISION = 9
+
+def encode(latitude, longitude, precision=PRECISION):
+  # bits alternate longitude, latitude, each halving its interval
+  intervals = ([-180.0, 180.0], [-90.0, 90.0])
+  values = (longitude, latitude)
+  chars = []
+  bits = 0
+  for i in range(5 * precision):
+    interval = intervals[i % 2]
+    middle = (interval[0] + interval[1]) / 2
+    if values[i % 2] >= middle:
+      bits = bits * 2 + 1
+      interval[0] = middle
+    else:
+      bits = bits * 2
+      interval[1] = middle
+    if i % 5 == 4:
+      chars.append(BASE32[bits])
+      bits = 0
+  return ''.join(chars)
+
+def cell_size(precision):
+  # (height, width) in degrees of the cells of a geohash precision
+  return 180.0 / 2 ** (5 * precision // 2), 360.0 / 2 ** ((5 * precision + 1) // 2)
+
+def distance_km(lat1, lng1, lat2, lng2):
+  # haversine, on a spherical earth
+  (lat1, lng1, lat2, lng2) = map(math.radians, (lat1, lng1, lat2, lng2))
+  a = math.sin((lat2 - lat1) / 2) ** 2 + \
+    math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+  return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+def cells(latitude, longitude, radius_km, max_cells=16):
+  '''
+  Geohash prefixes of the cells covering the box around the circle of
+  radius_km about the point, at the finest precision that needs at most
+  max_cells of them. [''] (everywhere) if the circle reaches a pole.
+  '''
+  # the box that bounds the circle, see
+  # http://janmatuschek.de/LatitudeLongitudeBoundingCoordinates
+  angle = radius_km / EARTH_RADIUS_KM
+  (south, north) = (latitude - math.degrees(angle), latitude + math.degrees(angle))
+  if south <= -90 or north >= 90 or math.sin(angle) >= math.cos(math.radians(latitude)):
+    return ['']
+  spread = math.degrees(math.asin(math.sin(angle) / math.cos(math.radians(latitude))))
+  (west, east) = (longitude - spread, longitude + spread)
+
+  for precision in range(PRECISION, 0, -1):
+    (height, width) = cell_size(precision)
+    rows = int(math.floor(north / height) - math.floor(south / height)) + 1
+    columns = int(math.floor(east / width) - math.floor(west / width)) + 1
+    if rows * columns <= max_cells:
+      break
+
+  # cell edges fall on multiples of the cell size, so stepping a whole
+  # cell from the south west corner lands in each next cell
+  prefixes = set()
+  for row in range(rows):
+    for column in range(columns):
+      lng = (west + column * width + 180.0) % 360.0 - 180.0
+      prefixes.add(encode(min(south + row * height, north), lng, precision))
+  return sorted(prefixes)
+
+
+@functools.lru_cache(maxsize=4)
+def load_gazetteer(path):
+  # {(normalized city, state): (latitude, longitude)} from a city,state,
+  # latitude,longitude csv
+  with open(path, newline='', encoding='utf-8') as f:
+    return dict(((normalize(row['city']), row['state'].strip().upper()),
+      (float(row['latitude']), float(row['longitude']))) for row in csv.DictReader(f))
+
+def locate(gazetteer, city, state):
+  return gazetteer.get((normalize(city), (state or '').strip().upper()))
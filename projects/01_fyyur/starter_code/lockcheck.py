@@ -0,0 +1,362 @@
+import io
+import re
+
+#----------------------------------------------------------------------------#
+# Migration lock report.
+#----------------------------------------------------------------------------#
+# Reads the SQL `flask db upgrade --sql` would run and estimates, from the
+# row counts of a seeded database, how long each revision's statements take
+# and which tables they keep from being read or written meanwhile. Locks are
+# held until the revision's transaction commits, so a fast ALTER TABLE
+# followed by a slow UPDATE blocks its table for the whole UPDATE.
+#
+# Estimates are rough: a statement costs its table's rows at one of RATES,
+# statements with a WHERE clause are charged for the scan only, and DO
+# blocks are not looked into. PostgreSQL's lock levels are the ones used.
+
+ACCESS_EXCLUSIVE = 'ACCESS EXCLUSIVE'
+EXCLUSIVE = 'EXCLUSIVE'
+SHARE_ROW_EXCLUSIVE = 'SHARE ROW EXCLUSIVE'
+SHARE = 'SHARE'
+SHARE_UPDATE_EXCLUSIVE = 'SHARE UPDATE EXCLUSIVE'
+ROW_EXCLUSIVE = 'ROW EXCLUSIVE'
+
+# what each lock keeps other sessions from doing until it is released
+BLOCKS = {
+  ACCESS_EXCLUSIVE: 'reads and writes',
+  EXCLUSIVE: 'writes',
+  SHARE_ROW_EXCLUSIVE: 'writes',
+  SHARE: 'writes',
+  ROW_EXCLUSIVE: 'writes to changed rows',
+}
+
+SEVERITY = [None, 'writes to changed rows', 'writes', 'reads and writes']
+
+FAILS = 'NOT NULL without a default fails on a table with rows'
+UNANALYSED = 'not analysed'
+
+# rows a second for each kind of work, on modest hardware
+RATES = {
+  'scan': 2000000,
+  'index': 400000,
+  'rewrite': 200000,
+  'write': 100000,
+}
+
+TABLE = r'(?:ONLY |IF EXISTS |IF NOT EXISTS )*(?P<table>"[^"]+"|[\w.]+)'
+OTHER = r'(?P<other>"[^"]+"|[\w.]+)'
+
+# (pattern, lock, cost, note) for a statement, first match wins; the lock is
+# on `table`. `other` is where an INSERT ... SELECT reads its rows from.
+STATEMENTS = [
+  (r'^(BEGIN|COMMIT|SET |CREATE EXTENSION|CREATE SCHEMA|COMMENT |ALTER SEQUENCE |SELECT )', None, None, None),
+  (r'^UPDATE alembic_version ', None, None, None),
+  (r'^CREATE TABLE .* PARTITION OF ' + TABLE, ACCESS_EXCLUSIVE, None, None),
+  (r'^CREATE TABLE ' + TABLE, None, 'new', None),
+  (r'^CREATE (UNIQUE )?INDEX CONCURRENTLY .*? ON ' + TABLE, SHARE_UPDATE_EXCLUSIVE, 'index', None),
+  (r'^CREATE (UNIQUE )?INDEX .*? ON ' + TABLE, SHARE, 'index',
+   'builds the index under the lock; CREATE INDEX CONCURRENTLY does not block writes'),
+  (r'^DROP INDEX CONCURRENTLY ', None, None, None),
+  (r'^DROP INDEX ' + TABLE, ACCESS_EXCLUSIVE, None, None),
+  (r'^ALTER INDEX ' + TABLE, SHARE_UPDATE_EXCLUSIVE, None, None),
+  (r'^DROP TABLE ' + TABLE, ACCESS_EXCLUSIVE, None, None),
+  (r'^TRUNCATE (TABLE )?' + TABLE, ACCESS_EXCLUSIVE, None, None),
+  (r'^(VACUUM FULL|CLUSTER) ' + TABLE, ACCESS_EXCLUSIVE, 'rewrite', None),
+  (r'^INSERT INTO ' + TABLE + r'.*? SELECT .*? FROM ' + OTHER, ROW_EXCLUSIVE, 'write', None),
+  (r'^INSERT INTO ' + TABLE, ROW_EXCLUSIVE, None, None),
+  (r'^UPDATE ' + TABLE, ROW_EXCLUSIVE, 'write', None),
+  (r'^DELETE FROM ' + TABLE, ROW_EXCLUSIVE, 'write', None),
+  (r'^DO ', None, None, UNANALYSED),
+]
+
+# (pattern, lock, cost, note) for each action of an ALTER TABLE. `other` is
+# the referenced table of a foreign key, which is locked too, or the
+# partition being attached, which is locked and scanned instead.
+ALTER_ACTIONS = [
+  (r'^ADD (COLUMN )?\S+ .*\b(SERIAL|BIGSERIAL|NEXTVAL|RANDOM|UUID|CLOCK_TIMESTAMP)\b', ACCESS_EXCLUSIVE, 'rewrite',
+   'a volatile default rewrites the table'),
+  (r'^ADD (COLUMN )?(?!CONSTRAINT |PRIMARY |UNIQUE |FOREIGN |CHECK |EXCLUDE )\S+ (?!.*\bDEFAULT\b).*\bNOT NULL\b',
+   ACCESS_EXCLUSIVE, None, FAILS),
+  (r'^ADD (CONSTRAINT \S+ )?(PRIMARY KEY|UNIQUE) USING INDEX ', ACCESS_EXCLUSIVE, None, None),
+  (r'^ADD (CONSTRAINT \S+ )?(PRIMARY KEY|UNIQUE)', ACCESS_EXCLUSIVE, 'index',
+   'builds the index under the lock; build it CONCURRENTLY first and add it USING INDEX'),
+  (r'^ADD (CONSTRAINT \S+ )?EXCLUDE ', ACCESS_EXCLUSIVE, 'index', 'builds the index under the lock'),
+  (r'^ADD (CONSTRAINT \S+ )?FOREIGN KEY .*? REFERENCES ' + OTHER + r'.* NOT VALID', SHARE_ROW_EXCLUSIVE, None, None),
+  (r'^ADD (CONSTRAINT \S+ )?FOREIGN KEY .*? REFERENCES ' + OTHER, SHARE_ROW_EXCLUSIVE, 'scan',
+   'checks every row under the lock; add it NOT VALID, then VALIDATE CONSTRAINT'),
+  (r'^ADD (CONSTRAINT \S+ )?CHECK .* NOT VALID', ACCESS_EXCLUSIVE, None, None),
+  (r'^ADD (CONSTRAINT \S+ )?CHECK ', ACCESS_EXCLUSIVE, 'scan',
+   'checks every row under the lock; add it NOT VALID, then VALIDATE CONSTRAINT'),
+  (r'^ADD ', ACCESS_EXCLUSIVE, None, None),
+  (r'^ALTER (COLUMN )?\S+ (SET DATA )?TYPE ', ACCESS_EXCLUSIVE, 'rewrite', 'changing a type usually rewrites the table'),
+  (r'^ALTER (COLUMN )?\S+ SET NOT NULL', ACCESS_EXCLUSIVE, 'scan', 'scans for nulls under the lock'),
+  (r'^VALIDATE CONSTRAINT ', SHARE_UPDATE_EXCLUSIVE, 'scan', None),
+  (r'^SET TABLESPACE ', ACCESS_EXCLUSIVE, 'rewrite', None),
+  (r'^ATTACH PARTITION ' + OTHER, SHARE_UPDATE_EXCLUSIVE, 'scan',
+   'scans the partition under the lock unless a CHECK constraint already proves its range'),
+  (r'^DETACH PARTITION \S+ CONCURRENTLY', SHARE_UPDATE_EXCLUSIVE, None, None),
+  (r'^', ACCESS_EXCLUSIVE, None, None),
+]
+
+MARKER = re.compile(r'^-- Running upgrade (\S*) -> (\S+)$')
+
+
+def split_statements(sql):
+  '''
+  [(revision, statement)] from offline migration output, each statement
+  with the revision whose "-- Running upgrade" comment came last. A
+  statement ends at a line ending in ; outside quotes and $$ bodies.
+  '''
+  statements = []
+  revision = None
+  lines = []
+  for line in sql.splitlines():
+    if not lines:
+      match = MARKER.match(line.strip())
+      if match:
+        revision = match.group(2)
+      if match or not line.strip() or line.startswith('--'):
+        continue
+    lines.append(line)
+    text = '\n'.join(lines)
+    if text.rstrip().endswith(';') and text.count('$$') % 2 == 0 and text.count("'") % 2 == 0:
+      statements.append((revision, ' '.join(text.rstrip()[:-1].split())))
+      lines = []
+  return statements
+
+def split_actions(actions):
+  # the comma-separated actions of an ALTER TABLE, not split inside parentheses
+  (parts, depth, start) = ([], 0, 0)
+  for (i, char) in enumerate(actions):
+    if char == '(':
+      depth += 1
+    elif char == ')':
+      depth -= 1
+    elif char == ',' and depth == 0:
+      parts.append(actions[start:i].strip())
+      start = i + 1
+  return parts + [actions[start:].strip()]
+
+def table_name(token):
+  # how postgres names the table: quoted names as written, others folded
+  return token[1:-1] if token.startswith('"') else token.lower()
+
+def outside_parentheses(statement):
+  # statement without its subqueries, lists and other parenthesised parts
+  previous = None
+  while previous != statement:
+    (previous, statement) = (statement, re.sub(r'\([^()]*\)', '', statement))
+  return statement
+
+def filtered(statement):
+  return re.search(r'\bWHERE\b', outside_parentheses(statement), re.I) is not None
+
+def stronger(a, b):
+  return a if SEVERITY.index(BLOCKS.get(a)) >= SEVERITY.index(BLOCKS.get(b)) else b
+
+
+class Operation(object):
+  '''
+  One statement: the locks it takes, [(table, lock)], and the rows it reads
+  or writes at which RATES.
+  '''
+  def __init__(self, statement, locks, cost=None, rows_of=None, notes=()):
+    self.statement = statement
+    self.locks = locks
+    self.cost = cost
+    self.rows_of = rows_of
+    self.notes = list(notes)
+    self.seconds = 0.0
+    # tables this statement is first to block, and for how long from start
+    self.blocking = []
+    self.start = 0.0
+    self.held = 0.0
+
+  @property
+  def needs_review(self):
+    # statements that fail, or that the report cannot see into
+    return FAILS in self.notes or UNANALYSED in self.notes
+
+  def describe(self, width=100):
+    statement = self.statement if len(self.statement) <= width else self.statement[:width - 3] + '...'
+    blocked = ', '.join('%s %s' % (table, BLOCKS[lock]) for (table, lock) in self.blocking)
+    line = '%.3fs %s' % (self.seconds, statement)
+    if blocked:
+      line += '\n      blocks %s for %.3fs' % (blocked, self.held)
+    return '\n'.join([line] + ['      ' + note for note in self.notes])
+
+
+def classify(statement):
+  '''The Operation for one statement, from STATEMENTS and ALTER_ACTIONS.'''
+  match = re.match(r'^ALTER TABLE ' + TABLE + r' (?P<actions>.*)$', statement, re.I)
+  if match:
+    table = table_name(match.group('table'))
+    lock = None
+    locks = []
+    (cost, rows_of, notes) = (None, table, [])
+    for action in split_actions(match.group('actions')):
+      for (pattern, action_lock, action_cost, note) in ALTER_ACTIONS:
+        found = re.match(pattern, action, re.I)
+        if found:
+          break
+      lock = stronger(action_lock, lock) if lock else action_lock
+      other = found.groupdict().get('other')
+      if other and action.upper().startswith('ATTACH'):
+        # the partition is locked and scanned, the parent only guarded
+        locks.append((table_name(other), ACCESS_EXCLUSIVE))
+        rows_of = table_name(other)
+      elif other:
+        locks.append((table_name(other), action_lock))
+      if action_cost and (cost is None or RATES[action_cost] < RATES[cost]):
+        cost = action_cost
+      if note:
+        notes.append(note)
+      if re.match(r'^RENAME TO ', action, re.I):
+        notes.append('renames %s to %s' % (table, table_name(action.split()[-1])))
+    return Operation(statement, [(table, lock)] + locks, cost, rows_of, notes)
+
+  for (pattern, lock, cost, note) in STATEMENTS:
+    found = re.match(pattern, statement, re.I)
+    if found:
+      groups = found.groupdict()
+      table = table_name(groups['table']) if groups.get('table') else None
+      if cost == 'write' and filtered(statement):
+        # only the rows matching are written; charge the scan that finds them
+        cost = 'scan'
+      rows_of = table_name(groups['other']) if groups.get('other') else table
+      return Operation(statement, [(table, lock)] if lock else [], cost, rows_of,
+        [note] if note else [])
+  return Operation(statement, [], notes=[UNANALYSED])
+
+
+class RevisionReport(object):
+  def __init__(self, revision, doc=None):
+    self.revision = revision
+    self.doc = doc
+    self.operations = []
+    self.lock_timeout = None
+
+  @property
+  def seconds(self):
+    return sum(operation.seconds for operation in self.operations)
+
+  def flagged(self, threshold_ms):
+    # statements that block reads or writes to existing rows for longer
+    # than the threshold
+    return [operation for operation in self.operations
+      if operation.blocking and operation.held * 1000 >= threshold_ms]
+
+  def describe(self, threshold_ms, verbose=False):
+    heading = '%s %s: %.3fs' % (self.revision, self.doc or '', self.seconds)
+    if self.lock_timeout:
+      heading += ', lock_timeout %s' % self.lock_timeout
+    elif any(operation.blocking for operation in self.operations):
+      heading += ', no lock_timeout'
+    flagged = self.flagged(threshold_ms)
+    lines = [heading]
+    for operation in self.operations:
+      if operation in flagged:
+        lines.append('  ! ' + operation.describe())
+      elif verbose or operation.needs_review:
+        lines.append('    ' + operation.describe())
+    return '\n'.join(lines)
+
+
+def analyze(sql, sizes, docs=None):
+  '''
+  [RevisionReport] for offline migration output, given {table: rows} of a
+  seeded database. Tables keep their row counts through renames and fill
+  with what INSERT ... SELECT copies in and partitions attached; tables
+  created where none exists start empty.
+  '''
+  sizes = dict(sizes)
+  reports = []
+  by_revision = {}
+  (in_transaction, elapsed, transaction, held, created) = (False, 0.0, [], {}, set())
+
+  def commit():
+    for operation in transaction:
+      operation.held = elapsed - operation.start
+    del transaction[:]
+    held.clear()
+    created.clear()
+
+  for (revision, statement) in split_statements(sql):
+    upper = statement.upper()
+    if upper == 'BEGIN':
+      (in_transaction, elapsed) = (True, 0.0)
+      continue
+    if upper == 'COMMIT':
+      commit()
+      in_transaction = False
+      continue
+    if revision is None:
+      continue
+    report = by_revision.get(revision)
+    if report is None:
+      report = by_revision[revision] = RevisionReport(revision, (docs or {}).get(revision))
+      reports.append(report)
+    timeout = re.match(r"^SET (LOCAL )?lock_timeout\s*(=|TO)\s*'?([^']+)'?", statement, re.I)
+    if timeout:
+      report.lock_timeout = timeout.group(3)
+
+    operation = classify(statement)
+    if operation.cost:
+      rows = sizes.get(operation.rows_of, 0)
+      operation.seconds = rows / float(RATES[operation.cost]) if operation.cost in RATES else 0.0
+    for (table, lock) in operation.locks:
+      if table in created or BLOCKS.get(lock) is None:
+        continue
+      if SEVERITY.index(BLOCKS[lock]) > SEVERITY.index(BLOCKS.get(held.get(table))):
+        operation.blocking.append((table, lock))
+        if in_transaction:
+          held[table] = lock
+
+    # keep row counts in step with what the statement does to the tables
+    new = re.match(r'^CREATE TABLE ' + TABLE, statement, re.I)
+    if new and operation.cost == 'new':
+      operation.cost = None
+      if table_name(new.group('table')) not in sizes:
+        sizes[table_name(new.group('table'))] = 0
+      created.add(table_name(new.group('table')))
+    renamed = re.match(r'^ALTER TABLE ' + TABLE + r' RENAME TO ' + OTHER + '$', statement, re.I)
+    if renamed:
+      sizes[table_name(renamed.group('other'))] = sizes.pop(table_name(renamed.group('table')), 0)
+    copied = re.match(r'^INSERT INTO ' + TABLE + r'.*? SELECT ', statement, re.I)
+    if copied and not filtered(statement) and operation.rows_of != table_name(copied.group('table')):
+      target = table_name(copied.group('table'))
+      sizes[target] = sizes.get(target, 0) + sizes.get(operation.rows_of, 0)
+    attached = re.match(r'^ALTER TABLE ' + TABLE + r' ATTACH PARTITION ' + OTHER, statement, re.I)
+    if attached:
+      parent = table_name(attached.group('table'))
+      sizes[parent] = sizes.get(parent, 0) + sizes.get(table_name(attached.group('other')), 0)
+
+    operation.start = elapsed
+    elapsed += operation.seconds
+    report.operations.append(operation)
+    if in_transaction:
+      transaction.append(operation)
+    else:
+      operation.held = operation.seconds
+  commit()
+  return reports
+
+
+def table_sizes(connection):
+  # {table: rows} of the tables and partitions in the current schema, counted
+  names = [name for (name,) in connection.execute(
+    "SELECT c.relname FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+    "WHERE n.nspname = current_schema() AND c.relkind IN ('r', 'p')")]
+  return dict((name, connection.execute('SELECT count(*) FROM "%s"' % name.replace('"', '""')).scalar())
+    for name in names)
+
+def offline_sql(config, revisions):
+  # what `flask db upgrade <revisions> --sql` prints
+  from alembic import command
+  config.output_buffer = io.StringIO()
+  command.upgrade(config, revisions, sql=True)
+  return config.output_buffer.getvalue()
+
+def revision_docs(config):
+  from alembic.script import ScriptDirectory
+  return dict((script.revision, script.doc) for script in ScriptDirectory.from_config(config).walk_revisions())
@@ -0,0 +1,132 @@
+import atexit
+import gzip
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+from logging import Formatter
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
+from queue import Queue
+
+from flask import g, has_request_context, request
+
+#----------------------------------------------------------------------------#
+# Logging.
+#----------------------------------------------------------------------------#
+
+TEXT_FORMAT = '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'
+
+# request fields copied onto records while still on the request thread
+REQUEST_FIELDS = ('request_id', 'method', 'path', 'status', 'latency_ms')
+
+
+class JSONFormatter(Formatter):
+  # one JSON object per line
+  def format(self, record):
+    entry = {
+      'time': self.formatTime(record),
+      'level': record.levelname,
+      'message': record.getMessage(),
+      'logger': record.name,
+      'pathname': record.pathname,
+      'lineno': record.lineno,
+    }
+    for field in REQUEST_FIELDS:
+      if getattr(record, field, None) is not None:
+        entry[field] = getattr(record, field)
+    if record.exc_info:
+      entry['exc_info'] = self.formatException(record.exc_info)
+    elif record.exc_text:
+      entry['exc_info'] = record.exc_text
+    return json.dumps(entry)
+
+
+class RequestFilter(logging.Filter):
+  def filter(self, record):
+    if has_request_context():
+      record.request_id = getattr(record, 'request_id', None) or g.get('request_id')
+      record.method = getattr(record, 'method', None) or request.method
+      record.path = getattr(record, 'path', None) or request.path
+    return True
+
+
+class RecordQueueHandler(QueueHandler):
+  # the stock QueueHandler folds the traceback into the message with its own
+  # formatter; keep it separate so the file formatter decides the layout
+  def prepare(self, record):
+    if record.exc_info:
+      record.exc_text = Formatter().formatException(record.exc_info)
+    record.msg = record.getMessage()
+    record.args = None
+    record.exc_info = None
+    return record
+
+
+class BackgroundListener(QueueListener):
+  # safe to stop twice (explicitly and again at exit)
+  def stop(self):
+    if self._thread is not None:
+      QueueListener.stop(self)
+
+
+def gzip_rotator(source, dest):
+  with open(source, 'rb') as f_in, gzip.open(dest, 'wb') as f_out:
+    shutil.copyfileobj(f_in, f_out)
+  os.remove(source)
+
+def file_handler(config):
+  # size rotation by default, time rotation when LOG_ROTATE_WHEN is set
+  path = config.get('LOG_FILE', 'error.log')
+  backups = config.get('LOG_BACKUP_COUNT', 5)
+  if config.get('LOG_ROTATE_WHEN'):
+    handler = TimedRotatingFileHandler(path, when=config['LOG_ROTATE_WHEN'],
+      backupCount=backups, delay=True)
+  else:
+    handler = RotatingFileHandler(path, maxBytes=config.get('LOG_MAX_BYTES', 10 * 1024 * 1024),
+      backupCount=backups, delay=True)
+  if config.get('LOG_COMPRESS', True):
+    handler.namer = lambda name: name + '.gz'
+    handler.rotator = gzip_rotator
+  return handler
+
+def setup_logging(app, handler=None):
+  '''
+  Sends app.logger records through an in-memory queue to handler (a rotating
+  error.log by default), written by a background listener thread so request
+  threads never wait on the disk.
+  '''
+  handler = handler or file_handler(app.config)
+  if app.config.get('LOG_FORMAT') == 'json':
+    handler.setFormatter(JSONFormatter())
+  else:
+    handler.setFormatter(Formatter(TEXT_FORMAT))
+
+  queue = Queue(-1)
+  listener = BackgroundListener(queue, handler)
+  listener.start()
+  atexit.register(listener.stop)
+
+  queue_handler = RecordQueueHandler(queue)
+  queue_handler.addFilter(RequestFilter())
+  level = getattr(logging, app.config.get('LOG_LEVEL', 'INFO'))
+  queue_handler.setLevel(level)
+  app.logger.setLevel(level)
+  app.logger.addHandler(queue_handler)
+
+  @app.before_request
+  def start_request_log():
+    g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+    g.request_start = time.perf_counter()
+
+  @app.after_request
+  def finish_request_log(response):
+    response.headers['X-Request-ID'] = g.get('request_id', '')
+    if app.config.get('LOG_REQUESTS') and 'request_start' in g:
+      latency = (time.perf_counter() - g.request_start) * 1000
+      app.logger.info('%s %s %s', request.method, request.path, response.status_code,
+        extra={'status': response.status_code, 'latency_ms': round(latency, 3)})
+    return response
+
+  return listener
@@ -8,6 +8,8 @@ from sqlalchemy import pool
 
 from alembic import context
 
+import partitions
+
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
 config = context.config
@@ -27,6 +29,14 @@ config.set_main_option(
     str(current_app.extensions['migrate'].db.engine.url).replace('%', '%%'))
 target_metadata = current_app.extensions['migrate'].db.metadata
 
+
+def include_object(object, name, type_, reflected, compare_to):
+    # backfill.py keeps its progress table outside the models, and Show's
+    # partitions are made by partitions.py
+    if type_ == 'table':
+        return not (name == 'backfill_progress' or name == partitions.DEFAULT or partitions.partition_month(name))
+    return True
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -47,7 +57,8 @@ def run_migrations_offline():
     """
     url = config.get_main_option("sqlalchemy.url")
     context.configure(
-        url=url, target_metadata=target_metadata, literal_binds=True
+        url=url, target_metadata=target_metadata, literal_binds=True,
+        transaction_per_migration=True
     )
 
     with context.begin_transaction():
@@ -83,6 +94,10 @@ def run_migrations_online():
             connection=connection,
             target_metadata=target_metadata,
             process_revision_directives=process_revision_directives,
+            include_object=include_object,
+            # each revision commits on its own, so one that backfills in
+            # batches (see backfill.py) can commit those as it goes
+            transaction_per_migration=True,
             **current_app.extensions['migrate'].configure_args
         )
 
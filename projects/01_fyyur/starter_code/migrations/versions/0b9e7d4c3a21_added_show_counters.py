@@ -0,0 +1,35 @@
+"""added upcoming and past show counters to venue and artist
+
+Revision ID: 0b9e7d4c3a21
+Revises: 8c5a3d7e2f16
+Create Date: 2026-10-18 16:20:13.504418
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from backfill import set_lock_timeout
+
+
+# revision identifiers, used by Alembic.
+revision = '0b9e7d4c3a21'
+down_revision = '8c5a3d7e2f16'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # constant defaults, so no rewrite: existing rows are counted by the
+    # backfill in 7d3b1f5e9c28
+    set_lock_timeout()
+    op.add_column('Show', sa.Column('is_past', sa.Boolean(), server_default=sa.false(), nullable=False))
+    for table in ('Venue', 'Artist'):
+        op.add_column(table, sa.Column('upcoming_shows_count', sa.Integer(), server_default='0', nullable=False))
+        op.add_column(table, sa.Column('past_shows_count', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade():
+    for table in ('Artist', 'Venue'):
+        op.drop_column(table, 'past_shows_count')
+        op.drop_column(table, 'upcoming_shows_count')
+    op.drop_column('Show', 'is_past')
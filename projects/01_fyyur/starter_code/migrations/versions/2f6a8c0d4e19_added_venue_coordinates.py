@@ -0,0 +1,38 @@
+"""added venue latitude, longitude and geohash
+
+Revision ID: 2f6a8c0d4e19
+Revises: 7d3b1f5e9c28
+Create Date: 2026-10-18 19:12:36.402871
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from backfill import set_lock_timeout
+
+
+# revision identifiers, used by Alembic.
+revision = '2f6a8c0d4e19'
+down_revision = '7d3b1f5e9c28'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # filled in from the gazetteer by `flask locate-venues`, and for new or
+    # moved venues by the app
+    set_lock_timeout()
+    op.add_column('Venue', sa.Column('latitude', sa.Float(), nullable=True))
+    op.add_column('Venue', sa.Column('longitude', sa.Float(), nullable=True))
+    op.add_column('Venue', sa.Column('geohash', sa.String(length=12), nullable=True))
+
+    with op.get_context().autocommit_block():
+        op.create_index('ix_venue_geohash', 'Venue', ['geohash'], unique=False,
+                        postgresql_ops={'geohash': 'varchar_pattern_ops'}, postgresql_concurrently=True)
+
+
+def downgrade():
+    op.drop_index('ix_venue_geohash', table_name='Venue')
+    op.drop_column('Venue', 'geohash')
+    op.drop_column('Venue', 'longitude')
+    op.drop_column('Venue', 'latitude')
@@ -0,0 +1,54 @@
+"""added show capacity and ticket reservations
+
+Revision ID: 3b9d6f1e8a24
+Revises: 7d2b5e9f3a61
+Create Date: 2026-10-18 23:48:06.512934
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from backfill import set_lock_timeout
+
+
+# revision identifiers, used by Alembic.
+revision = '3b9d6f1e8a24'
+down_revision = '7d2b5e9f3a61'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # a nullable column with no default only changes the catalog, but still
+    # waits for the table's lock behind any long query
+    set_lock_timeout()
+    op.add_column('Show', sa.Column('capacity', sa.Integer(), nullable=True))
+
+    # new tables; Show's key includes start_time, so no foreign keys to it
+    op.create_table('TicketInventory',
+    sa.Column('show_id', sa.Integer(), nullable=False),
+    sa.Column('bucket', sa.Integer(), nullable=False),
+    sa.Column('remaining', sa.Integer(), nullable=False),
+    sa.CheckConstraint('remaining >= 0', name='ck_ticket_inventory_remaining'),
+    sa.PrimaryKeyConstraint('show_id', 'bucket')
+    )
+    op.create_table('TicketReservation',
+    sa.Column('id', sa.String(length=32), nullable=False),
+    sa.Column('show_id', sa.Integer(), nullable=False),
+    sa.Column('bucket', sa.Integer(), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=10), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_ticket_reservation_held_expires_at', 'TicketReservation', ['expires_at'], unique=False,
+                    postgresql_where=sa.text("status = 'held'"))
+
+
+def downgrade():
+    op.drop_index('ix_ticket_reservation_held_expires_at', table_name='TicketReservation')
+    op.drop_table('TicketReservation')
+    op.drop_table('TicketInventory')
+    set_lock_timeout()
+    op.drop_column('Show', 'capacity')
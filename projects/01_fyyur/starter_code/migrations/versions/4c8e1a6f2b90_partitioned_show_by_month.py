@@ -0,0 +1,79 @@
+"""partitioned show by month of start_time
+
+Revision ID: 4c8e1a6f2b90
+Revises: 9a4e2c7b1d53
+Create Date: 2026-10-18 21:57:12.640339
+
+"""
+from alembic import op
+
+import partitions
+from backfill import set_lock_timeout
+
+
+# revision identifiers, used by Alembic.
+revision = '4c8e1a6f2b90'
+down_revision = '9a4e2c7b1d53'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # the existing table becomes the default partition of a new, partitioned
+    # "Show", so no row is copied. Its primary key has to include start_time
+    # first, from an index built without blocking writes.
+    with op.get_context().autocommit_block():
+        op.execute('CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS show_default_pkey '
+                   'ON "Show" (id, start_time)')
+
+    set_lock_timeout()
+    op.execute('ALTER TABLE "Show" RENAME TO show_default')
+    op.execute('ALTER TABLE show_default DROP CONSTRAINT IF EXISTS "Show_pkey", '
+               'ADD CONSTRAINT show_default_pkey PRIMARY KEY USING INDEX show_default_pkey')
+    op.execute('ALTER TABLE show_default RENAME CONSTRAINT ex_show_venue_booking TO ex_show_default_booking')
+    for index in ('ix_show_venue_id_start_time', 'ix_show_artist_id_start_time', 'ix_show_upcoming_start_time'):
+        op.execute('ALTER INDEX %s RENAME TO %s' % (index, index.replace('ix_show_', 'show_default_')))
+
+    op.execute('CREATE TABLE "Show" (LIKE show_default INCLUDING DEFAULTS) PARTITION BY RANGE (start_time)')
+    op.execute('ALTER TABLE "Show" ADD CONSTRAINT "Show_pkey" PRIMARY KEY (id, start_time)')
+    op.execute('ALTER TABLE "Show" ADD FOREIGN KEY (artist_id) REFERENCES "Artist" (id)')
+    op.execute('ALTER TABLE "Show" ADD FOREIGN KEY (venue_id) REFERENCES "Venue" (id)')
+    op.create_index('ix_show_venue_id_start_time', 'Show', ['venue_id', 'start_time'], unique=False)
+    op.create_index('ix_show_artist_id_start_time', 'Show', ['artist_id', 'start_time'], unique=False)
+    op.execute('CREATE INDEX ix_show_upcoming_start_time ON "Show" (start_time) WHERE NOT is_past')
+    # the id sequence would otherwise go with show_default if it is archived
+    op.execute("DO $$ BEGIN "
+               "IF pg_get_serial_sequence('show_default', 'id') IS NOT NULL THEN "
+               "EXECUTE 'ALTER SEQUENCE ' || pg_get_serial_sequence('show_default', 'id') || ' OWNED BY \"Show\".id'; "
+               "END IF; END $$")
+
+    # the old table's indexes, key and foreign keys match the new ones and are
+    # attached as theirs, and with no other partition yet nothing is scanned
+    op.execute('ALTER TABLE "Show" ATTACH PARTITION %s DEFAULT' % partitions.DEFAULT)
+
+    # every show stays in show_default for now. Moving a month's shows out
+    # here would copy and delete them under the lock the rename took; run
+    # `flask partition-shows` once this has committed, which carves out each
+    # month in a transaction of its own.
+
+
+def downgrade():
+    # back to one table, copying every show still partitioned; archived
+    # partitions are left where they are
+    set_lock_timeout()
+    op.execute('CREATE TABLE show_unpartitioned (LIKE "Show" INCLUDING DEFAULTS)')
+    op.execute('INSERT INTO show_unpartitioned SELECT * FROM "Show"')
+    op.execute("DO $$ BEGIN "
+               "IF pg_get_serial_sequence('\"Show\"', 'id') IS NOT NULL THEN "
+               "EXECUTE 'ALTER SEQUENCE ' || pg_get_serial_sequence('\"Show\"', 'id') || ' OWNED BY show_unpartitioned.id'; "
+               "END IF; END $$")
+    op.execute('DROP TABLE "Show"')
+    op.execute('ALTER TABLE show_unpartitioned RENAME TO "Show"')
+    op.execute('ALTER TABLE "Show" ADD CONSTRAINT "Show_pkey" PRIMARY KEY (id)')
+    op.execute('ALTER TABLE "Show" ADD FOREIGN KEY (artist_id) REFERENCES "Artist" (id)')
+    op.execute('ALTER TABLE "Show" ADD FOREIGN KEY (venue_id) REFERENCES "Venue" (id)')
+    op.create_index('ix_show_venue_id_start_time', 'Show', ['venue_id', 'start_time'], unique=False)
+    op.create_index('ix_show_artist_id_start_time', 'Show', ['artist_id', 'start_time'], unique=False)
+    op.execute('CREATE INDEX ix_show_upcoming_start_time ON "Show" (start_time) WHERE NOT is_past')
+    op.execute('ALTER TABLE "Show" ADD CONSTRAINT ex_show_venue_booking '
+               'EXCLUDE USING gist (venue_id WITH =, tsrange(start_time, end_time) WITH &&)')
@@ -0,0 +1,32 @@
+"""added trigram indexes on venue and artist names
+
+Revision ID: 5e2b7c1d9a3f
+Revises: 88b80454603b
+Create Date: 2026-10-18 10:12:40.118204
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '5e2b7c1d9a3f'
+down_revision = '88b80454603b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    # built without blocking writes to Venue and Artist
+    with op.get_context().autocommit_block():
+        op.create_index('ix_venue_name_trgm', 'Venue', ['name'], unique=False,
+                        postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'},
+                        postgresql_concurrently=True)
+        op.create_index('ix_artist_name_trgm', 'Artist', ['name'], unique=False,
+                        postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'},
+                        postgresql_concurrently=True)
+
+
+def downgrade():
+    op.drop_index('ix_artist_name_trgm', table_name='Artist')
+    op.drop_index('ix_venue_name_trgm', table_name='Venue')
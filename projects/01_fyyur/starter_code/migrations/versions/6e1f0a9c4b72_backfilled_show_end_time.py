@@ -0,0 +1,29 @@
+"""backfilled show end_time
+
+Revision ID: 6e1f0a9c4b72
+Revises: f1c84d2b6e07
+Create Date: 2026-10-18 15:41:08.215603
+
+"""
+from alembic import op
+from flask import current_app
+
+from backfill import forget_backfills, run_backfill
+
+
+# revision identifiers, used by Alembic.
+revision = '6e1f0a9c4b72'
+down_revision = 'f1c84d2b6e07'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # existing shows get the same default length as new bookings
+    minutes = current_app.config['SHOW_DEFAULT_MINUTES']
+    run_backfill('show_end_time', 'Show', "end_time = start_time + interval '%d minutes'" % minutes,
+                 where='end_time IS NULL')
+
+
+def downgrade():
+    forget_backfills('show_end_time')
@@ -0,0 +1,47 @@
+"""added venue and artist page views
+
+Revision ID: 7d2b5e9f3a61
+Revises: 4c8e1a6f2b90
+Create Date: 2026-10-18 23:12:45.381027
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7d2b5e9f3a61'
+down_revision = '4c8e1a6f2b90'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # new tables, written by the app's page view buffers
+    op.create_table('VenueView',
+    sa.Column('venue_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('views', sa.Integer(), nullable=False),
+    sa.Column('visitors', sa.Integer(), nullable=False),
+    sa.Column('visitor_sketch', sa.LargeBinary(), nullable=False),
+    sa.ForeignKeyConstraint(['venue_id'], ['Venue.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('venue_id', 'day')
+    )
+    op.create_index('ix_venue_view_day', 'VenueView', ['day', 'venue_id', 'visitors'], unique=False)
+    op.create_table('ArtistView',
+    sa.Column('artist_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('views', sa.Integer(), nullable=False),
+    sa.Column('visitors', sa.Integer(), nullable=False),
+    sa.Column('visitor_sketch', sa.LargeBinary(), nullable=False),
+    sa.ForeignKeyConstraint(['artist_id'], ['Artist.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('artist_id', 'day')
+    )
+    op.create_index('ix_artist_view_day', 'ArtistView', ['day', 'artist_id', 'visitors'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_artist_view_day', table_name='ArtistView')
+    op.drop_table('ArtistView')
+    op.drop_index('ix_venue_view_day', table_name='VenueView')
+    op.drop_table('VenueView')
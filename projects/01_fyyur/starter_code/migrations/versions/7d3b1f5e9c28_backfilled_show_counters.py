@@ -0,0 +1,44 @@
+"""backfilled show is_past and the venue and artist show counters
+
+Revision ID: 7d3b1f5e9c28
+Revises: 0b9e7d4c3a21
+Create Date: 2026-10-18 18:05:42.318806
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from backfill import forget_backfills, run_backfill
+
+
+# revision identifiers, used by Alembic.
+revision = '7d3b1f5e9c28'
+down_revision = '0b9e7d4c3a21'
+branch_labels = None
+depends_on = None
+
+COUNTS = (
+    'upcoming_shows_count = (SELECT count(*) FROM "Show" WHERE {column} = "{table}".id AND NOT is_past), '
+    'past_shows_count = (SELECT count(*) FROM "Show" WHERE {column} = "{table}".id AND is_past)'
+)
+
+BACKFILLS = ('show_is_past', 'venue_show_counts', 'artist_show_counts')
+
+
+def upgrade():
+    # new shows are marked and counted by the app from 0b9e7d4c3a21 on; these
+    # only touch rows from before it. Run flask repair-show-counts afterwards
+    # to settle any show added while a batch was counting
+    run_backfill('show_is_past', 'Show', 'is_past = true', where='start_time <= now() AND NOT is_past')
+    for (table, column) in (('Venue', 'venue_id'), ('Artist', 'artist_id')):
+        run_backfill('%s_show_counts' % table.lower(), table, COUNTS.format(table=table, column=column))
+
+    # built after the backfill, so it only holds upcoming shows
+    with op.get_context().autocommit_block():
+        op.create_index('ix_show_upcoming_start_time', 'Show', ['start_time'], unique=False,
+                        postgresql_where=sa.text('NOT is_past'), postgresql_concurrently=True)
+
+
+def downgrade():
+    op.drop_index('ix_show_upcoming_start_time', table_name='Show')
+    forget_backfills(*BACKFILLS)
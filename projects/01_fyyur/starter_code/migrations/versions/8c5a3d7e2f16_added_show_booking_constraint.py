@@ -0,0 +1,47 @@
+"""made show end_time required and added a constraint against double bookings
+
+Revision ID: 8c5a3d7e2f16
+Revises: 6e1f0a9c4b72
+Create Date: 2026-10-18 15:48:37.902114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from backfill import set_lock_timeout
+
+
+# revision identifiers, used by Alembic.
+revision = '8c5a3d7e2f16'
+down_revision = '6e1f0a9c4b72'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # NOT NULL would scan the table under an exclusive lock; a check added
+    # NOT VALID is validated with writes still going, and then lets SET NOT
+    # NULL skip the scan. The check is committed before it is validated, so
+    # one left by an interrupted run is replaced
+    set_lock_timeout()
+    op.execute('ALTER TABLE "Show" DROP CONSTRAINT IF EXISTS ck_show_end_time_not_null, '
+               'ADD CONSTRAINT ck_show_end_time_not_null CHECK (end_time IS NOT NULL) NOT VALID')
+    with op.get_context().autocommit_block():
+        op.execute('ALTER TABLE "Show" VALIDATE CONSTRAINT ck_show_end_time_not_null')
+    set_lock_timeout()
+    op.alter_column('Show', 'end_time', nullable=False)
+    op.execute('ALTER TABLE "Show" DROP CONSTRAINT ck_show_end_time_not_null')
+
+    # fails if a venue already has overlapping shows; move or remove those
+    # first. btree_gist lets the venue_id equality share a gist index with the
+    # time range overlap. An exclusion constraint cannot be built
+    # concurrently, so writes to Show wait for its index
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    op.execute('ALTER TABLE "Show" ADD CONSTRAINT ex_show_venue_booking '
+               'EXCLUDE USING gist (venue_id WITH =, tsrange(start_time, end_time) WITH &&)')
+
+
+def downgrade():
+    set_lock_timeout()
+    op.execute('ALTER TABLE "Show" DROP CONSTRAINT ex_show_venue_booking')
+    op.alter_column('Show', 'end_time', nullable=True)
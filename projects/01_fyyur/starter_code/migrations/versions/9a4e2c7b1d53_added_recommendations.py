@@ -0,0 +1,45 @@
+"""added recommended venues and artists
+
+Revision ID: 9a4e2c7b1d53
+Revises: 2f6a8c0d4e19
+Create Date: 2026-10-18 20:41:07.218554
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9a4e2c7b1d53'
+down_revision = '2f6a8c0d4e19'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # new tables, filled by `flask recommend` and then kept by the app
+    op.create_table('RecommendedVenue',
+    sa.Column('artist_id', sa.Integer(), nullable=False),
+    sa.Column('venue_id', sa.Integer(), nullable=False),
+    sa.Column('score', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['artist_id'], ['Artist.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['venue_id'], ['Venue.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('artist_id', 'venue_id')
+    )
+    op.create_index('ix_recommended_venue_venue_id', 'RecommendedVenue', ['venue_id'], unique=False)
+    op.create_table('RecommendedArtist',
+    sa.Column('venue_id', sa.Integer(), nullable=False),
+    sa.Column('artist_id', sa.Integer(), nullable=False),
+    sa.Column('score', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['artist_id'], ['Artist.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['venue_id'], ['Venue.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('venue_id', 'artist_id')
+    )
+    op.create_index('ix_recommended_artist_artist_id', 'RecommendedArtist', ['artist_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_recommended_artist_artist_id', table_name='RecommendedArtist')
+    op.drop_table('RecommendedArtist')
+    op.drop_index('ix_recommended_venue_venue_id', table_name='RecommendedVenue')
+    op.drop_table('RecommendedVenue')
@@ -0,0 +1,29 @@
+"""added composite show indexes for venue and artist pages
+
+Revision ID: a41f6e0c2d87
+Revises: 5e2b7c1d9a3f
+Create Date: 2026-10-18 11:02:15.403391
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'a41f6e0c2d87'
+down_revision = '5e2b7c1d9a3f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # built without blocking writes to Show
+    with op.get_context().autocommit_block():
+        op.create_index('ix_show_venue_id_start_time', 'Show', ['venue_id', 'start_time'], unique=False,
+                        postgresql_concurrently=True)
+        op.create_index('ix_show_artist_id_start_time', 'Show', ['artist_id', 'start_time'], unique=False,
+                        postgresql_concurrently=True)
+
+
+def downgrade():
+    op.drop_index('ix_show_artist_id_start_time', table_name='Show')
+    op.drop_index('ix_show_venue_id_start_time', table_name='Show')
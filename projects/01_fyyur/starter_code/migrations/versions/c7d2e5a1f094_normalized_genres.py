@@ -0,0 +1,99 @@
+"""normalized venue and artist genres into an indexed Genre table
+
+Revision ID: c7d2e5a1f094
+Revises: a41f6e0c2d87
+Create Date: 2026-10-18 12:20:31.574120
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7d2e5a1f094'
+down_revision = 'a41f6e0c2d87'
+branch_labels = None
+depends_on = None
+
+GENRES = [
+    'Alternative', 'Blues', 'Classical', 'Country', 'Electronic', 'Folk',
+    'Funk', 'Hip-Hop', 'Heavy Metal', 'Instrumental', 'Jazz',
+    'Musical Theatre', 'Pop', 'Punk', 'R&B', 'Reggae', 'Rock n Roll', 'Soul',
+    'Other',
+]
+
+# genres were written as '{Jazz,"Rock n Roll"}' whether the column held a
+# varchar or an array; split that text back into clean, distinct names
+CLEAN_GENRES = """
+    SELECT DISTINCT e.id AS entity_id, btrim(part, ' "') AS name
+    FROM "{table}" e,
+         regexp_split_to_table(btrim(e.genres::text, '{{}}'), ',') AS part
+    WHERE e.genres IS NOT NULL AND btrim(part, ' "') <> ''
+"""
+
+
+def upgrade():
+    genre = op.create_table('Genre',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=120), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    op.create_table('VenueGenre',
+    sa.Column('venue_id', sa.Integer(), nullable=False),
+    sa.Column('genre_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['genre_id'], ['Genre.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['venue_id'], ['Venue.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('venue_id', 'genre_id')
+    )
+    op.create_index('ix_venue_genre_genre_id', 'VenueGenre', ['genre_id', 'venue_id'], unique=False)
+    op.create_table('ArtistGenre',
+    sa.Column('artist_id', sa.Integer(), nullable=False),
+    sa.Column('genre_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['artist_id'], ['Artist.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['genre_id'], ['Genre.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('artist_id', 'genre_id')
+    )
+    op.create_index('ix_artist_genre_genre_id', 'ArtistGenre', ['genre_id', 'artist_id'], unique=False)
+
+    op.bulk_insert(genre, [{'name': name} for name in GENRES])
+
+    for (table, association, column) in (('Venue', 'VenueGenre', 'venue_id'),
+                                         ('Artist', 'ArtistGenre', 'artist_id')):
+        clean = CLEAN_GENRES.format(table=table)
+        # keep names outside the standard list rather than dropping data
+        op.execute("""
+            INSERT INTO "Genre" (name)
+            SELECT DISTINCT c.name FROM ({clean}) c
+            WHERE NOT EXISTS (SELECT 1 FROM "Genre" g WHERE lower(g.name) = lower(c.name))
+        """.format(clean=clean))
+        op.execute("""
+            INSERT INTO "{association}" ({column}, genre_id)
+            SELECT DISTINCT c.entity_id, min(g.id)
+            FROM ({clean}) c JOIN "Genre" g ON lower(g.name) = lower(c.name)
+            GROUP BY c.entity_id, lower(c.name)
+        """.format(association=association, column=column, clean=clean))
+
+    op.drop_column('Venue', 'genres')
+    op.drop_column('Artist', 'genres')
+
+
+def downgrade():
+    op.add_column('Artist', sa.Column('genres', sa.VARCHAR(length=120), autoincrement=False, nullable=True))
+    op.add_column('Venue', sa.Column('genres', sa.VARCHAR(length=120), autoincrement=False, nullable=True))
+
+    for (table, association, column) in (('Venue', 'VenueGenre', 'venue_id'),
+                                         ('Artist', 'ArtistGenre', 'artist_id')):
+        op.execute("""
+            UPDATE "{table}" e SET genres = (
+                SELECT '{{' || string_agg(g.name, ',' ORDER BY g.id) || '}}'
+                FROM "{association}" a JOIN "Genre" g ON g.id = a.genre_id
+                WHERE a.{column} = e.id
+            )
+        """.format(table=table, association=association, column=column))
+
+    op.drop_index('ix_artist_genre_genre_id', table_name='ArtistGenre')
+    op.drop_table('ArtistGenre')
+    op.drop_index('ix_venue_genre_genre_id', table_name='VenueGenre')
+    op.drop_table('VenueGenre')
+    op.drop_table('Genre')
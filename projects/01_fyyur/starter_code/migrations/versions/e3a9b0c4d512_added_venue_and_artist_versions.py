@@ -0,0 +1,38 @@
+"""added version and updated_at to venue and artist
+
+Revision ID: e3a9b0c4d512
+Revises: c7d2e5a1f094
+Create Date: 2026-10-18 13:41:07.266830
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e3a9b0c4d512'
+down_revision = 'c7d2e5a1f094'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('Venue', 'Artist'):
+        op.add_column(table, sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), server_default=sa.func.now(), nullable=False))
+
+    # built without blocking writes to Venue and Artist; safe to rerun
+    with op.get_context().autocommit_block():
+        for table in ('Venue', 'Artist'):
+            op.execute('CREATE INDEX CONCURRENTLY IF NOT EXISTS "ix_%s_updated_at" ON "%s" (updated_at)'
+                       % (table, table))
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for table in ('Artist', 'Venue'):
+            op.execute('DROP INDEX CONCURRENTLY IF EXISTS "ix_%s_updated_at"' % table)
+
+    for table in ('Artist', 'Venue'):
+        op.drop_column(table, 'updated_at')
+        op.drop_column(table, 'version')
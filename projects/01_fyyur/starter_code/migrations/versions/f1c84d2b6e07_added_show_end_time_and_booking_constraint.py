@@ -0,0 +1,30 @@
+"""added show end_time
+
+Revision ID: f1c84d2b6e07
+Revises: e3a9b0c4d512
+Create Date: 2026-10-18 15:02:51.730114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from backfill import set_lock_timeout
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1c84d2b6e07'
+down_revision = 'e3a9b0c4d512'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # nullable and without a default, so only the catalog changes; the app
+    # writes end_time for new shows from here on. Existing shows are filled in
+    # by 6e1f0a9c4b72, and the constraints added by 8c5a3d7e2f16
+    set_lock_timeout()
+    op.add_column('Show', sa.Column('end_time', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('Show', 'end_time')
@@ -0,0 +1,1225 @@
+import heapq
+import uuid
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.schema import PrimaryKeyConstraint
+from cache import ReadThroughCache
+from pageviews import HyperLogLog, ViewBuffer
+from search import NGramIndex, PrefixIndex, trigram_search
+from paging import keyset
+from filters import format_datetime
+import geo
+import partitions
+from routing import RoutingSQLAlchemy
+
+db = RoutingSQLAlchemy()
+
+#----------------------------------------------------------------------------#
+# Models.
+#----------------------------------------------------------------------------#
+class Genre(db.Model):
+  __tablename__ = 'Genre'
+
+  id = db.Column(db.Integer, primary_key=True)
+  name = db.Column(db.String(120), nullable=False, unique=True)
+
+# genre associations, indexed both ways so listings can filter by genre
+venue_genres = db.Table('VenueGenre',
+  db.Column('venue_id', db.Integer, db.ForeignKey('Venue.id', ondelete='CASCADE'), primary_key=True),
+  db.Column('genre_id', db.Integer, db.ForeignKey('Genre.id', ondelete='CASCADE'), primary_key=True),
+  db.Index('ix_venue_genre_genre_id', 'genre_id', 'venue_id')
+)
+
+artist_genres = db.Table('ArtistGenre',
+  db.Column('artist_id', db.Integer, db.ForeignKey('Artist.id', ondelete='CASCADE'), primary_key=True),
+  db.Column('genre_id', db.Integer, db.ForeignKey('Genre.id', ondelete='CASCADE'), primary_key=True),
+  db.Index('ix_artist_genre_genre_id', 'genre_id', 'artist_id')
+)
+
+class Venue(db.Model):
+    __tablename__ = 'Venue'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String)
+    city = db.Column(db.String(120))
+    state = db.Column(db.String(120))
+    address = db.Column(db.String(120))
+    phone = db.Column(db.String(120))
+    image_link = db.Column(db.String(500))
+    facebook_link = db.Column(db.String(120))
+
+    # TODO: implement any missing fields, as a database migration using Flask-Migrate
+    genres = db.relationship('Genre', secondary=venue_genres, order_by=Genre.id)
+    site_link = db.Column(db.String(120))
+    seeking_talent = db.Column(db.String, nullable=True)
+    seeking_description = db.Column(db.String, nullable=True)
+
+    # Shows Relationship
+    shows = db.relationship('Show', backref='venue')
+
+    # denormalized show counts, kept by count_shows and roll_past_shows
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    # bumped on every change to the venue or its shows, see bump_versions
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now,
+      server_default=db.func.now(), index=True)
+
+    # the centre of the venue's city from the gazetteer (see locate_venue),
+    # and its geohash for /venues/nearby
+    latitude = db.Column(db.Float)
+    longitude = db.Column(db.Float)
+    geohash = db.Column(db.String(12))
+
+    # trigram index for fuzzy search, see migration 5e2b7c1d9a3f; geohash
+    # prefixes are looked up with LIKE 'prefix%'
+    __table_args__ = (
+      db.Index('ix_venue_name_trgm', 'name',
+        postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+      db.Index('ix_venue_geohash', 'geohash', postgresql_ops={'geohash': 'varchar_pattern_ops'}),
+    )
+
+class Artist(db.Model):
+    __tablename__ = 'Artist'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String)
+    city = db.Column(db.String(120))
+    state = db.Column(db.String(120))
+    phone = db.Column(db.String(120))
+    genres = db.relationship('Genre', secondary=artist_genres, order_by=Genre.id)
+    image_link = db.Column(db.String(500))
+    facebook_link = db.Column(db.String(120))
+
+    # TODO: implement any missing fields, as a database migration using Flask-Migrate
+    site_link = db.Column(db.String(120), nullable=True)
+    seeking_venue = db.Column(db.Boolean, default=False)
+    seeking_description = db.Column(db.String)
+    
+    # Shows one-to-many relationship
+    shows = db.relationship('Show', backref='artist')
+
+    # denormalized show counts, kept by count_shows and roll_past_shows
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    # bumped on every change to the artist or its shows, see bump_versions
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now,
+      server_default=db.func.now(), index=True)
+
+    # trigram index for fuzzy search, see migration 5e2b7c1d9a3f
+    __table_args__ = (
+      db.Index('ix_artist_name_trgm', 'name',
+        postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+    )
+
+# TODO Implement Show and Artist models, and complete all model relationships and properties, as a database migration.
+def default_end_time(context):
+  start_time = context.get_current_parameters()['start_time']
+  return start_time + timedelta(minutes=current_app.config['SHOW_DEFAULT_MINUTES'])
+
+class Show(db.Model):
+  __tablename__ = 'Show'
+
+  id = db.Column(db.Integer, primary_key=True)
+  artist_id = db.Column(db.Integer, db.ForeignKey(Artist.id))
+  venue_id = db.Column(db.Integer, db.ForeignKey(Venue.id))
+  start_time = db.Column(db.DateTime, nullable=False)
+  end_time = db.Column(db.DateTime, nullable=False, default=default_end_time)
+  # whether the show is counted in past_shows_count rather than
+  # upcoming_shows_count; set on insert and by roll_past_shows
+  is_past = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
+  # tickets on sale, split into TicketInventory rows; None when not selling
+  capacity = db.Column(db.Integer)
+
+  # detail pages read one entity's shows in start_time order. On postgres the
+  # table is partitioned by month of start_time (see partitions.py), and each
+  # partition's ex_<partition>_booking exclusion constraint (see migrations)
+  # also rejects overlapping shows at one venue.
+  __table_args__ = (
+    db.Index('ix_show_venue_id_start_time', 'venue_id', 'start_time'),
+    db.Index('ix_show_artist_id_start_time', 'artist_id', 'start_time'),
+    {'postgresql_partition_by': 'RANGE (start_time)'},
+  )
+
+# the shows roll_past_shows still has to move, in start_time order
+db.Index('ix_show_upcoming_start_time', Show.start_time,
+  postgresql_where=db.not_(Show.is_past), sqlite_where=db.not_(Show.is_past))
+
+@compiles(PrimaryKeyConstraint, 'postgresql')
+def compile_primary_key(constraint, compiler, **kw):
+  # a partitioned table's primary key has to include the partition key; ids
+  # still come from one sequence, so id alone stays unique
+  if constraint.table is Show.__table__:
+    return 'PRIMARY KEY (id, start_time)'
+  return compiler.visit_primary_key_constraint(constraint, **kw)
+
+@event.listens_for(Show.__table__, 'after_create')
+def create_show_partitions(table, connection, **kw):
+  # db.create_all() makes the partitions `flask partition-shows` would; an
+  # empty table has no shows to move into them
+  if connection.dialect.name == 'postgresql':
+    statements = partitions.create_default()
+    for month in partitions.planned_months(datetime.now(), current_app.config['SHOW_PARTITION_MONTHS_AHEAD']):
+      statements += partitions.create_partition(month, booking=False)
+    for statement in statements:
+      connection.execute(statement)
+
+# the venues recommended to each artist and the artists recommended to each
+# venue, with their genre similarity; kept by recommend()
+recommended_venues = db.Table('RecommendedVenue',
+  db.Column('artist_id', db.Integer, db.ForeignKey('Artist.id', ondelete='CASCADE'), primary_key=True),
+  db.Column('venue_id', db.Integer, db.ForeignKey('Venue.id', ondelete='CASCADE'), primary_key=True),
+  db.Column('score', db.Float, nullable=False),
+  db.Index('ix_recommended_venue_venue_id', 'venue_id')
+)
+
+recommended_artists = db.Table('RecommendedArtist',
+  db.Column('venue_id', db.Integer, db.ForeignKey('Venue.id', ondelete='CASCADE'), primary_key=True),
+  db.Column('artist_id', db.Integer, db.ForeignKey('Artist.id', ondelete='CASCADE'), primary_key=True),
+  db.Column('score', db.Float, nullable=False),
+  db.Index('ix_recommended_artist_artist_id', 'artist_id')
+)
+
+# views and unique visitors of each venue and artist page a day, added to
+# from every worker's page_views buffer
+venue_views = db.Table('VenueView',
+  db.Column('venue_id', db.Integer, db.ForeignKey('Venue.id', ondelete='CASCADE'), primary_key=True),
+  db.Column('day', db.Date, primary_key=True),
+  db.Column('views', db.Integer, nullable=False),
+  db.Column('visitors', db.Integer, nullable=False),
+  db.Column('visitor_sketch', db.LargeBinary, nullable=False),
+  db.Index('ix_venue_view_day', 'day', 'venue_id', 'visitors')
+)
+
+artist_views = db.Table('ArtistView',
+  db.Column('artist_id', db.Integer, db.ForeignKey('Artist.id', ondelete='CASCADE'), primary_key=True),
+  db.Column('day', db.Date, primary_key=True),
+  db.Column('views', db.Integer, nullable=False),
+  db.Column('visitors', db.Integer, nullable=False),
+  db.Column('visitor_sketch', db.LargeBinary, nullable=False),
+  db.Index('ix_artist_view_day', 'day', 'artist_id', 'visitors')
+)
+
+# a show's unsold tickets, split over up to TICKET_BUCKETS rows so buyers
+# racing for one show lock different rows. Show ids are only unique together
+# with start_time on postgres, where Show is partitioned, so neither table
+# has a foreign key to it.
+ticket_inventory = db.Table('TicketInventory',
+  db.Column('show_id', db.Integer, primary_key=True),
+  db.Column('bucket', db.Integer, primary_key=True),
+  db.Column('remaining', db.Integer, nullable=False),
+  db.CheckConstraint('remaining >= 0', name='ck_ticket_inventory_remaining')
+)
+
+# tickets taken from a bucket: 'held' until confirmed or expires_at, then
+# 'confirmed', or 'released' or 'expired' with the tickets put back
+ticket_reservations = db.Table('TicketReservation',
+  db.Column('id', db.String(32), primary_key=True),
+  db.Column('show_id', db.Integer, nullable=False),
+  db.Column('bucket', db.Integer, nullable=False),
+  db.Column('quantity', db.Integer, nullable=False),
+  db.Column('status', db.String(10), nullable=False),
+  db.Column('expires_at', db.DateTime, nullable=False),
+  db.Column('created_at', db.DateTime, nullable=False)
+)
+
+HELD = 'held'
+
+# the held reservations expire_reservations() still has to return
+db.Index('ix_ticket_reservation_held_expires_at', ticket_reservations.c.expires_at,
+  postgresql_where=ticket_reservations.c.status == HELD, sqlite_where=ticket_reservations.c.status == HELD)
+
+
+#----------------------------------------------------------------------------#
+# Queries.
+#----------------------------------------------------------------------------#
+
+# public field names of each model, shared by the HTML pages and the JSON
+# API, which selects only the columns a request asks for
+VENUE_FIELDS = {
+  'id': Venue.id,
+  'name': Venue.name,
+  'city': Venue.city,
+  'state': Venue.state,
+  'address': Venue.address,
+  'phone': Venue.phone,
+  'website': Venue.site_link,
+  'facebook_link': Venue.facebook_link,
+  'seeking_talent': Venue.seeking_talent,
+  'seeking_description': Venue.seeking_description,
+  'image_link': Venue.image_link,
+  'upcoming_shows_count': Venue.upcoming_shows_count,
+  'past_shows_count': Venue.past_shows_count,
+  'latitude': Venue.latitude,
+  'longitude': Venue.longitude,
+}
+
+ARTIST_FIELDS = {
+  'id': Artist.id,
+  'name': Artist.name,
+  'city': Artist.city,
+  'state': Artist.state,
+  'phone': Artist.phone,
+  'website': Artist.site_link,
+  'facebook_link': Artist.facebook_link,
+  'seeking_venue': Artist.seeking_venue,
+  'seeking_description': Artist.seeking_description,
+  'image_link': Artist.image_link,
+  'upcoming_shows_count': Artist.upcoming_shows_count,
+  'past_shows_count': Artist.past_shows_count,
+}
+
+SHOW_FIELDS = {
+  'id': Show.id,
+  'start_time': Show.start_time,
+  'end_time': Show.end_time,
+  'artist_id': Show.artist_id,
+  'artist_name': Artist.name,
+  'artist_image_link': Artist.image_link,
+  'venue_id': Show.venue_id,
+  'venue_name': Venue.name,
+}
+
+genre_links = {
+  Venue: (venue_genres, venue_genres.c.venue_id),
+  Artist: (artist_genres, artist_genres.c.artist_id),
+}
+
+def select(fields, names):
+  return [fields[name].label(name) for name in names]
+
+def with_genre(query, onclause, association, genre):
+  # restricts query to rows tagged with the named genre, through the
+  # (genre_id, entity_id) index on the association table
+  return query.join(association, onclause)\
+    .join(Genre, association.c.genre_id == Genre.id)\
+    .filter(Genre.name == genre)
+
+def entity_query(model, columns, genre=None):
+  # venues or artists, optionally only those tagged with the named genre
+  query = db.session.query(*columns)
+  if genre is not None:
+    (association, column) = genre_links[model]
+    query = with_genre(query, column == model.id, association, genre)
+  return query
+
+def load_areas(genre=None):
+  # one query for every venue, grouped into areas in python
+  rows = entity_query(Venue, select(VENUE_FIELDS, ('city', 'state', 'id', 'name', 'upcoming_shows_count')), genre)\
+    .order_by(Venue.state, Venue.city, Venue.name).all()
+
+  areas = []
+  for (city, state, vid, name, num_upcoming_shows) in rows:
+    if not areas or (areas[-1]['city'], areas[-1]['state']) != (city, state):
+      areas.append({'city': city, 'state': state, 'venues': []})
+    areas[-1]['venues'].append({
+      'id': vid,
+      'name': name,
+      'num_upcoming_shows': num_upcoming_shows
+    })
+
+  return areas
+
+def load_artists(genre=None):
+  return entity_query(Artist, select(ARTIST_FIELDS, ('id', 'name')), genre)\
+    .order_by(Artist.name).all()
+
+def load_genre_names(model, ids):
+  # {id: [genre name, ...]} for a page of venues or artists, in one query
+  (association, column) = genre_links[model]
+  names = dict((id, []) for id in ids)
+  if ids:
+    rows = db.session.query(column, Genre.name)\
+      .join(Genre, association.c.genre_id == Genre.id)\
+      .filter(column.in_(ids))\
+      .order_by(column, Genre.id)
+    for (id, name) in rows:
+      names[id].append(name)
+  return names
+
+def load_genre_choices():
+  return [(name, name) for (name,) in db.session.query(Genre.name).order_by(Genre.id)]
+
+def find_genres(names):
+  return Genre.query.filter(Genre.name.in_(names)).all() if names else []
+
+def load_show_sections(own_column, entity_id, counterpart, counterpart_column, prefix, limit=None):
+  # upcoming and past shows of one venue or artist, with the name and image
+  # of the artist or venue on the other side, split at now()
+  limit = min(limit or current_app.config['DETAIL_SHOWS_LIMIT'], current_app.config['DETAIL_SHOWS_LIMIT'])
+  now = datetime.now()
+  shows = db.session.query(
+    Show.start_time,
+    counterpart.id,
+    counterpart.name,
+    counterpart.image_link
+  ).join(counterpart, counterpart_column == counterpart.id)\
+    .filter(own_column == entity_id)
+
+  upcoming = shows.filter(Show.start_time > now)\
+    .order_by(Show.start_time).limit(limit).all()
+  past = shows.filter(Show.start_time <= now)\
+    .order_by(Show.start_time.desc()).limit(limit).all()
+
+  def section(rows):
+    return [{
+      'start_time': start_time,
+      prefix + '_id': id,
+      prefix + '_name': name,
+      prefix + '_image_link': image_link
+    } for (start_time, id, name, image_link) in rows]
+
+  return {
+    'upcoming_shows': section(upcoming),
+    'past_shows': section(past)
+  }
+
+def show_query(columns, start=None, end=None):
+  # shows starting in [start, end), joined to their artist and venue
+  shows = db.session.query(*columns)\
+    .join(Artist, Show.artist_id == Artist.id)\
+    .join(Venue, Show.venue_id == Venue.id)
+  if start is not None:
+    shows = shows.filter(Show.start_time >= start)
+  if end is not None:
+    shows = shows.filter(Show.start_time < end)
+  return shows
+
+def show_window(args):
+  # the ?from= and ?to= dates of a show listing; ValueError if malformed
+  return tuple(datetime.fromisoformat(args[arg]) if args.get(arg) else None
+    for arg in ('from', 'to'))
+
+def load_shows(start=None, end=None, after=None):
+  # only the columns the listing shows, so no relationship is ever lazy-loaded
+  columns = select(SHOW_FIELDS, ('id', 'start_time', 'artist_id', 'artist_name',
+    'artist_image_link', 'venue_id', 'venue_name'))
+  return keyset(show_query(columns, start, end), (Show.start_time, Show.id), after)
+
+def format_show(row):
+  return {
+    'start_time': row.start_time,
+    'artist_name': row.artist_name,
+    'artist_id': row.artist_id,
+    'artist_image_link': row.artist_image_link,
+    'venue_id': row.venue_id,
+    'venue_name': row.venue_name,
+  }
+
+class BookingConflict(Exception):
+  def __init__(self, shows):
+    self.shows = shows
+    Exception.__init__(self, 'The venue is already booked %s' % ', '.join(
+      'from %s to %s' % (format_datetime(show.start_time), format_datetime(show.end_time))
+      for show in shows))
+
+def find_conflicts(venue_id, start, end):
+  # shows last at most SHOW_MAX_MINUTES, so only those starting in that
+  # window before `end` can overlap: a bounded range on ix_show_venue_id_start_time
+  # however many shows the venue has had
+  earliest = start - timedelta(minutes=current_app.config['SHOW_MAX_MINUTES'])
+  return Show.query.filter(
+    Show.venue_id == venue_id,
+    Show.start_time > earliest,
+    Show.start_time < end,
+    Show.end_time > start
+  ).order_by(Show.start_time).all()
+
+def book_show(artist_id, venue_id, start, end, capacity=None):
+  '''
+  Adds a show unless it overlaps another show at the venue, raising
+  BookingConflict if it does, with capacity tickets on sale if given.
+  Commits.
+  '''
+  if not start < end <= start + timedelta(minutes=current_app.config['SHOW_MAX_MINUTES']):
+    raise ValueError('show must last between 1 and %d minutes' % current_app.config['SHOW_MAX_MINUTES'])
+  # claim the venue row first, so concurrent bookings for the same venue
+  # (a row lock on postgres, the write lock on sqlite) wait here until this
+  # one commits and then see its show
+  bump(Venue, [venue_id], datetime.now())
+  conflicts = find_conflicts(venue_id, start, end)
+  if conflicts:
+    raise BookingConflict(conflicts)
+  show = Show(artist_id=artist_id, venue_id=venue_id, start_time=start, end_time=end)
+  db.session.add(show)
+  try:
+    if capacity is not None:
+      db.session.flush()
+      open_ticket_sales(show, capacity)
+    db.session.commit()
+  except IntegrityError as e:
+    if getattr(e.orig, 'pgcode', None) != '23P01':  # exclusion_violation
+      raise
+    db.session.rollback()
+    raise BookingConflict(find_conflicts(venue_id, start, end))
+  return show
+
+class SoldOut(Exception):
+  # available tickets are left in all, at most largest of them in one order
+  def __init__(self, available, largest=None):
+    self.available = available
+    self.largest = available if largest is None else largest
+    if not available:
+      message = 'Sold out'
+    elif self.largest < available:
+      message = 'Only %d tickets left, at most %d in one order' % (available, self.largest)
+    else:
+      message = 'Only %d tickets left' % available
+    Exception.__init__(self, message)
+
+def open_ticket_sales(show, capacity):
+  '''
+  Puts capacity tickets for show on sale, spread evenly over up to
+  TICKET_BUCKETS inventory rows, each starting with room for the largest
+  order. Does not commit.
+  '''
+  if show.capacity is not None:
+    raise ValueError('tickets for show %d are already on sale' % show.id)
+  if capacity < 1:
+    raise ValueError('capacity must be at least 1')
+  buckets = max(1, min(current_app.config['TICKET_BUCKETS'], capacity // current_app.config['TICKETS_PER_ORDER']))
+  show.capacity = capacity
+  db.session.execute(ticket_inventory.insert(), [
+    {'show_id': show.id, 'bucket': bucket, 'remaining': capacity // buckets + (bucket < capacity % buckets)}
+    for bucket in range(buckets)])
+
+def tickets_available(show_id):
+  # None when the show has no tickets on sale
+  return db.session.query(db.func.sum(ticket_inventory.c.remaining))\
+    .filter(ticket_inventory.c.show_id == show_id).scalar()
+
+def sold_out(show_id):
+  # the tickets left, and the most one bucket (so one order) can still take
+  (available, largest) = db.session.query(db.func.sum(ticket_inventory.c.remaining),
+      db.func.max(ticket_inventory.c.remaining))\
+    .filter(ticket_inventory.c.show_id == show_id).one()
+  return SoldOut(available or 0, largest or 0)
+
+def claim_bucket(show_id, quantity, skip_locked):
+  # a bucket of the show with quantity tickets left, locked; a random one, so
+  # buyers spread over the buckets. With skip_locked, buckets other buyers
+  # hold are passed over rather than waited for (postgres only; sqlite
+  # ignores the lock and relies on take_tickets' condition).
+  return db.session.query(ticket_inventory.c.bucket)\
+    .filter(ticket_inventory.c.show_id == show_id, ticket_inventory.c.remaining >= quantity)\
+    .order_by(db.func.random())\
+    .limit(1)\
+    .with_for_update(skip_locked=skip_locked)\
+    .scalar()
+
+def take_tickets(show_id, bucket, quantity):
+  # decrements the bucket only if it still has quantity left, so a stale
+  # claim can never take it below zero
+  return db.session.execute(ticket_inventory.update()
+    .where(db.and_(ticket_inventory.c.show_id == show_id, ticket_inventory.c.bucket == bucket,
+      ticket_inventory.c.remaining >= quantity))
+    .values(remaining=ticket_inventory.c.remaining - quantity)).rowcount == 1
+
+def return_tickets(counts):
+  # {(show_id, bucket): tickets} back into inventory, in one lock order
+  for ((show_id, bucket), quantity) in sorted(counts.items()):
+    db.session.execute(ticket_inventory.update()
+      .where(db.and_(ticket_inventory.c.show_id == show_id, ticket_inventory.c.bucket == bucket))
+      .values(remaining=ticket_inventory.c.remaining + quantity))
+
+def reserve_tickets(show_id, quantity, now=None):
+  '''
+  Holds quantity tickets of a show for TICKET_HOLD_SECONDS and returns
+  (reservation id, expires_at), or raises SoldOut. There is no lock on the
+  show: a buyer locks one inventory bucket, skipping those other buyers
+  have locked, and only waits for a locked one when no other bucket has
+  enough left. Expired holds of the show are returned (and committed)
+  before it is called sold out. An order comes out of a single bucket, so
+  the last tickets may only sell in smaller orders. Commits.
+  '''
+  now = now or datetime.now()
+  (skip_locked, expired) = (True, False)
+  while True:
+    bucket = claim_bucket(show_id, quantity, skip_locked)
+    if bucket is not None and take_tickets(show_id, bucket, quantity):
+      break
+    if skip_locked:
+      skip_locked = False
+    elif not expired and expire_reservations(show_id, now):
+      # commits the buckets expiry locked, which are taken in their own
+      # order, before waiting on another
+      db.session.commit()
+      (skip_locked, expired) = (True, True)
+    else:
+      db.session.rollback()
+      raise sold_out(show_id)
+
+  reservation_id = uuid.uuid4().hex
+  expires_at = now + timedelta(seconds=current_app.config['TICKET_HOLD_SECONDS'])
+  db.session.execute(ticket_reservations.insert().values(id=reservation_id, show_id=show_id,
+    bucket=bucket, quantity=quantity, status=HELD, expires_at=expires_at, created_at=now))
+  db.session.commit()
+  return (reservation_id, expires_at)
+
+def confirm_reservation(reservation_id, now=None):
+  '''
+  Marks a held reservation confirmed, unless it has expired; returns
+  whether it was. Commits.
+  '''
+  now = now or datetime.now()
+  confirmed = db.session.execute(ticket_reservations.update()
+    .where(db.and_(ticket_reservations.c.id == reservation_id, ticket_reservations.c.status == HELD,
+      ticket_reservations.c.expires_at > now))
+    .values(status='confirmed')).rowcount == 1
+  db.session.commit()
+  return confirmed
+
+def release_reservation(reservation_id):
+  '''
+  Puts a held reservation's tickets back on sale; returns whether it was
+  still held. Commits.
+  '''
+  row = db.session.query(ticket_reservations.c.show_id, ticket_reservations.c.bucket, ticket_reservations.c.quantity)\
+    .filter(ticket_reservations.c.id == reservation_id, ticket_reservations.c.status == HELD)\
+    .with_for_update().first()
+  released = row is not None and db.session.execute(ticket_reservations.update()
+    .where(db.and_(ticket_reservations.c.id == reservation_id, ticket_reservations.c.status == HELD))
+    .values(status='released')).rowcount == 1
+  if released:
+    return_tickets({(row.show_id, row.bucket): row.quantity})
+  db.session.commit()
+  return released
+
+def expire_reservations(show_id=None, now=None, batch_size=1000):
+  '''
+  Puts the tickets of up to batch_size held reservations that have passed
+  expires_at back on sale, of one show or any; returns how many there were.
+  Reservations another transaction has locked are left for the next call.
+  Does not commit.
+  '''
+  now = now or datetime.now()
+  query = db.session.query(ticket_reservations.c.id, ticket_reservations.c.show_id,
+      ticket_reservations.c.bucket, ticket_reservations.c.quantity)\
+    .filter(ticket_reservations.c.status == HELD, ticket_reservations.c.expires_at <= now)
+  if show_id is not None:
+    query = query.filter(ticket_reservations.c.show_id == show_id)
+  rows = query.order_by(ticket_reservations.c.expires_at).limit(batch_size).with_for_update(skip_locked=True).all()
+  if not rows:
+    return 0
+  expired = db.session.execute(ticket_reservations.update()
+    .where(db.and_(ticket_reservations.c.id.in_([row.id for row in rows]), ticket_reservations.c.status == HELD))
+    .values(status='expired')).rowcount
+  if expired != len(rows):
+    # sqlite takes no row locks; another sweep got here first
+    db.session.rollback()
+    return 0
+  counts = defaultdict(int)
+  for row in rows:
+    counts[(row.show_id, row.bucket)] += row.quantity
+  return_tickets(counts)
+  return len(rows)
+
+def expire_all_reservations(now=None, batch_size=1000):
+  '''
+  Returns every expired hold's tickets, committing a batch at a time.
+  Returns how many reservations expired.
+  '''
+  total = 0
+  while True:
+    expired = expire_reservations(now=now, batch_size=batch_size)
+    db.session.commit()
+    total += expired
+    if expired < batch_size:
+      return total
+
+# ttls are set from the config by init_caches
+area_cache = ReadThroughCache(load_areas)
+
+def load_search_index(model):
+  return NGramIndex(db.session.query(model.id, model.name))
+
+search_indexes = ReadThroughCache(load_search_index, ttl=None)
+
+genre_choices = ReadThroughCache(load_genre_choices, ttl=None)
+
+def load_typeahead_index(model):
+  return PrefixIndex(db.session.query(model.id, model.name))
+
+# kept current by update_typeahead_indexes in this process; the ttl bounds
+# how long other processes' renames take to show up
+typeahead_indexes = ReadThroughCache(load_typeahead_index)
+
+def init_caches(app):
+  area_cache.ttl = app.config['AREA_CACHE_TTL']
+  typeahead_indexes.ttl = app.config['TYPEAHEAD_TTL']
+  trending_scores.ttl = app.config['TRENDING_TTL']
+  page_views.init_app(app, app.config['PAGEVIEW_FLUSH_SECONDS'])
+
+def search_names(model, term, limit=None):
+  limit = min(limit or current_app.config['SEARCH_RESULT_LIMIT'], current_app.config['SEARCH_RESULT_LIMIT'])
+  threshold = current_app.config['SEARCH_SIMILARITY_THRESHOLD']
+  if db.engine.dialect.name == 'postgresql':
+    return trigram_search(db.session, model.id, model.name, term, limit, threshold)
+  return search_indexes.get(model).search(term, limit, threshold)
+
+def gazetteer():
+  return geo.load_gazetteer(current_app.config['GAZETTEER_PATH'])
+
+def find_nearby_venues(latitude, longitude, radius_km, limit):
+  '''
+  [(distance in km, row)] for the venues within radius_km of the point,
+  nearest first. Only venues in the geohash cells around the point are
+  read, through ix_venue_geohash, and measured.
+  '''
+  prefixes = geo.cells(latitude, longitude, radius_km)
+  rows = db.session.query(Venue.id, Venue.name, Venue.city, Venue.state, Venue.latitude, Venue.longitude)\
+    .filter(db.or_(*[Venue.geohash.like(prefix + '%') for prefix in prefixes]))
+  found = []
+  for row in rows:
+    distance = geo.distance_km(latitude, longitude, row.latitude, row.longitude)
+    if distance <= radius_km:
+      found.append((distance, row))
+  return heapq.nsmallest(limit, found, key=lambda item: (item[0], item[1].id))
+
+# (recommended model, table, subject column, recommended column) of each side
+recommendation_links = {
+  Artist: (Venue, recommended_venues, recommended_venues.c.artist_id, recommended_venues.c.venue_id),
+  Venue: (Artist, recommended_artists, recommended_artists.c.venue_id, recommended_artists.c.artist_id),
+}
+
+SEEKING_TALENT = ('y', 'yes', 'true', 't', '1')
+
+def seeking(model):
+  # venues seeking talent and artists seeking venues; seeking_talent is a
+  # string, 'y' from the form
+  if model is Venue:
+    return db.func.lower(Venue.seeking_talent).in_(SEEKING_TALENT)
+  return Artist.seeking_venue == db.true()
+
+def place(model):
+  return (db.func.lower(db.func.trim(model.city)), db.func.lower(db.func.trim(model.state)))
+
+def load_profiles(model, ids=None, places=None):
+  # [(id, (city, state), genre ids)] of the seeking venues or artists with
+  # the given ids or in the given places (or all of them), in one query
+  (association, column) = genre_links[model]
+  (city, state) = place(model)
+  query = db.session.query(model.id, city, state, association.c.genre_id)\
+    .outerjoin(association, column == model.id)\
+    .filter(seeking(model))
+  if ids is not None:
+    query = query.filter(model.id.in_(ids))
+  if places is not None:
+    query = query.filter(db.or_(*[db.and_(city == c, state == s) for (c, s) in places]))
+  profiles = {}
+  for (id, city, state, genre_id) in query:
+    genres = profiles.setdefault(id, ((city, state), set()))[1]
+    if genre_id is not None:
+      genres.add(genre_id)
+  return [(id, where, frozenset(genres)) for (id, (where, genres)) in profiles.items()]
+
+def load_recommended(model, ids=None):
+  # {subject id: [(recommended id, score)]} as stored, best first
+  (counterpart, table, own, other) = recommendation_links[model]
+  query = db.session.query(own, other, table.c.score)
+  if ids is not None:
+    query = query.filter(own.in_(ids))
+  stored = defaultdict(list)
+  for (id, match, score) in query.order_by(own, table.c.score.desc(), other):
+    stored[id].append((match, score))
+  return stored
+
+def recommend(model, ids=None):
+  '''
+  Recomputes the venues recommended to the given artists, or the artists
+  recommended to the given venues (every one of them when ids is None):
+  the RECOMMENDATIONS_LIMIT seeking the other way in the same city and
+  state whose genres are most alike. Rewrites and bumps the version of
+  those whose list changed, and returns how many that was. Does not commit.
+  '''
+  # numpy is only imported once something is recommended
+  from recommend import top_matches
+  (counterpart, table, own, other) = recommendation_links[model]
+  subjects = load_profiles(model, ids)
+  places = set(where for (id, where, genres) in subjects)
+  candidates = load_profiles(counterpart, places=None if ids is None else places) if places else []
+  matches = top_matches(subjects, candidates, current_app.config['RECOMMENDATIONS_LIMIT'])
+
+  stored = load_recommended(model, ids)
+  changed = [id for id in set(stored) | set(matches)
+    if [(match, round(score, 6)) for (match, score) in stored.get(id, ())] !=
+       [(match, round(score, 6)) for (match, score) in matches.get(id, ())]]
+  if changed:
+    db.session.execute(table.delete().where(own.in_(changed)))
+    rows = [{own.key: id, other.key: match, 'score': score}
+      for id in changed for (match, score) in matches.get(id, ())]
+    if rows:
+      db.session.execute(table.insert(), rows)
+    bump(model, changed, datetime.now())
+  return len(changed)
+
+def recommend_all():
+  '''
+  Recomputes every recommendation, then commits. Returns how many artists
+  and venues had their list changed.
+  '''
+  changed = (recommend(Artist), recommend(Venue))
+  db.session.commit()
+  return changed
+
+def load_recommendations(model, entity_id, prefix):
+  # the venues recommended to an artist, or artists to a venue, for its page
+  (counterpart, table, own, other) = recommendation_links[model]
+  rows = db.session.query(counterpart.id, counterpart.name, counterpart.image_link, table.c.score)\
+    .join(table, other == counterpart.id)\
+    .filter(own == entity_id)\
+    .order_by(table.c.score.desc(), counterpart.id)
+  return [{
+    prefix + '_id': id,
+    prefix + '_name': name,
+    prefix + '_image_link': image_link,
+    'score': score
+  } for (id, name, image_link, score) in rows]
+
+page_view_links = {
+  Venue: (venue_views, venue_views.c.venue_id),
+  Artist: (artist_views, artist_views.c.artist_id),
+}
+
+def add_page_views(pending):
+  # see write_page_views; views of venues and artists since deleted are dropped
+  existing = {}
+  for model in page_view_links:
+    ids = set(id for (viewed, id, day) in pending if viewed is model)
+    existing[model] = set(id for (id,) in db.session.query(model.id).filter(model.id.in_(ids))) if ids else set()
+  # rows are locked in the same order by every worker
+  for key in sorted(pending, key=lambda key: (key[0].__tablename__, key[1], key[2])):
+    (model, id, day) = key
+    if id not in existing[model]:
+      continue
+    (views, sketch) = pending[key]
+    (table, column) = page_view_links[model]
+    where = db.and_(column == id, table.c.day == day)
+    row = db.session.execute(db.select([table.c.visitor_sketch]).where(where).with_for_update()).first()
+    if row is None:
+      db.session.execute(table.insert().values({
+        column.key: id, 'day': day, 'views': views,
+        'visitors': sketch.count(), 'visitor_sketch': sketch.to_bytes()
+      }))
+    else:
+      merged = HyperLogLog.from_bytes(row.visitor_sketch).merge(sketch)
+      db.session.execute(table.update().where(where).values(
+        views=table.c.views + views, visitors=merged.count(), visitor_sketch=merged.to_bytes()))
+
+def write_page_views(pending):
+  '''
+  Adds buffered views, {(Venue or Artist, id, day): (views, HyperLogLog of
+  visitors)}, to each day's row in one transaction. Visitor sketches are
+  merged under a row lock, so workers writing the same rows at once lose
+  nothing.
+  '''
+  for attempt in range(2):
+    try:
+      add_page_views(pending)
+      db.session.commit()
+      return
+    except IntegrityError:
+      # another worker inserted one of the rows first; it can be locked now
+      db.session.rollback()
+      if attempt:
+        raise
+
+# counted by the venue and artist pages, written every PAGEVIEW_FLUSH_SECONDS
+page_views = ViewBuffer(write_page_views)
+
+def load_trending(model):
+  '''
+  (when, {id: score}) for the venues or artists viewed in the last
+  TRENDING_DAYS: their unique visitors each day, weighted by half for every
+  TRENDING_HALF_LIFE_DAYS since. One grouped query over the day index.
+  '''
+  (table, column) = page_view_links[model]
+  today = date.today()
+  days = current_app.config['TRENDING_DAYS']
+  half_life = current_app.config['TRENDING_HALF_LIFE_DAYS']
+  weight = db.case([(table.c.day == today - timedelta(days=age), 0.5 ** (age / half_life))
+    for age in range(days)], else_=0)
+  rows = db.session.query(column, db.func.sum(table.c.visitors * weight))\
+    .filter(table.c.day > today - timedelta(days=days))\
+    .group_by(column)
+  return (datetime.now(), dict((id, float(score or 0)) for (id, score) in rows))
+
+trending_scores = ReadThroughCache(load_trending)
+
+def trending_artists(artists):
+  # the artists listing, most trending first and otherwise by name
+  scores = trending_scores.get(Artist)[1]
+  return sorted(artists, key=lambda artist: -scores.get(artist.id, 0))
+
+def trending_areas(areas):
+  # the venues listing, the venues of each area and the areas themselves
+  # most trending first; the cached areas are left as they are
+  scores = trending_scores.get(Venue)[1]
+  ordered = [dict(area, venues=sorted(area['venues'], key=lambda venue: -scores.get(venue['id'], 0)))
+    for area in areas]
+  return sorted(ordered, key=lambda area: -sum(scores.get(venue['id'], 0) for venue in area['venues']))
+
+# caches dropped after any commit that touches one of their models
+cache_dependencies = [
+  (area_cache, (Venue, Show, Genre)),
+  (search_indexes, (Venue, Artist)),
+  (genre_choices, (Genre,)),
+]
+
+def touched(session, *models):
+  for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+    if isinstance(obj, models):
+      return True
+  return False
+
+def bump(model, ids, now):
+  ids = [id for id in ids if id is not None]
+  if ids:
+    db.session.execute(model.__table__.update()
+      .where(model.id.in_(ids))
+      .values(version=model.version + 1, updated_at=now))
+
+@event.listens_for(db.session, 'before_flush')
+def bump_versions(session, flush_context, instances):
+  # a venue's page shows its artists' (and recommended artists') names and
+  # images and the other way round, so changing those or adding a show
+  # bumps both sides
+  now = datetime.now()
+  venue_ids, artist_ids = set(), set()
+  for obj in list(session.dirty):
+    if isinstance(obj, (Venue, Artist)) and session.is_modified(obj):
+      obj.version = type(obj).version + 1
+      obj.updated_at = now
+      state = db.inspect(obj)
+      if state.attrs.name.history.has_changes() or state.attrs.image_link.history.has_changes():
+        shows = db.session.query(Show.venue_id if isinstance(obj, Artist) else Show.artist_id)\
+          .filter((Show.artist_id if isinstance(obj, Artist) else Show.venue_id) == obj.id)
+        (counterpart, table, own, other) = recommendation_links[type(obj)]
+        (_, _, listing_own, listing_other) = recommendation_links[counterpart]
+        listed = db.session.query(listing_own).filter(listing_other == obj.id)
+        (venue_ids if isinstance(obj, Artist) else artist_ids).update(id for (id,) in shows.union(listed))
+  for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+    if isinstance(obj, Show):
+      venue_ids.add(obj.venue_id)
+      artist_ids.add(obj.artist_id)
+  bump(Venue, venue_ids, now)
+  bump(Artist, artist_ids, now)
+
+def shift_counts(deltas):
+  # deltas maps (model, id) to [upcoming, past] increments; applied in SQL
+  # so concurrent writers cannot lose each other's updates
+  for ((model, id), (upcoming, past)) in deltas.items():
+    if id is not None and (upcoming or past):
+      db.session.execute(model.__table__.update()
+        .where(model.id == id)
+        .values(upcoming_shows_count=model.upcoming_shows_count + upcoming,
+                past_shows_count=model.past_shows_count + past))
+
+@event.listens_for(db.session, 'before_flush')
+def mark_past_shows(session, flush_context, instances):
+  now = datetime.now()
+  for obj in list(session.new) + list(session.dirty):
+    if isinstance(obj, Show) and (obj in session.new or db.inspect(obj).attrs.start_time.history.has_changes()):
+      obj.is_past = obj.start_time <= now
+
+def locate_venue(venue, moved=True):
+  # a venue is put at its city's centre when it is added or its city or
+  # state changes, unless it was given coordinates of its own
+  if moved:
+    point = geo.locate(gazetteer(), venue.city, venue.state)
+    (venue.latitude, venue.longitude) = point or (None, None)
+  venue.geohash = None if venue.latitude is None else geo.encode(venue.latitude, venue.longitude)
+
+@event.listens_for(db.session, 'before_flush')
+def locate_venues(session, flush_context, instances):
+  for obj in list(session.new) + list(session.dirty):
+    if isinstance(obj, Venue):
+      attrs = db.inspect(obj).attrs
+      placed = attrs.latitude.history.has_changes() or attrs.longitude.history.has_changes()
+      moved = obj in session.new or attrs.city.history.has_changes() or attrs.state.history.has_changes()
+      if placed or moved:
+        locate_venue(obj, moved and not placed)
+
+@event.listens_for(db.session, 'after_flush')
+def count_shows(session, flush_context):
+  # after the flush, so shows added through a relationship have their ids
+  deltas = defaultdict(lambda: [0, 0])
+  for obj in session.new:
+    if isinstance(obj, Show):
+      deltas[(Venue, obj.venue_id)][obj.is_past] += 1
+      deltas[(Artist, obj.artist_id)][obj.is_past] += 1
+  for obj in session.deleted:
+    if isinstance(obj, Show):
+      deltas[(Venue, obj.venue_id)][obj.is_past] -= 1
+      deltas[(Artist, obj.artist_id)][obj.is_past] -= 1
+  for obj in session.dirty:
+    if isinstance(obj, Show):
+      state = db.inspect(obj)
+      was_past = state.attrs.is_past.history.deleted
+      was_past = was_past[0] if was_past else obj.is_past
+      for (model, attr) in ((Venue, 'venue_id'), (Artist, 'artist_id')):
+        was = state.attrs[attr].history.deleted
+        was = was[0] if was else getattr(obj, attr)
+        if (was, was_past) != (getattr(obj, attr), obj.is_past):
+          deltas[(model, was)][was_past] -= 1
+          deltas[(model, getattr(obj, attr))][obj.is_past] += 1
+  shift_counts(deltas)
+
+@event.listens_for(db.session, 'after_flush')
+def track_stale_caches(session, flush_context):
+  for (cache, models) in cache_dependencies:
+    if touched(session, *models):
+      session.info.setdefault('stale_caches', set()).add(cache)
+
+@event.listens_for(db.session, 'after_commit')
+def invalidate_stale_caches(session):
+  for cache in session.info.pop('stale_caches', ()):
+    cache.invalidate()
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def forget_stale_caches(session, previous_transaction):
+  session.info.pop('stale_caches', None)
+  session.info.pop('typeahead_changes', None)
+  session.info.pop('profile_changes', None)
+
+@event.listens_for(db.session, 'after_flush')
+def track_name_changes(session, flush_context):
+  # (model, id, name) for each created, renamed (or, with None, deleted) venue
+  # and artist, applied to the typeahead indexes after commit
+  changes = session.info.setdefault('typeahead_changes', [])
+  for obj in session.new:
+    if isinstance(obj, (Venue, Artist)):
+      changes.append((type(obj), obj.id, obj.name))
+  for obj in session.dirty:
+    if isinstance(obj, (Venue, Artist)) and db.inspect(obj).attrs.name.history.has_changes():
+      changes.append((type(obj), obj.id, obj.name))
+  for obj in session.deleted:
+    if isinstance(obj, (Venue, Artist)):
+      changes.append((type(obj), obj.id, None))
+
+@event.listens_for(db.session, 'after_flush')
+def track_profile_changes(session, flush_context):
+  # venues and artists created, deleted, or with a change to what they are
+  # matched on, whose recommendations are recomputed before commit
+  changes = session.info.setdefault('profile_changes', {Venue: set(), Artist: set()})
+  for obj in list(session.new) + list(session.deleted):
+    if isinstance(obj, (Venue, Artist)):
+      changes[type(obj)].add(obj.id)
+  for obj in session.dirty:
+    if isinstance(obj, (Venue, Artist)):
+      attrs = db.inspect(obj).attrs
+      flag = attrs.seeking_talent if isinstance(obj, Venue) else attrs.seeking_venue
+      if any(attr.history.has_changes() for attr in (attrs.genres, attrs.city, attrs.state, flag)):
+        changes[type(obj)].add(obj.id)
+
+@event.listens_for(db.session, 'before_commit')
+def update_recommendations(session):
+  '''
+  Recomputes the recommendations of the changed venues and artists, and of
+  those on the other side that listed one of them or might list one now:
+  seeking, in the same place and sharing a genre. Only those places are
+  read, so the cost follows the size of a city rather than of the tables.
+  '''
+  # flush first, so the last changes are tracked too
+  session.flush()
+  changes = session.info.pop('profile_changes', None)
+  if not changes or not any(changes.values()):
+    return
+  stale = dict((model, set(ids)) for (model, ids) in changes.items())
+  for (model, ids) in changes.items():
+    if not ids:
+      continue
+    (counterpart, table, own, other) = recommendation_links[model]
+    (listing, listing_table, listing_own, listing_other) = recommendation_links[counterpart]
+    stale[counterpart].update(id for (id,) in
+      session.query(listing_own).filter(listing_other.in_(ids)))
+    profiles = load_profiles(model, ids)
+    if profiles:
+      for (id, where, genres) in load_profiles(counterpart, places=set(where for (_, where, _) in profiles)):
+        if any(where == near and genres & theirs for (_, near, theirs) in profiles):
+          stale[counterpart].add(id)
+  for (model, ids) in stale.items():
+    if ids:
+      recommend(model, ids)
+
+@event.listens_for(db.session, 'after_commit')
+def update_typeahead_indexes(session):
+  # once the names are in the database; a rollback drops them instead, see
+  # forget_stale_caches
+  for (model, id, name) in session.info.pop('typeahead_changes', ()):
+    index = typeahead_indexes.peek(model)
+    if index is None:
+      # not loaded; make sure a load racing this commit is not kept
+      typeahead_indexes.invalidate(model)
+    elif name is None:
+      index.remove(id)
+    else:
+      index.put(id, name)
+
+
+def roll_past_shows(now=None, batch_size=1000):
+  '''
+  Moves shows whose start_time has passed from upcoming_shows_count to
+  past_shows_count, a batch per transaction. Returns how many moved.
+  '''
+  now = now or datetime.now()
+  moved = 0
+  while True:
+    due = db.session.query(Show.id, Show.venue_id, Show.artist_id)\
+      .filter(db.not_(Show.is_past), Show.start_time <= now)\
+      .order_by(Show.start_time).limit(batch_size).with_for_update().all()
+    if not due:
+      return moved
+    ids = [id for (id, venue_id, artist_id) in due]
+    updated = db.session.execute(Show.__table__.update()
+      .where(db.and_(Show.id.in_(ids), db.not_(Show.is_past)))
+      .values(is_past=True)).rowcount
+    if updated != len(ids):
+      # another runner moved some of them first; read the batch again
+      db.session.rollback()
+      continue
+    deltas = defaultdict(lambda: [0, 0])
+    for (id, venue_id, artist_id) in due:
+      for key in ((Venue, venue_id), (Artist, artist_id)):
+        deltas[key][0] -= 1
+        deltas[key][1] += 1
+    shift_counts(deltas)
+    bump(Venue, set(venue_id for (id, venue_id, artist_id) in due), datetime.now())
+    bump(Artist, set(artist_id for (id, venue_id, artist_id) in due), datetime.now())
+    db.session.commit()
+    area_cache.invalidate()
+    moved += len(ids)
+
+def repair_show_counts(fix=True):
+  '''
+  Recounts every venue's and artist's shows and returns the rows whose
+  counters had drifted as (model name, id, stored, actual) tuples, where
+  stored and actual are (upcoming, past). Rewrites them unless fix is False.
+  '''
+  drift = []
+  for (model, column) in ((Venue, Show.venue_id), (Artist, Show.artist_id)):
+    counts = db.session.query(
+      column.label('id'),
+      db.func.count(db.case([(db.not_(Show.is_past), 1)])).label('upcoming'),
+      db.func.count(db.case([(Show.is_past, 1)])).label('past')
+    ).group_by(column).subquery()
+    rows = db.session.query(
+      model.id,
+      model.upcoming_shows_count,
+      model.past_shows_count,
+      counts.c.upcoming,
+      counts.c.past
+    ).outerjoin(counts, counts.c.id == model.id).order_by(model.id)
+    for (id, upcoming, past, actual_upcoming, actual_past) in rows:
+      actual = (actual_upcoming or 0, actual_past or 0)
+      if (upcoming, past) != actual:
+        drift.append((model.__name__, id, (upcoming, past), actual))
+        if fix:
+          db.session.execute(model.__table__.update().where(model.id == id)
+            .values(upcoming_shows_count=actual[0], past_shows_count=actual[1]))
+  if fix and drift:
+    db.session.commit()
+    area_cache.invalidate()
+  return drift
+
+def locate_all_venues(everything=False, batch_size=1000):
+  '''
+  Fills in the coordinates of venues that have none (or, with everything,
+  of all venues, after the gazetteer changes) from the gazetteer, a batch
+  per transaction. Returns how many were located and a {(city, state):
+  venues} count of the places it does not know.
+  '''
+  places = gazetteer()
+  located = 0
+  unknown = defaultdict(int)
+  last = 0
+  while True:
+    query = db.session.query(Venue.id, Venue.city, Venue.state).filter(Venue.id > last)
+    if not everything:
+      query = query.filter(Venue.geohash.is_(None))
+    batch = query.order_by(Venue.id).limit(batch_size).all()
+    if not batch:
+      return located, dict(unknown)
+    points = []
+    for (id, city, state) in batch:
+      point = geo.locate(places, city, state)
+      if point is None:
+        unknown[(city, state)] += 1
+      else:
+        points.append({'venue_id': id, 'lat': point[0], 'lng': point[1], 'hash': geo.encode(*point)})
+    if points:
+      # one executemany per batch
+      db.session.execute(Venue.__table__.update()
+        .where(Venue.id == db.bindparam('venue_id'))
+        .values(latitude=db.bindparam('lat'), longitude=db.bindparam('lng'), geohash=db.bindparam('hash')),
+        points)
+    db.session.commit()
+    located += len(points)
+    last = batch[-1][0]
+
+def show_partitions():
+  # {month: name} of Show's monthly partitions, and whether show_default
+  # has the booking constraint the others should copy
+  names = [name for (name,) in db.session.execute(
+    "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+    "WHERE i.inhparent = '\"Show\"'::regclass")]
+  booking = db.session.execute(
+    "SELECT count(*) FROM pg_constraint WHERE conrelid = '%s'::regclass AND contype = 'x'" % partitions.DEFAULT
+  ).scalar() > 0
+  return dict((partitions.partition_month(name), name) for name in names if partitions.partition_month(name)), booking
+
+def maintain_show_partitions(now=None):
+  '''
+  Adds Show's partitions for this month and the SHOW_PARTITION_MONTHS_AHEAD
+  after it, and for every other month show_default holds shows for. Then
+  archives partitions that ended more than SHOW_ARCHIVE_AFTER_MONTHS ago
+  and takes their shows off the show counters. One transaction per
+  partition. Returns the names of the created and the archived partitions.
+  Postgres only.
+  '''
+  now = now or datetime.now()
+  config = current_app.config
+  lock_timeout = "SET LOCAL lock_timeout = '%dms'" % config['BACKFILL_LOCK_TIMEOUT_MS']
+  (existing, booking) = show_partitions()
+  months = set(partitions.planned_months(now, config['SHOW_PARTITION_MONTHS_AHEAD']))
+  months.update(partitions.month_of(month) for (month,) in db.session.execute(
+    "SELECT DISTINCT date_trunc('month', start_time) FROM %s" % partitions.DEFAULT))
+  db.session.commit()
+
+  created = []
+  for month in sorted(months - set(existing)):
+    db.session.execute(lock_timeout)
+    for statement in partitions.create_partition(month, booking):
+      db.session.execute(statement)
+    db.session.commit()
+    existing[month] = partitions.partition_name(month)
+    created.append(existing[month])
+
+  archived = []
+  cutoff = partitions.add_months(partitions.month_of(now), -config['SHOW_ARCHIVE_AFTER_MONTHS'])
+  for month in sorted(month for month in existing if partitions.add_months(month, 1) <= cutoff):
+    name = existing[month]
+    db.session.execute(lock_timeout)
+    # no show can be added to or moved out of it until it is detached
+    db.session.execute('LOCK TABLE %s IN SHARE MODE' % name)
+    deltas = defaultdict(lambda: [0, 0])
+    rows = db.session.execute('SELECT venue_id, artist_id, is_past, count(*) FROM %s GROUP BY 1, 2, 3' % name)
+    for (venue_id, artist_id, is_past, count) in rows:
+      deltas[(Venue, venue_id)][is_past] -= count
+      deltas[(Artist, artist_id)][is_past] -= count
+    shift_counts(deltas)
+    bump(Venue, set(id for (model, id) in deltas if model is Venue), now)
+    bump(Artist, set(id for (model, id) in deltas if model is Artist), now)
+    for statement in partitions.archive_partition(name, config['SHOW_ARCHIVE_SCHEMA'], config['SHOW_ARCHIVE_TABLESPACE']):
+      db.session.execute(statement)
+    db.session.commit()
+    area_cache.invalidate()
+    archived.append(name)
+  return created, archived
@@ -0,0 +1,137 @@
+import atexit
+import hashlib
+import logging
+import math
+import threading
+import time
+import zlib
+
+logger = logging.getLogger(__name__)
+
+#----------------------------------------------------------------------------#
+# Unique visitor sketches.
+#----------------------------------------------------------------------------#
+
+# 2 ** PRECISION one-byte registers, about 1.6% error; stored sketches only
+# merge with ones of the same precision
+PRECISION = 12
+
+class HyperLogLog(object):
+  '''
+  Estimates how many distinct strings were added, in 2 ** precision bytes
+  however many there are. Two sketches merge into the sketch of their
+  union, so one a day per page adds up to any span of days.
+  '''
+  def __init__(self, precision=PRECISION, registers=None):
+    self.precision = precision
+    self.registers = registers if registers is not None else bytearray(1 << precision)
+
+  def add(self, item):
+    hashed = int.from_bytes(hashlib.blake2b(item.encode('utf-8'), digest_size=8).digest(), 'big')
+    bits = 64 - self.precision
+    index = hashed >> bits
+    # position of the first 1 in the remaining bits
+    rank = bits - (hashed & ((1 << bits) - 1)).bit_length() + 1
+    if rank > self.registers[index]:
+      self.registers[index] = rank
+
+  def merge(self, other):
+    self.registers = bytearray(map(max, self.registers, other.registers))
+    return self
+
+  def count(self):
+    m = len(self.registers)
+    alpha = 0.7213 / (1 + 1.079 / m)
+    estimate = alpha * m * m / sum(2.0 ** -register for register in self.registers)
+    zeros = self.registers.count(0)
+    if estimate <= 2.5 * m and zeros:
+      # few visitors: count the registers still empty instead
+      estimate = m * math.log(m / zeros)
+    return int(round(estimate))
+
+  def to_bytes(self):
+    # a day's sketch is mostly empty registers, which compress well
+    return zlib.compress(bytes(self.registers))
+
+  @classmethod
+  def from_bytes(cls, data):
+    registers = bytearray(zlib.decompress(data))
+    return cls(len(registers).bit_length() - 1, registers)
+
+#----------------------------------------------------------------------------#
+# View buffer.
+#----------------------------------------------------------------------------#
+
+class ViewBuffer(object):
+  '''
+  Counts views and visitors per key in memory, so a page view costs a dict
+  update rather than a write. A background thread, started by the first
+  view, hands everything counted to write({key: (views, HyperLogLog)})
+  every `interval` seconds, inside an app context; views still buffered
+  when the process exits are written by an atexit hook, those of a killed
+  worker are lost. With no interval nothing is written until flush().
+  '''
+  def __init__(self, write, interval=None):
+    self.write = write
+    self.interval = interval
+    self.app = None
+    self._lock = threading.Lock()
+    self._pending = {}
+    self._thread = None
+
+  def init_app(self, app, interval):
+    self.app = app
+    self.interval = interval
+
+  def record(self, key, visitor):
+    with self._lock:
+      entry = self._pending.get(key)
+      if entry is None:
+        entry = self._pending[key] = [0, HyperLogLog()]
+      entry[0] += 1
+      entry[1].add(visitor)
+      if self.interval and self._thread is None:
+        self._thread = threading.Thread(target=self._run, name='page-views', daemon=True)
+        self._thread.start()
+        atexit.register(self._flush_logged)
+
+  def drain(self):
+    # takes everything buffered so far, {key: [views, HyperLogLog]}
+    with self._lock:
+      (pending, self._pending) = (self._pending, {})
+    return pending
+
+  def flush(self):
+    # writes everything buffered so far; returns how many keys that was
+    pending = self.drain()
+    if not pending:
+      return 0
+    try:
+      self.write(dict((key, tuple(entry)) for (key, entry) in pending.items()))
+    except Exception:
+      self._restore(pending)
+      raise
+    return len(pending)
+
+  def _restore(self, pending):
+    # puts back what a failed write took, to go with the next one
+    with self._lock:
+      for (key, (views, sketch)) in pending.items():
+        entry = self._pending.get(key)
+        if entry is None:
+          self._pending[key] = [views, sketch]
+        else:
+          entry[0] += views
+          entry[1].merge(sketch)
+
+  def _flush_logged(self):
+    try:
+      with self.app.app_context():
+        self.flush()
+    except Exception:
+      logger.exception('writing page views failed')
+
+  def _run(self):
+    while True:
+      time.sleep(self.interval)
+      self._flush_logged()
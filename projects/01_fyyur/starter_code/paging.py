@@ -0,0 +1,58 @@
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+
+#----------------------------------------------------------------------------#
+# Keyset pagination.
+#----------------------------------------------------------------------------#
+
+def encode_cursor(*values):
+  return ','.join(value.isoformat() if isinstance(value, datetime) else str(value)
+    for value in values)
+
+def decode_cursor(cursor, types=(datetime.fromisoformat, int)):
+  # raises ValueError on anything encode_cursor could not have produced
+  values = cursor.split(',')
+  if len(values) != len(types):
+    raise ValueError('expected %d values in cursor %r' % (len(types), cursor))
+  return tuple(type(value) for (type, value) in zip(types, values))
+
+def after_key(columns, values):
+  # (a, b) > (x, y) spelled out as a > x OR (a = x AND b > y), which every
+  # backend can answer from an index on (a, b)
+  if len(columns) == 1:
+    return columns[0] > values[0]
+  return or_(columns[0] > values[0],
+    and_(columns[0] == values[0], after_key(columns[1:], values[1:])))
+
+def keyset(query, columns, after=None):
+  '''
+  Orders query by columns, which must end in a unique one, starting after the
+  row whose values for them were `after`.
+  '''
+  if after is not None:
+    query = query.filter(after_key(columns, after))
+  return query.order_by(*columns)
+
+
+class KeysetPage(object):
+  '''
+  Lazily iterates at most `size` rows of a query ordered by (start_time, id),
+  mapping each through `format`. Reads size + 1 rows so that, once iterated,
+  next_cursor says where the following page starts (None on the last page).
+  '''
+  def __init__(self, query, size, format, key=lambda row: (row.start_time, row.id)):
+    self.query = query
+    self.size = size
+    self.format = format
+    self.key = key
+    self.next_cursor = None
+
+  def __iter__(self):
+    last = None
+    for (i, row) in enumerate(self.query.limit(self.size + 1).yield_per(100)):
+      if i == self.size:
+        self.next_cursor = encode_cursor(*self.key(last))
+        break
+      last = row
+      yield self.format(row)
@@ -0,0 +1,83 @@
+import re
+from datetime import date
+
+#----------------------------------------------------------------------------#
+# Show partitions.
+#----------------------------------------------------------------------------#
+# On PostgreSQL, Show is range partitioned on start_time, one partition a
+# month named show_yYYYYmMM, so queries for upcoming shows only read this
+# month's partition and later ones. show_default takes every show outside
+# them: those from before the table was partitioned, and any booked
+# further ahead than partitions have been made. maintain_show_partitions()
+# (`flask partition-shows`, from cron) adds next months' partitions,
+# carves months out of show_default, and archives old partitions. The
+# migration that partitions Show leaves every month to it, so no shows are
+# moved while that migration holds Show locked.
+#
+# A partition's exclusion constraint only sees its own month. Two shows at
+# one venue that overlap across midnight at the end of a month are caught
+# by book_show()'s check instead.
+#
+# Everything here is plain SQL with no reads, so a migration can run it in
+# --sql mode too.
+
+DEFAULT = 'show_default'
+
+NAME = re.compile(r'^show_y(\d{4})m(\d{2})$')
+
+def month_of(value):
+  return date(value.year, value.month, 1)
+
+def add_months(month, months):
+  (year, index) = divmod(month.year * 12 + month.month - 1 + months, 12)
+  return date(year, index + 1, 1)
+
+def partition_name(month):
+  return 'show_y%04dm%02d' % (month.year, month.month)
+
+def partition_month(name):
+  # the month a partition is for, None for show_default and other tables
+  match = NAME.match(name)
+  return date(int(match.group(1)), int(match.group(2)), 1) if match else None
+
+def booking_constraint(table):
+  # the ex_show_venue_booking constraint, for one partition
+  return ('ALTER TABLE %s ADD CONSTRAINT ex_%s_booking '
+          'EXCLUDE USING gist (venue_id WITH =, tsrange(start_time, end_time) WITH &&)' % (table, table))
+
+def create_default():
+  return ['CREATE TABLE %s PARTITION OF "Show" DEFAULT' % DEFAULT]
+
+def create_partition(month, booking=True):
+  '''
+  Statements that add the partition for month. The shows show_default
+  holds for that month are moved into the new table before it is
+  attached, because Postgres will not attach a range that still has rows
+  in the default partition. Attaching scans show_default once, under lock.
+  '''
+  name = partition_name(month)
+  within = "start_time >= '%s' AND start_time < '%s'" % (month, add_months(month, 1))
+  return [
+    'CREATE TABLE %s (LIKE "Show" INCLUDING DEFAULTS)' % name,
+    'INSERT INTO %s SELECT * FROM %s WHERE %s' % (name, DEFAULT, within),
+    'DELETE FROM %s WHERE %s' % (DEFAULT, within),
+  ] + ([booking_constraint(name)] if booking else []) + [
+    "ALTER TABLE \"Show\" ATTACH PARTITION %s FOR VALUES FROM ('%s') TO ('%s')" % (
+      name, month, add_months(month, 1)),
+  ]
+
+def archive_partition(name, schema, tablespace=None):
+  '''
+  Statements that detach a partition and move it to schema, and onto
+  tablespace if one is given. Postgres has no compression of its own; a
+  tablespace on compressed or cheaper storage is the nearest thing.
+  '''
+  return [
+    'CREATE SCHEMA IF NOT EXISTS %s' % schema,
+    'ALTER TABLE "Show" DETACH PARTITION %s' % name,
+    'ALTER TABLE %s SET SCHEMA %s' % (name, schema),
+  ] + (['ALTER TABLE %s.%s SET TABLESPACE %s' % (schema, name, tablespace)] if tablespace else [])
+
+def planned_months(now, ahead):
+  # this month and the `ahead` after it
+  return [add_months(month_of(now), i) for i in range(ahead + 1)]
@@ -0,0 +1,114 @@
+import threading
+import time
+
+from flask import abort, current_app, has_app_context, jsonify
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError
+from sqlalchemy.pool import QueuePool
+
+#----------------------------------------------------------------------------#
+# Connection pool.
+#----------------------------------------------------------------------------#
+
+class TimedQueuePool(QueuePool):
+  '''
+  QueuePool that also records how long callers wait to check a connection
+  out, for the /_pool endpoint.
+  '''
+  def __init__(self, *args, **kwargs):
+    QueuePool.__init__(self, *args, **kwargs)
+    self._wait_lock = threading.Lock()
+    self.waits = 0
+    self.wait_seconds = 0.0
+    self.max_wait_seconds = 0.0
+    self.timeouts = 0
+
+  def _do_get(self):
+    start = time.perf_counter()
+    try:
+      return QueuePool._do_get(self)
+    except TimeoutError:
+      with self._wait_lock:
+        self.timeouts += 1
+      raise
+    finally:
+      waited = time.perf_counter() - start
+      with self._wait_lock:
+        self.waits += 1
+        self.wait_seconds += waited
+        self.max_wait_seconds = max(self.max_wait_seconds, waited)
+
+
+def pool_status(pool):
+  status = {'class': type(pool).__name__}
+  if isinstance(pool, QueuePool):
+    status.update({
+      'size': pool.size(),
+      'checked_in': pool.checkedin(),
+      'checked_out': pool.checkedout(),
+      'overflow': pool.overflow(),
+      'timeout': pool.timeout(),
+    })
+  if isinstance(pool, TimedQueuePool):
+    status.update({
+      'checkouts': pool.waits,
+      'timeouts': pool.timeouts,
+      'avg_wait_ms': pool.wait_seconds * 1000 / pool.waits if pool.waits else 0.0,
+      'max_wait_ms': pool.max_wait_seconds * 1000,
+    })
+  return status
+
+
+def engine_options(config):
+  '''
+  SQLALCHEMY_ENGINE_OPTIONS for config's DB_* settings. Pool sizing only
+  applies to servers; sqlite keeps SQLAlchemy's defaults.
+  '''
+  uri = config['SQLALCHEMY_DATABASE_URI']
+  if uri.startswith('sqlite'):
+    return {}
+
+  options = {
+    'poolclass': TimedQueuePool,
+    'pool_size': config['DB_POOL_SIZE'],
+    'max_overflow': config['DB_MAX_OVERFLOW'],
+    'pool_timeout': config['DB_POOL_TIMEOUT'],
+    'pool_recycle': config['DB_POOL_RECYCLE'],
+    'pool_pre_ping': config['DB_POOL_PRE_PING'],
+  }
+  timeout = config['DB_STATEMENT_TIMEOUT_MS']
+  if timeout and uri.split('+', 1)[0].split(':', 1)[0] in ('postgres', 'postgresql') and not config['DB_PGBOUNCER']:
+    # set once per connection; pgbouncer refuses startup options, so behind
+    # it set_statement_timeout sets it per transaction instead
+    options['connect_args'] = {'options': '-c statement_timeout=%d' % int(timeout)}
+  return options
+
+
+def set_statement_timeout(session, transaction, connection):
+  # transaction pooling hands each transaction to any server connection, so
+  # the timeout only holds when set with SET LOCAL in every one
+  config = current_app.config if has_app_context() else {}
+  timeout = config.get('DB_STATEMENT_TIMEOUT_MS')
+  if config.get('DB_PGBOUNCER') and timeout and connection.dialect.name == 'postgresql':
+    connection.execute('SET LOCAL statement_timeout = %d' % int(timeout))
+
+
+def init_pool(app, db):
+  '''
+  Applies DB_STATEMENT_TIMEOUT_MS to every transaction, as a connection
+  option or, through pgbouncer, with SET LOCAL. Serves the stats of every
+  engine's pool, the primary's and each bind's, on /_pool in debug mode or
+  with POOL_STATS set.
+  '''
+  # db.session is shared by every app, so the listener is only added once
+  if not event.contains(db.session, 'after_begin', set_statement_timeout):
+    event.listen(db.session, 'after_begin', set_statement_timeout)
+
+  @app.route('/_pool')
+  def pool_stats():
+    if not (app.debug or app.config.get('POOL_STATS')):
+      abort(404)
+    engines = {'primary': db.engine}
+    for bind in app.config.get('SQLALCHEMY_BINDS') or {}:
+      engines[bind] = db.get_engine(app, bind=bind)
+    return jsonify({name: pool_status(engine.pool) for (name, engine) in engines.items()})
@@ -0,0 +1,75 @@
+from collections import defaultdict
+
+import numpy as np
+
+#----------------------------------------------------------------------------#
+# Genre-similarity recommendations.
+#----------------------------------------------------------------------------#
+
+# most similarity scores held in memory at once, 32MB of them
+MAX_CELLS = 1 << 22
+
+def genre_matrix(profiles, columns):
+  # one row per profile, a 1 in the column of each of its genres; genres
+  # without a column are left out
+  matrix = np.zeros((len(profiles), max(len(columns), 1)), dtype=np.float32)
+  cells = [(row, columns[genre]) for (row, (id, place, genres)) in enumerate(profiles)
+    for genre in genres if genre in columns]
+  if cells:
+    (rows, cols) = zip(*cells)
+    matrix[list(rows), list(cols)] = 1
+  return matrix
+
+def jaccard_top_k(subjects, candidates, k):
+  # {subject id: [(candidate id, score)]} for profiles all in one place
+  columns = dict((genre, i) for (i, genre) in enumerate(sorted(
+    set(genre for (id, place, genres) in candidates for genre in genres))))
+  left = genre_matrix(subjects, columns)
+  right = genre_matrix(candidates, columns)
+  left_sizes = np.array([len(genres) for (id, place, genres) in subjects], dtype=np.float32)
+  right_sizes = np.array([len(genres) for (id, place, genres) in candidates], dtype=np.float32)
+  right_ids = np.array([id for (id, place, genres) in candidates])
+  k = min(k, len(candidates))
+
+  matches = {}
+  step = max(1, MAX_CELLS // len(candidates))
+  for start in range(0, len(subjects), step):
+    # |a & b| / (|a| + |b| - |a & b|) for a block of subjects at once
+    shared = (left[start:start + step] @ right.T).astype(np.float64)
+    union = left_sizes[start:start + step, None] + right_sizes[None, :] - shared
+    scores = np.where(shared > 0, shared / np.maximum(union, 1), 0)
+    if k < len(candidates):
+      best = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+      best = np.broadcast_to(np.arange(len(candidates)), (len(scores), k))
+    top = np.take_along_axis(scores, best, axis=1)
+    ids = right_ids[best]
+    # best first, ties to the lower id
+    order = np.lexsort((ids, -top), axis=-1)
+    top = np.take_along_axis(top, order, axis=1)
+    ids = np.take_along_axis(ids, order, axis=1)
+    for (i, (id, place, genres)) in enumerate(subjects[start:start + step]):
+      matches[id] = [(int(match), float(score))
+        for (match, score) in zip(ids[i], top[i]) if score > 0]
+  return matches
+
+def top_matches(subjects, candidates, k):
+  '''
+  {subject id: [(candidate id, Jaccard similarity of their genres)]}, the k
+  candidates most like each subject, best first. Both are lists of (id,
+  place, genre ids); only subjects and candidates in the same place are
+  compared, a block of genre matrices at a time, and ones sharing no genre
+  are never matched.
+  '''
+  by_place = defaultdict(list)
+  for candidate in sorted(candidates, key=lambda profile: profile[0]):
+    by_place[candidate[1]].append(candidate)
+  subjects_by_place = defaultdict(list)
+  for subject in subjects:
+    subjects_by_place[subject[1]].append(subject)
+
+  matches = dict((id, []) for (id, place, genres) in subjects)
+  for (place, group) in subjects_by_place.items():
+    if by_place.get(place) and k > 0:
+      matches.update(jaccard_top_k(group, by_place[place], k))
+  return matches
@@ -0,0 +1,71 @@
+import time
+
+from flask import current_app, g, has_app_context, request
+from flask_sqlalchemy import SQLAlchemy, SignallingSession, get_state
+from sqlalchemy import event, orm
+
+#----------------------------------------------------------------------------#
+# Read replica routing.
+#----------------------------------------------------------------------------#
+
+REPLICA = 'replica'
+
+class RoutingSession(SignallingSession):
+  # reads go to the replica bind while the request allows it; flushes
+  # always go to the primary
+  def get_bind(self, mapper=None, clause=None):
+    if has_app_context() and g.get('read_replica') and not self._flushing:
+      return get_state(self.app).db.get_engine(self.app, bind=REPLICA)
+    return SignallingSession.get_bind(self, mapper, clause)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+  def create_session(self, options):
+    return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+
+# when a client's last write may not have reached the replica yet. A cookie
+# of its own rather than in the session, whose signature other workers
+# cannot check unless they share SECRET_KEY
+READ_PRIMARY_COOKIE = 'read_primary_until'
+
+def read_primary_until():
+  # a time no further off than REPLICA_LAG_SECONDS, or 0; the cookie is
+  # unsigned, and a forged one only sends its own requests to the primary
+  try:
+    until = float(request.cookies.get(READ_PRIMARY_COOKIE, 0))
+  except ValueError:
+    return 0
+  return until if until <= time.time() + current_app.config.get('REPLICA_LAG_SECONDS', 5) else 0
+
+def remember_write(db_session):
+  if has_app_context():
+    g.wrote = True
+
+def init_routing(app, db):
+  '''
+  Sends GET and HEAD requests to the SQLALCHEMY_BINDS['replica'] database
+  when one is configured, and everything else to the primary. A client that
+  just committed a write reads from the primary for REPLICA_LAG_SECONDS so
+  the page it is sent to next is not stale.
+  '''
+  @app.before_request
+  def choose_database():
+    g.read_replica = (
+      app.config.get('READ_REPLICA_ROUTING', True)
+      and REPLICA in (app.config.get('SQLALCHEMY_BINDS') or {})
+      and request.method in ('GET', 'HEAD')
+      and read_primary_until() < time.time()
+    )
+
+  # db.session is shared by every app, so the listener is only added once
+  if not event.contains(db.session, 'after_commit', remember_write):
+    event.listen(db.session, 'after_commit', remember_write)
+
+  @app.after_request
+  def read_your_writes(response):
+    if g.get('wrote'):
+      lag = app.config.get('REPLICA_LAG_SECONDS', 5)
+      response.set_cookie(READ_PRIMARY_COOKIE, '%.3f' % (time.time() + lag), max_age=lag,
+        httponly=True, samesite='Lax')
+    return response
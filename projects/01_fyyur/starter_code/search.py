@@ -0,0 +1,166 @@
+import re
+import threading
+import unicodedata
+from bisect import bisect_left, insort
+from collections import defaultdict
+
+from sqlalchemy import func, case
+
+#----------------------------------------------------------------------------#
+# Fuzzy name search.
+#----------------------------------------------------------------------------#
+
+WORD = re.compile(r'\w+', re.UNICODE)
+
+def trigrams(text):
+  # same trigrams pg_trgm extracts: lowercased words padded with two
+  # leading blanks and one trailing blank
+  grams = set()
+  for word in WORD.findall((text or '').lower()):
+    padded = '  ' + word + ' '
+    for i in range(len(padded) - 2):
+      grams.add(padded[i:i + 3])
+  return grams
+
+def similarity(a, b):
+  if not a or not b:
+    return 0.0
+  shared = len(a & b)
+  return shared / float(len(a) + len(b) - shared)
+
+
+class NGramIndex(object):
+  '''
+  In-process trigram index over (id, name) pairs, used when the database
+  has no pg_trgm (sqlite test runs). Ranks like trigram_search below.
+  '''
+  def __init__(self, rows):
+    self.names = {}
+    self.grams = {}
+    self.postings = defaultdict(set)
+    for (id, name) in rows:
+      self.add(id, name)
+
+  def add(self, id, name):
+    self.names[id] = name or ''
+    self.grams[id] = trigrams(name)
+    for gram in self.grams[id]:
+      self.postings[gram].add(id)
+
+  def search(self, term, limit=20, threshold=0.3):
+    term = (term or '').strip()
+    needle = term.lower()
+    term_grams = trigrams(term)
+
+    if len(needle) < 3:
+      # too short to share a trigram with a substring match
+      candidates = self.names.keys()
+    else:
+      candidates = set()
+      for gram in term_grams:
+        candidates |= self.postings.get(gram, set())
+
+    matches = []
+    for id in candidates:
+      name = self.names[id]
+      contains = needle in name.lower()
+      score = similarity(term_grams, self.grams[id])
+      if contains or score >= threshold:
+        matches.append((not contains, -score, name, id))
+
+    matches.sort()
+    return [(id, name) for (_, _, name, id) in matches[:limit]]
+
+
+def normalize(name):
+  # lowercased words without accents or punctuation, single spaced
+  name = unicodedata.normalize('NFKD', name or '')
+  name = ''.join(c for c in name if not unicodedata.combining(c))
+  return ' '.join(WORD.findall(name.lower()))
+
+
+class PrefixIndex(object):
+  '''
+  Sorted in-memory index over (id, name) pairs for typeahead. Finds names
+  starting with the typed text first, then names with a later word starting
+  with it, each alphabetically, in O(log n + limit).
+  '''
+  def __init__(self, rows):
+    self._lock = threading.Lock()
+    self.names = {}
+    # (normalized name, id) and (normalized name from its nth word, id)
+    self.starts = []
+    self.words = []
+    for (id, name) in rows:
+      self._add(id, name)
+    self.starts.sort()
+    self.words.sort()
+
+  def _keys(self, name):
+    words = normalize(name).split(' ')
+    return (' '.join(words), [' '.join(words[i:]) for i in range(1, len(words))])
+
+  def _add(self, id, name, insert=list.append):
+    self.names[id] = name or ''
+    (start, words) = self._keys(name)
+    insert(self.starts, (start, id))
+    for key in words:
+      insert(self.words, (key, id))
+
+  def _remove(self, id):
+    (start, words) = self._keys(self.names.pop(id))
+    for (entries, key) in [(self.starts, start)] + [(self.words, key) for key in words]:
+      i = bisect_left(entries, (key, id))
+      if i < len(entries) and entries[i] == (key, id):
+        del entries[i]
+
+  def put(self, id, name):
+    # adds or renames one entry
+    with self._lock:
+      if id in self.names:
+        self._remove(id)
+      self._add(id, name, insort)
+
+  def remove(self, id):
+    with self._lock:
+      if id in self.names:
+        self._remove(id)
+
+  def search(self, prefix, limit=10):
+    prefix = normalize(prefix)
+    if not prefix:
+      return []
+    found = []
+    with self._lock:
+      for entries in (self.starts, self.words):
+        i = bisect_left(entries, (prefix,))
+        while len(found) < limit and i < len(entries) and entries[i][0].startswith(prefix):
+          id = entries[i][1]
+          if id not in found:
+            found.append(id)
+          i += 1
+      return [(id, self.names[id]) for id in found]
+
+
+def trigram_search(session, id_column, name_column, term, limit=20, threshold=0.3):
+  '''
+  Postgres search answered from a gin_trgm_ops index on name_column.
+  Substring matches rank first, then typo matches by similarity.
+  '''
+  term = (term or '').strip()
+  contains = name_column.ilike('%' + term + '%')
+  # sqlalchemy 1.3 passes custom operators through unescaped, and psycopg2
+  # reads a bare % as a placeholder
+  pyformat = session.get_bind().dialect.paramstyle in ('format', 'pyformat')
+  matches = name_column.op('%%' if pyformat else '%')(term)
+  session.execute(
+    "SELECT set_config('pg_trgm.similarity_threshold', :threshold, true)",
+    {'threshold': str(threshold)}
+  )
+  return session.query(id_column, name_column)\
+    .filter(contains | matches)\
+    .order_by(
+      case([(contains, 0)], else_=1),
+      func.similarity(name_column, term).desc(),
+      name_column
+    ).limit(limit).all()
@@ -0,0 +1,156 @@
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from flask import g, jsonify, request, abort
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+#----------------------------------------------------------------------------#
+# SQL instrumentation.
+#----------------------------------------------------------------------------#
+
+# collectors receiving statements run on this thread
+_active = threading.local()
+
+SPACE = re.compile(r'\s+')
+IN_LIST = re.compile(r'\((?:\s*(?:%\([^)]+\)s|\?|:\w+)\s*,)+\s*(?:%\([^)]+\)s|\?|:\w+)\s*\)')
+
+def shape(statement):
+  # statements differing only in bound values or IN-list length look alike
+  return IN_LIST.sub('(...)', SPACE.sub(' ', statement).strip())
+
+
+class QueryStats(object):
+  def __init__(self):
+    self.count = 0
+    self.seconds = 0.0
+    self.shapes = Counter()
+
+  @property
+  def duplicates(self):
+    # executions beyond the first of each statement shape; an N+1 loop shows
+    # up here as N
+    return sum(n - 1 for n in self.shapes.values() if n > 1)
+
+  def record(self, statement, seconds):
+    self.count += 1
+    self.seconds += seconds
+    self.shapes[shape(statement)] += 1
+
+  def describe(self):
+    lines = ['%d queries, %.1fms' % (self.count, self.seconds * 1000)]
+    for (statement, n) in self.shapes.most_common():
+      lines.append('  %3dx %s' % (n, statement))
+    return '\n'.join(lines)
+
+
+def _collectors():
+  if not hasattr(_active, 'collectors'):
+    _active.collectors = []
+  return _active.collectors
+
+# the start time goes on the statement's execution context, which is thrown
+# away whether or not the statement succeeds
+@event.listens_for(Engine, 'before_cursor_execute')
+def _start_query(conn, cursor, statement, parameters, context, executemany):
+  if context is not None:
+    context._sqlstats_start = time.perf_counter()
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _end_query(conn, cursor, statement, parameters, context, executemany):
+  start = getattr(context, '_sqlstats_start', None)
+  seconds = time.perf_counter() - start if start is not None else 0.0
+  for stats in _collectors():
+    stats.record(statement, seconds)
+
+@contextmanager
+def capture():
+  '''Collects every statement this thread executes inside the block.'''
+  stats = QueryStats()
+  _collectors().append(stats)
+  try:
+    yield stats
+  finally:
+    _collectors().remove(stats)
+
+@contextmanager
+def query_budget(max_queries):
+  '''
+  Fails with an AssertionError listing the statements when the block runs
+  more than max_queries queries, e.g. around a test client request.
+  '''
+  with capture() as stats:
+    yield stats
+  if stats.count > max_queries:
+    raise AssertionError('query budget of %d exceeded: %s' % (max_queries, stats.describe()))
+
+
+class RouteReport(object):
+  # per-route totals across the requests this process served
+  def __init__(self):
+    self._lock = threading.Lock()
+    self.routes = {}
+
+  def add(self, route, stats):
+    with self._lock:
+      entry = self.routes.setdefault(route, {
+        'requests': 0, 'queries': 0, 'max_queries': 0, 'db_ms': 0.0, 'duplicates': 0
+      })
+      entry['requests'] += 1
+      entry['queries'] += stats.count
+      entry['max_queries'] = max(entry['max_queries'], stats.count)
+      entry['db_ms'] += stats.seconds * 1000
+      entry['duplicates'] += stats.duplicates
+
+  def summary(self):
+    with self._lock:
+      return dict((route, dict(entry,
+        avg_queries=entry['queries'] / float(entry['requests']),
+        avg_db_ms=entry['db_ms'] / entry['requests'])
+      ) for (route, entry) in self.routes.items())
+
+
+def init_sqlstats(app):
+  '''
+  Counts queries, database time and repeated statement shapes per request.
+  In debug mode they are sent as X-DB-* response headers and the per-route
+  totals are served as JSON from /_sqlstats.
+  '''
+  report = RouteReport()
+  app.extensions['sqlstats'] = report
+
+  @app.before_request
+  def start_sqlstats():
+    g.sqlstats = QueryStats()
+    _collectors().append(g.sqlstats)
+
+  @app.after_request
+  def sqlstats_headers(response):
+    # streamed bodies run their queries later and are only in the report
+    stats = g.get('sqlstats')
+    if app.debug and stats is not None:
+      response.headers['X-DB-Queries'] = str(stats.count)
+      response.headers['X-DB-Time-ms'] = '%.2f' % (stats.seconds * 1000)
+      response.headers['X-DB-Duplicates'] = str(stats.duplicates)
+    return response
+
+  @app.teardown_request
+  def finish_sqlstats(exc):
+    stats = g.pop('sqlstats', None)
+    if stats is None:
+      return
+    if stats in _collectors():
+      _collectors().remove(stats)
+    rule = request.url_rule.rule if request.url_rule else '<unmatched>'
+    report.add('%s %s' % (request.method, rule), stats)
+
+  @app.route('/_sqlstats')
+  def sqlstats_report():
+    if not app.debug:
+      abort(404)
+    return jsonify(report.summary())
+
+  return report
@@ -0,0 +1,38 @@
+// Suggests names from an input's data-typeahead url as the user types, and
+// copies the id of the chosen suggestion into the hidden data-target field.
+(function () {
+  var pattern = / \(#(\d+)\)$/;
+
+  Array.prototype.forEach.call(document.querySelectorAll('input[data-typeahead]'), function (input) {
+    var options = document.getElementById(input.getAttribute('list'));
+    var target = document.getElementById(input.getAttribute('data-target'));
+    var timer = null;
+    var last = null;
+
+    function suggest() {
+      var q = input.value;
+      if (q === last) return;
+      last = q;
+      var request = new XMLHttpRequest();
+      request.open('GET', input.getAttribute('data-typeahead') + '?q=' + encodeURIComponent(q));
+      request.onload = function () {
+        if (request.status !== 200 || q !== input.value) return;
+        options.innerHTML = '';
+        JSON.parse(request.responseText).forEach(function (match) {
+          var option = document.createElement('option');
+          // the id keeps artists or venues with the same name apart
+          option.value = match.name + ' (#' + match.id + ')';
+          options.appendChild(option);
+        });
+      };
+      request.send();
+    }
+
+    input.addEventListener('input', function () {
+      var chosen = pattern.exec(input.value);
+      target.value = chosen ? chosen[1] : '';
+      clearTimeout(timer);
+      if (!chosen) timer = setTimeout(suggest, 80);
+    });
+  });
+})();
@@ -0,0 +1,1234 @@
+import gzip
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import types
+import unittest
+from datetime import date, datetime, time, timedelta
+from unittest import mock
+
+DB_DIR = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(DB_DIR, 'fyyur_test.db')
+os.environ['DATABASE_REPLICA_URL'] = 'sqlite:///' + os.path.join(DB_DIR, 'fyyur_replica.db')
+os.environ['PAGEVIEW_FLUSH_SECONDS'] = '0'
+
+from flask import Flask
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+
+from app import create_app
+from models import db, Genre, Venue, Artist, Show, area_cache, search_indexes, genre_choices, \
+    roll_past_shows, repair_show_counts, typeahead_indexes, locate_all_venues, \
+    recommended_venues, recommended_artists, maintain_show_partitions, page_views, trending_scores, \
+    venue_views, ticket_inventory, ticket_reservations, reserve_tickets, confirm_reservation, \
+    SoldOut
+import api
+import backfill
+import assets
+import geo
+import lockcheck
+import partitions
+import recommend
+from filters import format_datetime
+from pageviews import HyperLogLog
+from search import PrefixIndex
+from benchmarks.bench_boot import boot_time
+from benchmarks.load import data as load_data
+from benchmarks.load.routes import missing, targets
+from logs import setup_logging
+from sqlstats import capture, query_budget
+from pool import TimedQueuePool, engine_options, pool_status
+
+app = create_app()
+
+class FyyurTestCase(unittest.TestCase):
+    """This class represents the fyyur test case"""
+
+    def setUp(self):
+        """Define test variables and create an empty database."""
+        app.config['TESTING'] = True
+        app.config['READ_REPLICA_ROUTING'] = False
+        self.client = app.test_client
+        self.ctx = app.app_context()
+        self.ctx.push()
+        db.create_all()
+        db.session.add_all([Genre(name='Jazz'), Genre(name='Blues')])
+        db.session.commit()
+        area_cache.invalidate()
+        search_indexes.invalidate()
+        genre_choices.invalidate()
+        typeahead_indexes.invalidate()
+        trending_scores.invalidate()
+        page_views.drain()
+
+    def tearDown(self):
+        """Executed after each test"""
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def genre(self, name):
+        return Genre.query.filter_by(name=name).one()
+
+    def add_venues(self, n, city='San Francisco', state='CA', genre='Jazz'):
+        artist = Artist(name='Test Artist', genres=[self.genre(genre)])
+        db.session.add(artist)
+        venues = [Venue(name='Venue %d' % i, city=city, state=state, genres=[self.genre(genre)])
+                  for i in range(n)]
+        db.session.add_all(venues)
+        db.session.flush()
+        for v in venues:
+            db.session.add(Show(artist_id=artist.id, venue_id=v.id,
+                                start_time=datetime.now() + timedelta(days=1)))
+            db.session.add(Show(artist_id=artist.id, venue_id=v.id,
+                                start_time=datetime.now() - timedelta(days=1)))
+        db.session.commit()
+
+    def count_queries(self, url, status=200, **kwargs):
+        with capture() as stats:
+            res = self.client().get(url, **kwargs)
+        self.assertEqual(res.status_code, status)
+        return stats.count
+
+    ## VENUES
+    def test_areas_group_venues_and_count_upcoming_shows(self):
+        self.add_venues(2)
+        self.add_venues(1, city='Austin', state='TX')
+
+        areas = area_cache.get()
+
+        self.assertEqual([(a['city'], a['state']) for a in areas],
+                         [('San Francisco', 'CA'), ('Austin', 'TX')])
+        self.assertEqual(len(areas[0]['venues']), 2)
+        self.assertEqual(areas[0]['venues'][0]['num_upcoming_shows'], 1)
+
+    def test_venues_query_count_is_constant(self):
+        self.add_venues(3)
+        few = self.count_queries('/venues')
+        area_cache.invalidate()
+        self.add_venues(30)
+        many = self.count_queries('/venues')
+
+        self.assertEqual(few, many)
+
+    def test_area_cache_invalidated_by_new_venue(self):
+        self.add_venues(1)
+        uncached = self.count_queries('/venues')
+        self.assertEqual(self.count_queries('/venues'), uncached - 1)
+
+        db.session.add(Venue(name='Late Venue', city='Austin', state='TX'))
+        db.session.commit()
+
+        names = [v['name'] for a in area_cache.get() for v in a['venues']]
+        self.assertIn('Late Venue', names)
+
+    def test_venues_etag_and_body_follow_another_workers_write(self):
+        self.add_venues(1)
+        etag = self.client().get('/venues').headers['ETag']
+
+        # straight to the database, so none of this worker's hooks run
+        with db.engine.begin() as conn:
+            conn.execute(Venue.__table__.insert().values(name='Other Worker Venue', city='Austin', state='TX'))
+
+        res = self.client().get('/venues', headers={'If-None-Match': etag})
+        self.assertEqual(res.status_code, 200)
+        self.assertIn(b'Other Worker Venue', res.data)
+        self.assertEqual(self.client().get('/venues', headers={'If-None-Match': res.headers['ETag']}).status_code, 304)
+
+    ## NEARBY
+    def test_geohash_matches_reference(self):
+        self.assertEqual(geo.encode(57.64911, 10.40744, 11), 'u4pruydqqvj')
+        self.assertEqual(geo.cells(37.7749, -122.4194, 20),
+                         ['9q8v', '9q8y', '9q8z', '9q9j', '9q9n', '9q9p'])
+
+    def test_venues_are_located_from_gazetteer(self):
+        db.session.add(Venue(name='Hop', city='San Francisco', state='ca'))
+        db.session.commit()
+        venue = Venue.query.one()
+        self.assertEqual((venue.latitude, venue.longitude), (37.7749, -122.4194))
+        self.assertTrue(venue.geohash.startswith('9q8yy'))
+
+        venue.city = 'Nowhere'
+        db.session.commit()
+        self.assertIsNone(venue.geohash)
+
+    def test_locate_all_venues_fills_missing_coordinates(self):
+        db.session.add_all([Venue(name='Hop', city='Austin', state='TX'),
+                            Venue(name='Dive', city='Nowhere', state='TX')])
+        db.session.commit()
+        db.session.execute(Venue.__table__.update().values(latitude=None, longitude=None, geohash=None))
+        db.session.commit()
+
+        self.assertEqual(locate_all_venues(batch_size=1), (1, {('Nowhere', 'TX'): 1}))
+        self.assertEqual(Venue.query.filter_by(name='Hop').one().geohash, geo.encode(30.2672, -97.7431))
+
+    def test_nearby_venues_sorted_by_distance(self):
+        for (name, city) in (('Hop', 'San Francisco'), ('Dive', 'Oakland'), ('Far', 'Los Angeles')):
+            db.session.add(Venue(name=name, city=city, state='CA'))
+        db.session.commit()
+
+        res = self.client().get('/venues/nearby?lat=37.8&lng=-122.3&radius=30')
+        self.assertEqual([(v['name'], v['distance_km']) for v in res.get_json()],
+                         [('Dive', 2.58), ('Hop', 10.86)])
+        res = self.client().get('/venues/nearby?lat=34&lng=-118.3')
+        self.assertEqual([v['name'] for v in res.get_json()], ['Far'])
+        self.assertEqual(self.client().get('/venues/nearby?lat=91&lng=0').status_code, 400)
+        self.assertEqual(self.client().get('/venues/nearby?lat=34&lng=-118.3&radius=5000').status_code, 400)
+
+    ## RECOMMENDATIONS
+    def test_top_matches_ranks_by_jaccard_within_a_place(self):
+        sf, ny = ('san francisco', 'ca'), ('new york', 'ny')
+        venues = [(1, sf, {1, 2}), (2, sf, {1}), (3, sf, {3}), (4, ny, {1, 2}), (5, sf, {1, 2, 3})]
+        self.assertEqual(recommend.top_matches([(10, sf, {1, 2}), (11, ny, {3})], venues, 3),
+                         {10: [(1, 1.0), (5, 2 / 3), (2, 0.5)], 11: []})
+
+    def test_recommendations_follow_genre_and_seeking_changes(self):
+        jazz, blues = self.genre('Jazz'), self.genre('Blues')
+        artist = Artist(name='Sax', city='Austin', state='TX', seeking_venue=True, genres=[jazz])
+        db.session.add_all([
+            artist,
+            Venue(name='Hop', city='Austin', state='TX', seeking_talent='y', genres=[jazz, blues]),
+            Venue(name='Dive', city='austin ', state='TX', seeking_talent='y', genres=[jazz]),
+            Venue(name='Closed', city='Austin', state='TX', genres=[jazz]),
+            Venue(name='Far', city='Dallas', state='TX', seeking_talent='y', genres=[jazz]),
+        ])
+        db.session.commit()
+        page = self.client().get('/artists/%d' % artist.id).get_data(as_text=True)
+        self.assertIn('Recommended Venues', page)
+        self.assertLess(page.index('Dive'), page.index('Hop'))
+        self.assertNotIn('Closed', page)
+        self.assertNotIn('Far', page)
+
+        # Dive's change reorders the artist's list, so its page changes too
+        etag = self.client().get('/artists/%d' % artist.id).headers['ETag']
+        Venue.query.filter_by(name='Dive').one().genres = [blues]
+        db.session.commit()
+        self.assertEqual([row.venue_id for row in db.session.query(recommended_venues)],
+                         [Venue.query.filter_by(name='Hop').one().id])
+        res = self.client().get('/artists/%d' % artist.id, headers={'If-None-Match': etag})
+        self.assertEqual(res.status_code, 200)
+        self.assertNotIn('Dive', res.get_data(as_text=True))
+        self.assertIn('50% genre match', res.get_data(as_text=True))
+
+        artist.seeking_venue = False
+        db.session.commit()
+        self.assertEqual(db.session.query(recommended_venues).count(), 0)
+        self.assertEqual(db.session.query(recommended_artists).count(), 0)
+
+    def test_recommend_command_rebuilds_lost_rows(self):
+        db.session.add_all([
+            Artist(name='Sax', city='Austin', state='TX', seeking_venue=True, genres=[self.genre('Jazz')]),
+            Venue(name='Hop', city='Austin', state='TX', seeking_talent='y', genres=[self.genre('Jazz')]),
+        ])
+        db.session.commit()
+        db.session.execute(recommended_venues.delete())
+        db.session.commit()
+        debug = app.debug
+        self.addCleanup(setattr, app, 'debug', debug)
+        result = app.test_cli_runner().invoke(args=['recommend'])
+        self.assertIn('changed for 1 artists and 0 venues', result.output)
+        self.assertEqual(db.session.query(recommended_venues).count(), 1)
+
+    ## SEARCH
+    def add_artists(self, *names):
+        db.session.add_all([Artist(name=name) for name in names])
+        db.session.commit()
+
+    def search_artists(self, term, **form):
+        form['search_term'] = term
+        res = self.client().post('/artists/search', data=form)
+        self.assertEqual(res.status_code, 200)
+        return res.get_data(as_text=True)
+
+    def test_search_is_case_insensitive_substring(self):
+        self.add_artists('Guns N Petals', 'Matt Quevedo', 'The Wild Sax Band')
+
+        self.assertIn(': 3</h3>', self.search_artists('A'))
+        page = self.search_artists('band')
+        self.assertIn(': 1</h3>', page)
+        self.assertIn('The Wild Sax Band', page)
+
+    def test_search_tolerates_typos(self):
+        self.add_artists('Guns N Petals', 'The Wild Sax Band')
+
+        page = self.search_artists('wild sax bnad')
+        self.assertIn('The Wild Sax Band', page)
+        self.assertNotIn('Guns N Petals', page)
+
+    def test_search_respects_limit(self):
+        self.add_artists(*['Band %d' % i for i in range(5)])
+
+        self.assertIn(': 2</h3>', self.search_artists('band', limit=2))
+
+    def test_search_index_sees_new_artists(self):
+        self.add_artists('Guns N Petals')
+        self.search_artists('petals')
+        self.add_artists('Petal Pushers')
+
+        self.assertIn('Petal Pushers', self.search_artists('petal'))
+
+    ## DETAIL PAGES
+    def test_venue_page_splits_past_and_upcoming_shows(self):
+        self.add_venues(1)
+        venue = Venue.query.first()
+        artist = Artist.query.first()
+        for days in (2, 3, -2):
+            db.session.add(Show(artist_id=artist.id, venue_id=venue.id,
+                                start_time=datetime.now() + timedelta(days=days)))
+        db.session.commit()
+
+        res = self.client().get('/venues/%d?limit=2' % venue.id)
+        page = res.get_data(as_text=True)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn('3 Upcoming Shows', page)
+        self.assertIn('2 Past Shows', page)
+        self.assertEqual(page.count('Test Artist'), 4)  # two per section
+
+    def test_detail_query_count_is_bounded(self):
+        self.add_venues(1)
+        artist = Artist.query.first()
+        few = self.count_queries('/artists/%d' % artist.id)
+        self.add_venues(20)
+        many = self.count_queries('/artists/%d' % artist.id)
+
+        self.assertEqual(few, many)
+
+    def test_missing_artist_404(self):
+        res = self.client().get('/artists/1000')
+        self.assertEqual(res.status_code, 404)
+
+    ## SHOWS
+    def test_shows_empty(self):
+        res = self.client().get('/shows')
+        self.assertEqual(res.status_code, 200)
+
+    def test_show_form_defaults_to_configured_duration(self):
+        minutes = app.config['SHOW_DEFAULT_MINUTES']
+        app.config['SHOW_DEFAULT_MINUTES'] = 95
+        try:
+            page = self.client().get('/shows/create').get_data(as_text=True)
+        finally:
+            app.config['SHOW_DEFAULT_MINUTES'] = minutes
+
+        self.assertIn('name="duration" type="text" value="95"', page)
+
+    def test_shows_pages_by_cursor(self):
+        self.add_venues(3)  # six shows
+        app.config['SHOWS_PAGE_SIZE'] = 4
+        try:
+            first = self.client().get('/shows').get_data(as_text=True)
+            cursor = first.split('after=')[1].split('"')[0]
+            second = self.client().get('/shows?after=' + cursor).get_data(as_text=True)
+        finally:
+            app.config['SHOWS_PAGE_SIZE'] = 100
+
+        self.assertEqual(first.count('tile-show'), 4)
+        self.assertEqual(second.count('tile-show'), 2)
+        self.assertNotIn('Later shows', second)
+
+    def test_shows_date_window(self):
+        self.add_venues(2)
+        today = datetime.now().date()
+        page = self.client().get('/shows?from=%s' % today).get_data(as_text=True)
+
+        self.assertEqual(page.count('tile-show'), 2)
+
+    def test_shows_query_count_is_constant(self):
+        self.add_venues(2)
+        few = self.count_queries('/shows')
+        self.add_venues(20)
+        many = self.count_queries('/shows')
+
+        self.assertEqual(few, many)
+
+    def test_shows_bad_cursor_400(self):
+        res = self.client().get('/shows?after=yesterday')
+        self.assertEqual(res.status_code, 400)
+
+    ## FILTERS
+    def test_datetime_filter_accepts_strings_and_datetimes(self):
+        when = datetime(2020, 5, 1, 20, 0)
+
+        self.assertEqual(format_datetime(when, 'full'), 'Friday May, 1, 2020 at 8:00PM')
+        self.assertEqual(format_datetime(str(when), 'full'), format_datetime(when, 'full'))
+        self.assertEqual(format_datetime(when), 'Fri 05, 01, 2020 8:00PM')
+
+    ## GENRES
+    def test_venues_filtered_by_genre(self):
+        self.add_venues(2, genre='Jazz')
+        self.add_venues(1, city='Austin', state='TX', genre='Blues')
+
+        page = self.client().get('/venues?genre=Blues').get_data(as_text=True)
+        self.assertIn('Austin', page)
+        self.assertNotIn('San Francisco', page)
+        page = self.client().get('/venues?genre=Polka').get_data(as_text=True)
+        self.assertNotIn('Venue 0', page)
+
+    def test_artists_filtered_by_genre(self):
+        db.session.add_all([
+            Artist(name='Jazz Cats', genres=[self.genre('Jazz')]),
+            Artist(name='Blue Notes', genres=[self.genre('Blues'), self.genre('Jazz')]),
+        ])
+        db.session.commit()
+
+        page = self.client().get('/artists?genre=Blues').get_data(as_text=True)
+        self.assertIn('Blue Notes', page)
+        self.assertNotIn('Jazz Cats', page)
+
+    def test_forms_offer_genres_from_table(self):
+        db.session.add(Genre(name='Polka'))
+        db.session.commit()
+
+        page = self.client().get('/artists/create').get_data(as_text=True)
+        self.assertIn('value="Polka"', page)
+
+    def test_create_artist_links_genres(self):
+        res = self.client().post('/artists/create', data={
+            'name': 'New Artist', 'city': 'Austin', 'state': 'TX', 'phone': '',
+            'genres': ['Jazz', 'Blues'], 'image_link': '', 'facebook_link': '',
+            'site_link': ''
+        })
+
+        self.assertEqual(res.status_code, 200)
+        artist = Artist.query.filter_by(name='New Artist').one()
+        self.assertEqual([g.name for g in artist.genres], ['Jazz', 'Blues'])
+
+    ## CONDITIONAL GET
+    def test_detail_page_304_until_a_show_is_added(self):
+        self.add_venues(1)
+        venue = Venue.query.first()
+        url = '/venues/%d' % venue.id
+
+        res = self.client().get(url)
+        etag = res.headers['ETag']
+        self.assertEqual(res.status_code, 200)
+        res = self.client().get(url, headers={'If-None-Match': etag})
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res.get_data(), b'')
+
+        db.session.add(Show(artist_id=Artist.query.first().id, venue_id=venue.id,
+                            start_time=datetime.now() + timedelta(days=5)))
+        db.session.commit()
+
+        res = self.client().get(url, headers={'If-None-Match': etag})
+        self.assertEqual(res.status_code, 200)
+        self.assertNotEqual(res.headers['ETag'], etag)
+
+    def test_artist_rename_changes_venue_etag(self):
+        self.add_venues(1)
+        url = '/venues/%d' % Venue.query.first().id
+        etag = self.client().get(url).headers['ETag']
+
+        Artist.query.first().name = 'Renamed Artist'
+        db.session.commit()
+
+        res = self.client().get(url, headers={'If-None-Match': etag})
+        self.assertEqual(res.status_code, 200)
+
+    def test_hyperloglog_estimates_and_merges(self):
+        few = HyperLogLog()
+        for i in range(20):
+            few.add('visitor %d' % i)
+            few.add('visitor %d' % i)
+        self.assertEqual(few.count(), 20)
+
+        (left, right) = (HyperLogLog(), HyperLogLog())
+        for i in range(30000):
+            (left if i % 2 else right).add('visitor %d' % i)
+            if i < 10000:
+                (right if i % 2 else left).add('visitor %d' % i)
+        union = HyperLogLog.from_bytes(left.to_bytes()).merge(right)
+        self.assertLess(abs(union.count() - 30000), 30000 * 0.05)
+        self.assertLess(len(few.to_bytes()), 200)
+
+    def test_page_views_are_buffered_then_added_up(self):
+        self.add_venues(1)
+        venue = Venue.query.one()
+        (first, second) = (self.client(), self.client())
+        res = first.get('/venues/%d' % venue.id)
+        self.assertIn('visitor=', res.headers['Set-Cookie'])
+        # a revalidated page is a view too, by the same visitor
+        self.assertEqual(first.get('/venues/%d' % venue.id, headers={'If-None-Match': res.headers['ETag']}).status_code, 304)
+        second.get('/venues/%d' % venue.id)
+        self.assertEqual(db.session.query(venue_views).count(), 0)
+
+        self.assertEqual(page_views.flush(), 1)
+        second.get('/venues/%d' % venue.id)
+        self.client().get('/venues/%d' % venue.id)
+        self.client().get('/venues/999')
+        page_views.flush()
+        row = db.session.query(venue_views).one()
+        self.assertEqual((row.venue_id, row.day, row.views, row.visitors), (venue.id, date.today(), 5, 3))
+
+    def test_trending_order_ranks_by_recent_visitors(self):
+        db.session.add_all([Artist(name='Quiet'), Artist(name='Popular'), Artist(name='Faded')])
+        db.session.commit()
+        ids = dict((artist.name, artist.id) for artist in Artist.query)
+        for i in range(3):
+            page_views.record((Artist, ids['Popular'], date.today()), 'visitor %d' % i)
+        # more visitors, but long enough ago to count for less
+        for i in range(5):
+            page_views.record((Artist, ids['Faded'], date.today() - timedelta(days=5)), 'visitor %d' % i)
+        page_views.flush()
+
+        by_name = self.client().get('/artists').data
+        self.assertLess(by_name.index(b'Faded'), by_name.index(b'Popular'))
+        res = self.client().get('/artists?order=trending')
+        self.assertLess(res.data.index(b'Popular'), res.data.index(b'Faded'))
+        self.assertLess(res.data.index(b'Faded'), res.data.index(b'Quiet'))
+
+        # the trending page changes with the scores, not just with the artists
+        page_views.record((Artist, ids['Quiet'], date.today()), 'visitor 9')
+        page_views.flush()
+        trending_scores.invalidate()
+        again = self.client().get('/artists?order=trending', headers={'If-None-Match': res.headers['ETag']})
+        self.assertEqual(again.status_code, 200)
+
+    def test_listing_304_skips_queries_for_rendering(self):
+        self.add_venues(3)
+        etag = self.client().get('/artists').headers['ETag']
+        res = self.client().get('/artists', headers={'If-None-Match': etag})
+
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(self.count_queries('/artists') - 1,
+                         self.count_queries('/artists', 304, headers={'If-None-Match': etag}))
+    ## LOGGING
+    def logging_app(self, **config):
+        log_app = Flask('logging_test')
+        log_app.config.update(LOG_FILE=os.path.join(tempfile.mkdtemp(), 'error.log'), **config)
+
+        @log_app.route('/')
+        def index():
+            log_app.logger.warning('hello')
+            return 'ok'
+
+        return log_app, setup_logging(log_app)
+
+    def test_json_log_lines_carry_request_id_and_latency(self):
+        log_app, listener = self.logging_app(LOG_FORMAT='json', LOG_REQUESTS=True)
+        log_app.test_client().get('/', headers={'X-Request-ID': 'abc123'})
+        listener.queue.join()
+
+        with open(log_app.config['LOG_FILE']) as f:
+            lines = [json.loads(line) for line in f]
+        self.assertEqual([l['request_id'] for l in lines], ['abc123', 'abc123'])
+        self.assertEqual(lines[0]['message'], 'hello')
+        self.assertIn('latency_ms', lines[1])
+
+    def test_log_rollover_is_gzipped(self):
+        log_app, listener = self.logging_app(LOG_MAX_BYTES=200)
+        for _ in range(5):
+            log_app.test_client().get('/')
+        listener.queue.join()
+
+        with gzip.open(log_app.config['LOG_FILE'] + '.1.gz', 'rt') as f:
+            self.assertIn('hello', f.read())
+
+    ## SQL INSTRUMENTATION
+    def test_debug_responses_carry_query_headers(self):
+        self.add_venues(2)
+        res = self.client().get('/artists')
+
+        self.assertEqual(res.headers['X-DB-Queries'], '2')
+        self.assertEqual(res.headers['X-DB-Duplicates'], '0')
+
+    def test_route_report_aggregates_requests(self):
+        self.add_venues(1)
+        venue_id = Venue.query.first().id
+        route = 'GET /venues/<int:venue_id>'
+        before = self.client().get('/_sqlstats').get_json().get(route, {'requests': 0})
+        for _ in range(2):
+            self.client().get('/venues/%d' % venue_id)
+        after = self.client().get('/_sqlstats').get_json()[route]
+
+        self.assertEqual(after['requests'] - before['requests'], 2)
+        self.assertGreater(after['max_queries'], 0)
+
+    def test_query_budget_catches_n_plus_one(self):
+        self.add_venues(5)
+        with self.assertRaises(AssertionError):
+            with query_budget(3):
+                for v in Venue.query.all():
+                    v.shows
+
+    def test_failed_statements_leave_nothing_on_the_connection(self):
+        with db.engine.connect() as conn:
+            for _ in range(3):
+                with self.assertRaises(OperationalError):
+                    conn.execute('SELECT * FROM no_such_table')
+            with capture() as stats:
+                conn.execute('SELECT 1')
+            self.assertEqual(conn.info.get('sqlstats_start', []), [])
+        self.assertEqual(stats.count, 1)
+
+    def test_listing_routes_stay_within_budget(self):
+        self.add_venues(10)
+        for url in ('/venues', '/artists', '/shows'):
+            with query_budget(3):
+                self.client().get(url)
+
+    ## PARTITIONS
+    def test_partition_statements_carve_months_out_of_default(self):
+        month = date(2026, 12, 1)
+        self.assertEqual(partitions.add_months(month, 1), date(2027, 1, 1))
+        self.assertEqual(partitions.partition_month(partitions.partition_name(month)), month)
+        self.assertIsNone(partitions.partition_month(partitions.DEFAULT))
+        statements = partitions.create_partition(month)
+        self.assertTrue(statements[1].startswith('INSERT INTO show_y2026m12 SELECT * FROM show_default'))
+        self.assertIn("FOR VALUES FROM ('2026-12-01') TO ('2027-01-01')", statements[-1])
+
+    def test_lock_report_holds_locks_until_commit(self):
+        sql = """BEGIN;
+
+-- Running upgrade a1 -> b2
+
+ALTER TABLE "Show" ADD COLUMN end_time TIMESTAMP WITHOUT TIME ZONE;
+
+UPDATE "Show" SET end_time = start_time + interval '120 minutes';
+
+ALTER TABLE "Show" ADD FOREIGN KEY (venue_id) REFERENCES "Venue" (id) NOT VALID;
+
+UPDATE alembic_version SET version_num='b2' WHERE alembic_version.version_num = 'a1';
+
+COMMIT;
+
+BEGIN;
+
+-- Running upgrade b2 -> c3
+
+SET LOCAL lock_timeout = '2000ms';
+
+ALTER TABLE "Show" RENAME TO old_show;
+
+CREATE TABLE "Show" (LIKE old_show INCLUDING DEFAULTS);
+
+CREATE INDEX ix_show_start_time ON "Show" (start_time);
+
+INSERT INTO "Show" SELECT * FROM old_show;
+
+COMMIT;
+
+CREATE INDEX CONCURRENTLY ix_show_end_time ON "Show" (end_time);
+
+BEGIN;
+
+UPDATE alembic_version SET version_num='c3' WHERE alembic_version.version_num = 'b2';
+
+COMMIT;
+"""
+        (first, second) = lockcheck.analyze(sql, {'Show': 200000, 'Venue': 10}, {'b2': 'end time'})
+
+        self.assertEqual((first.revision, first.doc, first.lock_timeout), ('b2', 'end time', None))
+        self.assertAlmostEqual(first.seconds, 2.0)
+        # the instant ALTER holds its lock through the UPDATE after it
+        (alter,) = first.flagged(1000)
+        self.assertEqual((alter.blocking, alter.held), ([('Show', 'ACCESS EXCLUSIVE')], 2.0))
+        self.assertEqual(first.flagged(2500), [])
+        self.assertEqual(first.operations[2].blocking, [('Venue', 'SHARE ROW EXCLUSIVE')])
+
+        self.assertEqual(second.lock_timeout, '2000ms')
+        # the copy fills the new table, so the concurrent index costs its rows
+        # but blocks nothing; the one built on the new, empty table is free
+        (rename,) = second.flagged(1000)
+        self.assertIn('RENAME', rename.statement)
+        self.assertAlmostEqual(rename.held, 2.0)
+        self.assertAlmostEqual(second.operations[-2].seconds, 0.5)
+        self.assertEqual(second.operations[-2].blocking, [])
+        self.assertEqual(second.operations[3].seconds, 0.0)
+        self.assertIn('! 0.000s ALTER TABLE "Show" ADD COLUMN', first.describe(1000))
+
+    @unittest.skipUnless(os.environ.get('TEST_POSTGRES_URL'), 'needs a scratch postgres database in TEST_POSTGRES_URL')
+    def test_show_queries_prune_to_current_partitions(self):
+        settings = dict(app.config, SQLALCHEMY_DATABASE_URI=os.environ['TEST_POSTGRES_URL'], SQLALCHEMY_BINDS={})
+        del settings['SQLALCHEMY_ENGINE_OPTIONS']
+        # the scoped session is per thread, not per app
+        db.session.remove()
+        self.addCleanup(db.session.remove)
+        with create_app(types.SimpleNamespace(**settings)).app_context():
+            db.session.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+            db.session.commit()
+            db.create_all()
+            try:
+                artist, venue = Artist(name='Sax'), Venue(name='Hop')
+                db.session.add_all([artist, venue])
+                db.session.commit()
+                now = datetime.now()
+                month = partitions.month_of(now)
+                (old, recent) = (partitions.add_months(month, -30), partitions.add_months(month, -2))
+                for start in (datetime.combine(old, time(20)), datetime.combine(recent, time(20)), now + timedelta(days=1)):
+                    db.session.add(Show(artist_id=artist.id, venue_id=venue.id, start_time=start))
+                db.session.commit()
+
+                # months only show_default held are carved out, the old one archived
+                self.assertEqual(maintain_show_partitions(),
+                                 ([partitions.partition_name(old), partitions.partition_name(recent)],
+                                  [partitions.partition_name(old)]))
+                self.assertEqual(db.session.query(Venue.past_shows_count).scalar(), 1)
+
+                upcoming = db.session.query(Show.id)\
+                    .filter(Show.venue_id == venue.id, Show.start_time > now)\
+                    .order_by(Show.start_time).limit(10).statement.compile(db.engine)
+                plan = '\n'.join(row[0] for row in
+                                 db.session.connection().execute('EXPLAIN ' + str(upcoming), upcoming.params))
+                self.assertIn(partitions.partition_name(month), plan)
+                self.assertNotIn(partitions.partition_name(recent), plan)
+            finally:
+                db.session.rollback()
+                db.session.execute('DROP SCHEMA IF EXISTS archive CASCADE')
+                db.session.commit()
+                db.drop_all()
+                db.session.remove()
+
+    ## CONNECTION POOL
+    def test_engine_options_from_config(self):
+        config = dict(app.config, SQLALCHEMY_DATABASE_URI='postgresql://localhost/fyyur',
+                      DB_POOL_SIZE=7, DB_STATEMENT_TIMEOUT_MS=5000, DB_PGBOUNCER=False)
+        options = engine_options(config)
+
+        self.assertEqual(options['pool_size'], 7)
+        self.assertTrue(options['pool_pre_ping'])
+        self.assertEqual(options['connect_args'], {'options': '-c statement_timeout=5000'})
+        # pgbouncer refuses startup options; the timeout is set per transaction
+        self.assertNotIn('connect_args', engine_options(dict(config, DB_PGBOUNCER=True)))
+        self.assertEqual(engine_options(app.config), {})  # sqlite
+
+    def test_pool_listener_added_once(self):
+        create_app()
+        create_app()
+        listeners = [listener.__name__ for listener in db.session().dispatch.after_begin]
+        self.assertEqual(listeners.count('set_statement_timeout'), 1)
+
+    def test_timed_pool_reports_checkouts(self):
+        pool = TimedQueuePool(lambda: sqlite3.connect(':memory:'), pool_size=2, max_overflow=0)
+        first, second = pool.connect(), pool.connect()
+        status = pool_status(pool)
+        first.close()
+        second.close()
+
+        self.assertEqual(status['checked_out'], 2)
+        self.assertEqual(status['checkouts'], 2)
+        self.assertGreaterEqual(status['max_wait_ms'], 0)
+
+    def test_pool_endpoint(self):
+        res = self.client().get('/_pool')
+        self.assertEqual(res.status_code, 200)
+        # the replica's pool serves most reads
+        self.assertEqual(sorted(res.get_json()), ['primary', 'replica'])
+        self.assertIn('class', res.get_json()['replica'])
+
+    def test_pool_endpoint_needs_debug_or_config(self):
+        production = create_app()
+        production.debug = False
+        self.assertEqual(production.test_client().get('/_pool').status_code, 404)
+        production.config['POOL_STATS'] = True
+        self.assertEqual(production.test_client().get('/_pool').status_code, 200)
+
+    ## BOOKINGS
+    def book(self, start_time, duration=120, client=None):
+        return (client or self.client()).post('/shows/create', data={
+            'artist_id': Artist.query.first().id, 'venue_id': Venue.query.first().id,
+            'start_time': start_time, 'duration': duration
+        })
+
+    def test_overlapping_booking_is_rejected(self):
+        self.add_venues(1)
+        self.assertEqual(self.book('2030-05-01 20:00').status_code, 200)
+
+        res = self.book('2030-05-01 21:30')
+        self.assertEqual(res.status_code, 409)
+        self.assertIn(b'already booked', res.data)
+        # back to back is fine
+        self.assertEqual(self.book('2030-05-01 22:00', duration=60).status_code, 200)
+        self.assertEqual(self.book('2030-05-01 19:00', duration=60).status_code, 200)
+
+    def test_conflicts_endpoint(self):
+        self.add_venues(1)
+        self.book('2030-05-01 20:00')
+        url = '/venues/%d/conflicts?start_time=%s' % (Venue.query.first().id, '2030-05-01 18:30')
+
+        self.assertEqual(len(self.client().get(url).get_json()['conflicts']), 1)
+        self.assertTrue(self.client().get(url + '&duration=90').get_json()['available'])
+        self.assertEqual(self.client().get(url.split('?')[0]).status_code, 400)
+        self.assertEqual(self.client().get(url + '&duration=0').status_code, 400)
+        self.assertEqual(self.client().get(url + '&duration=-30').status_code, 400)
+
+    def test_concurrent_bookings_only_one_wins(self):
+        self.add_venues(1)
+        data = {'artist_id': Artist.query.first().id, 'venue_id': Venue.query.first().id}
+        barrier = threading.Barrier(8)
+        statuses = []
+
+        def submit(minute):
+            client = app.test_client()
+            barrier.wait()
+            res = client.post('/shows/create', data=dict(data, start_time='2030-06-01 20:%02d' % minute))
+            statuses.append(res.status_code)
+
+        threads = [threading.Thread(target=submit, args=(i,)) for i in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(sorted(statuses), [200] + [409] * 7)
+        self.assertEqual(Show.query.filter(Show.start_time >= datetime(2030, 6, 1)).count(), 1)
+
+    ## TICKETS
+    def on_sale(self, capacity):
+        self.add_venues(1)
+        self.assertEqual(self.client().post('/shows/create', data={
+            'artist_id': Artist.query.first().id, 'venue_id': Venue.query.first().id,
+            'start_time': '2030-05-01 20:00', 'capacity': capacity
+        }).status_code, 200)
+        return Show.query.filter_by(capacity=capacity).one().id
+
+    def tickets_left(self, show_id):
+        return [remaining for (remaining,) in db.session.query(ticket_inventory.c.remaining)
+                .filter(ticket_inventory.c.show_id == show_id).order_by(ticket_inventory.c.bucket)]
+
+    def test_ticket_sales_are_split_into_buckets(self):
+        show_id = self.on_sale(50)
+
+        # every bucket fits the largest order, TICKETS_PER_ORDER
+        self.assertEqual(self.tickets_left(show_id), [9, 9, 8, 8, 8, 8])
+        self.assertEqual(self.client().get('/shows/%d/tickets' % show_id).get_json()['available'], 50)
+        other = Show.query.filter(Show.capacity.is_(None)).first().id
+        self.assertEqual(self.client().get('/shows/%d/tickets' % other).status_code, 404)
+        self.assertEqual(self.client().post('/shows/%d/tickets' % other).status_code, 404)
+        self.assertEqual(self.client().post('/shows/%d/tickets' % show_id, data={'quantity': 9}).status_code, 400)
+
+    def test_concurrent_reservations_never_oversell(self):
+        show_id = self.on_sale(20)
+        url = '/shows/%d/tickets' % show_id
+        barrier = threading.Barrier(8)
+        (reserved, statuses) = ([], [])
+
+        def buy():
+            client = app.test_client()
+            barrier.wait()
+            while True:
+                res = client.post(url, data={'quantity': 3})
+                if res.status_code != 201:
+                    break
+                reserved.append(res.get_json()['quantity'])
+            statuses.append(res.status_code)
+
+        threads = [threading.Thread(target=buy) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        # two buckets of 10, so 3 tickets each for 3 orders from each
+        self.assertEqual(statuses, [409] * 8)
+        self.assertEqual(reserved, [3] * 6)
+        left = self.tickets_left(show_id)
+        self.assertEqual(left, [1, 1])
+        self.assertEqual(sum(reserved) + sum(left), 20)
+        self.assertEqual(db.session.query(db.func.sum(ticket_reservations.c.quantity)).scalar(), sum(reserved))
+
+    def test_order_too_large_for_any_bucket(self):
+        show_id = self.on_sale(20)
+        for _ in range(2):
+            reserve_tickets(show_id, 8)
+        self.assertEqual(self.tickets_left(show_id), [2, 2])
+
+        with self.assertRaises(SoldOut) as raised:
+            reserve_tickets(show_id, 3)
+        self.assertEqual((raised.exception.available, raised.exception.largest), (4, 2))
+        res = self.client().post('/shows/%d/tickets' % show_id, data={'quantity': 3})
+        self.assertEqual(res.status_code, 409)
+        self.assertEqual(res.get_json(), {'error': 'Only 4 tickets left, at most 2 in one order',
+                                          'available': 4, 'largest_order': 2})
+        self.assertEqual(self.client().post('/shows/%d/tickets' % show_id, data={'quantity': 2}).status_code, 201)
+
+    def test_expired_holds_go_back_on_sale(self):
+        show_id = self.on_sale(4)
+        now = datetime.now()
+        held = [reserve_tickets(show_id, 1, now)[0] for _ in range(4)]
+        with self.assertRaises(SoldOut):
+            reserve_tickets(show_id, 1, now)
+
+        self.assertEqual(self.client().post('/reservations/%s/confirm' % held[0]).status_code, 200)
+        self.assertEqual(self.client().delete('/reservations/' + held[1]).status_code, 204)
+        self.assertEqual(self.client().delete('/reservations/' + held[1]).status_code, 410)
+        later = now + timedelta(seconds=app.config['TICKET_HOLD_SECONDS'])
+        self.assertFalse(confirm_reservation(held[2], later))
+        # the released ticket, then the two expired holds
+        for _ in range(3):
+            reserve_tickets(show_id, 1, later)
+        with self.assertRaises(SoldOut):
+            reserve_tickets(show_id, 1, later)
+        self.assertEqual(dict(db.session.query(ticket_reservations.c.status, db.func.count())
+                              .group_by(ticket_reservations.c.status)),
+                         {'confirmed': 1, 'released': 1, 'expired': 2, 'held': 3})
+
+    ## SHOW COUNTERS
+    def counts(self, obj):
+        db.session.refresh(obj)
+        return (obj.upcoming_shows_count, obj.past_shows_count)
+
+    def test_show_counters_follow_inserts_moves_and_deletes(self):
+        self.add_venues(2)
+        (first, second) = Venue.query.order_by(Venue.id).all()
+        artist = Artist.query.first()
+        self.assertEqual(self.counts(first), (1, 1))
+        self.assertEqual(self.counts(artist), (2, 2))
+
+        show = Show.query.filter_by(venue_id=first.id, is_past=False).one()
+        show.venue = second
+        db.session.commit()
+        self.assertEqual(self.counts(first), (0, 1))
+        self.assertEqual(self.counts(second), (2, 1))
+
+        show.start_time = datetime.now() - timedelta(hours=1)
+        db.session.commit()
+        self.assertEqual(self.counts(second), (1, 2))
+        self.assertEqual(self.counts(artist), (1, 3))
+
+        db.session.delete(show)
+        db.session.commit()
+        self.assertEqual(self.counts(second), (1, 1))
+        self.assertEqual(repair_show_counts(fix=False), [])
+
+    def test_roll_moves_started_shows_to_past(self):
+        self.add_venues(2)
+        venue = Venue.query.first()
+        self.assertEqual(area_cache.get()[0]['venues'][0]['num_upcoming_shows'], 1)
+
+        self.assertEqual(roll_past_shows(), 0)
+        self.assertEqual(roll_past_shows(now=datetime.now() + timedelta(days=2), batch_size=1), 2)
+        self.assertEqual(self.counts(venue), (0, 2))
+        self.assertEqual(self.counts(Artist.query.first()), (0, 4))
+        self.assertEqual(roll_past_shows(now=datetime.now() + timedelta(days=2)), 0)
+        self.assertEqual(area_cache.get()[0]['venues'][0]['num_upcoming_shows'], 0)
+
+    def test_repair_reports_and_fixes_drift(self):
+        self.add_venues(1)
+        venue = Venue.query.first()
+        db.session.execute(Venue.__table__.update().values(upcoming_shows_count=5))
+        db.session.commit()
+
+        self.assertEqual(repair_show_counts(fix=False), [('Venue', venue.id, (5, 1), (1, 1))])
+        self.assertEqual(len(repair_show_counts()), 1)
+        self.assertEqual(self.counts(venue), (1, 1))
+        self.assertEqual(repair_show_counts(), [])
+
+    def test_repair_command(self):
+        self.add_venues(1)
+        db.session.execute(Artist.__table__.update().values(past_shows_count=0))
+        db.session.commit()
+
+        # loading the app for a command resets debug from FLASK_DEBUG
+        self.addCleanup(setattr, app, 'debug', app.debug)
+        result = app.test_cli_runner().invoke(args=['repair-show-counts', '--dry-run'])
+        self.assertIn('upcoming/past 1/0, should be 1/1', result.output)
+        self.assertIn('1 counters drifted', result.output)
+
+    ## STARTUP
+    def test_boot_leaves_forms_babel_and_migrate_unimported(self):
+        (ms, imported) = boot_time()
+        self.assertEqual(imported, [])
+
+    ## BACKFILLS
+    def test_backfill_resumes_after_interruption(self):
+        self.add_venues(3)
+        self.addCleanup(backfill.progress.drop, db.engine, checkfirst=True)
+        run = lambda values: backfill.backfill(db.engine, 'test_counts', 'Venue', values,
+                                               batch_size=1, sleep=0)
+
+        # sqlite overflows on abs() of the smallest integer, failing batch two
+        with self.assertRaises(OperationalError):
+            run('past_shows_count = CASE WHEN id = 2 THEN abs(-9223372036854775808) ELSE 7 END')
+        self.assertEqual(run('past_shows_count = 8'), 2)
+        self.assertEqual(run('past_shows_count = 9'), 0)
+
+        db.session.expire_all()
+        self.assertEqual([v.past_shows_count for v in Venue.query.order_by(Venue.id)], [7, 8, 8])
+        (status,) = backfill.backfill_status(db.engine)
+        self.assertEqual((status.name, status.rows), ('test_counts', 3))
+        self.assertIsNotNone(status.finished_at)
+
+    def test_migrations_rewrite_rows_only_through_backfills(self):
+        # an UPDATE, DELETE or INSERT ... SELECT in upgrade() itself holds the
+        # rows it touches until the revision commits; run_backfill() works a
+        # batch at a time. Read from the SQL the revisions emit, so statements
+        # built by helpers count too. Filling a table the same revision
+        # creates is fine, unless from one it has already altered, and so
+        # locked.
+        migrating = create_app()
+        migrating.config['SQLALCHEMY_DATABASE_URI'] = 'postgresql://localhost/fyyur'
+        with migrating.app_context(), mock.patch('backfill.run_backfill'), mock.patch('logging.config.fileConfig'):
+            sql = lockcheck.offline_sql(migrating.extensions['migrate'].migrate.get_config(), 'base:head')
+
+        (created, altered, unbatched) = ({}, {}, [])
+        for (revision, statement) in lockcheck.split_statements(sql):
+            new = re.match(r'^CREATE TABLE ' + lockcheck.TABLE, statement, re.I)
+            if new:
+                created.setdefault(revision, set()).add(lockcheck.table_name(new.group('table')))
+            alter = re.match(r'^ALTER TABLE ' + lockcheck.TABLE + r'( RENAME TO ' + lockcheck.OTHER + '$)?',
+                             statement, re.I)
+            if alter:
+                altered.setdefault(revision, set()).update(
+                    lockcheck.table_name(name) for name in alter.group('table', 'other') if name)
+            write = re.match(r'^(UPDATE|DELETE FROM|INSERT INTO) ' + lockcheck.TABLE + r'(?P<select>.*? SELECT )?',
+                             statement, re.I)
+            if write is None or lockcheck.table_name(write.group('table')) == 'alembic_version':
+                continue
+            if write.group(1).upper() == 'INSERT INTO' and (not write.group('select') or (
+                    lockcheck.table_name(write.group('table')) in created.get(revision, ())
+                    and lockcheck.classify(statement).rows_of not in altered.get(revision, ()))):
+                continue
+            unbatched.append((revision, statement))
+
+        self.assertEqual(unbatched, [])
+
+    ## JSON API
+    def test_api_lists_requested_fields_only(self):
+        self.add_venues(2)
+        with capture() as stats:
+            res = self.client().get('/api/v1/venues?fields=name,upcoming_shows_count')
+
+        self.assertEqual(res.get_json()['data'][0], {'name': 'Venue 0', 'upcoming_shows_count': 1})
+        statement = list(stats.shapes)[-1]
+        self.assertIn('upcoming_shows_count', statement)
+        self.assertNotIn('city', statement)
+
+    def test_api_pages_with_cursor(self):
+        self.add_venues(3)
+        first = self.client().get('/api/v1/shows?limit=4&fields=id,start_time').get_json()
+        second = self.client().get('/api/v1/shows?limit=4&after=' + first['next']).get_json()
+
+        self.assertEqual(len(first['data']), 4)
+        self.assertEqual(len(second['data']), 2)
+        self.assertIsNone(second['next'])
+        ids = [show['id'] for show in first['data'] + second['data']]
+        self.assertEqual(sorted(ids), sorted(id for (id,) in db.session.query(Show.id)))
+
+    def test_api_related_genres_and_detail(self):
+        self.add_venues(1, genre='Blues')
+        artist = Artist.query.first()
+        res = self.client().get('/api/v1/artists/%d?fields=name,genres' % artist.id)
+
+        self.assertEqual(res.get_json(), {'data': {'name': 'Test Artist', 'genres': ['Blues']}})
+        self.assertEqual(self.client().get('/api/v1/artists?genre=Jazz').get_json()['data'], [])
+        self.assertEqual(self.client().get('/api/v1/artists/%d' % (artist.id + 1)).status_code, 404)
+
+    def test_api_rejects_bad_input(self):
+        self.assertEqual(self.client().get('/api/v1/venues?fields=name,secret').status_code, 400)
+        self.assertEqual(self.client().get('/api/v1/shows?after=nope').status_code, 400)
+        self.assertEqual(self.client().get('/api/v1/shows?from=someday').status_code, 400)
+        self.assertEqual(self.client().get('/api/v1/tickets').status_code, 404)
+
+    def test_api_encoders_agree(self):
+        value = {'start_time': datetime(2030, 5, 1, 20, 0), 'day': datetime(2030, 5, 1).date()}
+        fast = api.dumps(value)
+        orjson, api.orjson = api.orjson, None
+        try:
+            self.assertEqual(json.loads(api.dumps(value)), json.loads(fast))
+        finally:
+            api.orjson = orjson
+
+    ## STATIC ASSETS
+    def build_assets(self):
+        dest = tempfile.mkdtemp()
+        manifest = assets.build(app.static_folder, dest)
+        (config, loaded) = (app.config['ASSETS_DIR'], app.extensions['assets'])
+        app.config['ASSETS_DIR'], app.extensions['assets'] = dest, manifest
+        self.addCleanup(app.config.__setitem__, 'ASSETS_DIR', config)
+        self.addCleanup(app.extensions.__setitem__, 'assets', loaded)
+        return (dest, manifest)
+
+    def test_build_fingerprints_and_precompresses(self):
+        (dest, manifest) = self.build_assets()
+        hashed = manifest['css/main.css']
+
+        self.assertRegex(hashed, r'^css/main\.[0-9a-f]{10}\.css$')
+        self.assertTrue(os.path.isfile(os.path.join(dest, hashed + '.gz')))
+        self.assertFalse(os.path.exists(os.path.join(dest, manifest['img/front-splash.jpg'] + '.gz')))
+        with open(os.path.join(dest, 'manifest.json')) as f:
+            self.assertEqual(json.load(f), manifest)
+        self.assertEqual(assets.build(app.static_folder, tempfile.mkdtemp()), manifest)
+
+    def test_build_rewrites_css_references(self):
+        source = tempfile.mkdtemp()
+        os.makedirs(os.path.join(source, 'css'))
+        os.makedirs(os.path.join(source, 'img'))
+        with open(os.path.join(source, 'img', 'logo.png'), 'wb') as f:
+            f.write(b'png')
+        with open(os.path.join(source, 'css', 'site.css'), 'w') as f:
+            f.write('/* header */\nh1 {\n  background: url("../img/logo.png");\n}\n')
+        dest = tempfile.mkdtemp()
+        manifest = assets.build(source, dest)
+
+        with open(os.path.join(dest, manifest['css/site.css'])) as f:
+            self.assertEqual(f.read(), 'h1{background:url("../%s")}' % manifest['img/logo.png'])
+
+    def test_static_urls_and_headers(self):
+        (dest, manifest) = self.build_assets()
+        page = self.client().get('/').get_data(as_text=True)
+        url = '/static/dist/' + manifest['css/main.css']
+        self.assertIn(url, page)
+
+        res = self.client().get(url, headers={'Accept-Encoding': 'gzip, deflate'})
+        self.assertEqual(res.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(res.mimetype, 'text/css')
+        self.assertIn('immutable', res.headers['Cache-Control'])
+        self.assertIn('Accept-Encoding', res.headers['Vary'])
+        with open(os.path.join(dest, manifest['css/main.css']), 'rb') as f:
+            self.assertEqual(gzip.decompress(res.data), f.read())
+        res.close()
+
+        res = self.client().get(url)
+        self.assertNotIn('Content-Encoding', res.headers)
+        res.close()
+        self.assertEqual(self.client().get('/static/css/main.css').status_code, 200)
+
+    ## TYPEAHEAD
+    def test_prefix_index_ranks_name_starts_first(self):
+        index = PrefixIndex([(1, 'The Wild Sax Band'), (2, 'Saxophone Hall'), (3, 'Café Sax')])
+
+        self.assertEqual(index.search('sax'), [(2, 'Saxophone Hall'), (3, 'Café Sax'), (1, 'The Wild Sax Band')])
+        self.assertEqual(index.search('cafe s'), [(3, 'Café Sax')])
+        self.assertEqual(index.search('sax', limit=1), [(2, 'Saxophone Hall')])
+        self.assertEqual(index.search('  '), [])
+
+        index.put(2, 'Horn Hall')
+        index.remove(3)
+        self.assertEqual(index.search('sax'), [(1, 'The Wild Sax Band')])
+        self.assertEqual(index.search('ho'), [(2, 'Horn Hall')])
+
+    def test_typeahead_follows_creates_and_renames(self):
+        self.add_venues(1)
+        self.assertEqual(self.client().get('/artists/typeahead?q=te').get_json(),
+                         [{'id': Artist.query.first().id, 'name': 'Test Artist'}])
+        index = typeahead_indexes.peek(Artist)
+
+        db.session.add(Artist(name='Test Pilot'))
+        db.session.commit()
+        artist = Artist.query.filter_by(name='Test Artist').one()
+        artist.name = 'Renamed Artist'
+        db.session.commit()
+        artist.name = 'Never Committed'
+        db.session.flush()
+        db.session.rollback()
+
+        names = [match['name'] for match in self.client().get('/artists/typeahead?q=re').get_json()]
+        self.assertEqual(names, ['Renamed Artist'])
+        self.assertEqual(len(self.client().get('/artists/typeahead?q=test').get_json()), 1)
+        self.assertEqual(self.client().get('/artists/typeahead?q=never').get_json(), [])
+        self.assertIs(typeahead_indexes.peek(Artist), index)
+        self.assertEqual(self.client().get('/venues/typeahead?q=venue&limit=50').get_json(),
+                         [{'id': Venue.query.first().id, 'name': 'Venue 0'}])
+
+    def test_typeahead_skips_a_failed_commit(self):
+        self.add_venues(1)
+        self.client().get('/artists/typeahead?q=te')
+
+        def fail(session):
+            raise OperationalError('COMMIT', {}, Exception('connection lost'))
+        event.listen(db.session, 'before_commit', fail)
+        self.addCleanup(event.remove, db.session, 'before_commit', fail)
+        Artist.query.first().name = 'Never Committed'
+        with self.assertRaises(OperationalError):
+            db.session.commit()
+        db.session.rollback()
+
+        self.assertEqual(self.client().get('/artists/typeahead?q=never').get_json(), [])
+        self.assertEqual(len(self.client().get('/artists/typeahead?q=te').get_json()), 1)
+
+    def test_typeahead_follows_a_rename_alone(self):
+        self.add_venues(1)
+        self.client().get('/artists/typeahead?q=te')
+
+        artist = Artist.query.first()
+        artist.name = 'Renamed Artist'
+        db.session.commit()
+
+        self.assertEqual(self.client().get('/artists/typeahead?q=re').get_json(),
+                         [{'id': artist.id, 'name': 'Renamed Artist'}])
+        self.assertEqual(self.client().get('/artists/typeahead?q=te').get_json(), [])
+
+    def test_show_form_uses_typeahead(self):
+        page = self.client().get('/shows/create').get_data(as_text=True)
+
+        self.assertIn('data-typeahead="/artists/typeahead"', page)
+        self.assertIn('type="hidden"', page)
+
+    ## LOAD BENCHMARK
+    def test_load_benchmark_covers_every_route(self):
+        sample = load_data.Sample(1, 1, 'Venue 0', 'Test Artist', 'Jazz', date.today(), 1)
+        self.assertEqual(missing(app, targets(sample)), [])
+
+    def test_load_benchmark_data_is_reproducible(self):
+        load_data.seed(300, seed=1)
+        names = [name for (name,) in db.session.query(Venue.name).order_by(Venue.id)]
+        load_data.seed(300, seed=1)
+
+        self.assertEqual([name for (name,) in db.session.query(Venue.name).order_by(Venue.id)], names)
+        self.assertEqual(Show.query.count(), 300)
+        self.assertEqual(repair_show_counts(fix=False), [])
+
+    ## READ REPLICA
+    def use_replica(self):
+        app.config['READ_REPLICA_ROUTING'] = True
+        replica = db.get_engine(app, 'replica')
+        db.Model.metadata.create_all(bind=replica)
+        self.addCleanup(db.Model.metadata.drop_all, bind=replica)
+        return replica
+
+    def test_get_reads_from_replica(self):
+        replica = self.use_replica()
+        replica.execute(Artist.__table__.insert(), name='Replica Artist')
+        db.session.add(Artist(name='Primary Artist'))
+        db.session.commit()
+
+        res = self.client().get('/artists')
+
+        self.assertIn(b'Replica Artist', res.data)
+        self.assertNotIn(b'Primary Artist', res.data)
+
+    def test_reads_own_writes_after_create(self):
+        self.use_replica()
+        client = self.client()
+        res = client.post('/artists/create', data={
+            'name': 'New Artist', 'city': 'Austin', 'state': 'TX', 'phone': '',
+            'genres': ['Jazz'], 'image_link': '', 'facebook_link': '', 'site_link': ''
+        })
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(Artist.query.filter_by(name='New Artist').count(), 1)
+
+        self.assertIn(b'New Artist', client.get('/artists').data)
+        # other clients still read the (lagging) replica
+        self.assertNotIn(b'New Artist', self.client().get('/artists').data)
+
+        app.config['REPLICA_LAG_SECONDS'] = 0
+        self.addCleanup(app.config.__setitem__, 'REPLICA_LAG_SECONDS', 5)
+        client.post('/artists/create', data={'name': 'Other Artist', 'city': 'Austin',
+            'state': 'TX', 'phone': '', 'image_link': '', 'facebook_link': '', 'site_link': ''})
+        self.assertNotIn(b'New Artist', client.get('/artists').data)
+
+    def test_reads_own_writes_on_another_worker(self):
+        self.use_replica()
+        res = self.client().post('/artists/create', data={'name': 'New Artist', 'city': 'Austin',
+            'state': 'TX', 'phone': '', 'image_link': '', 'facebook_link': '', 'site_link': ''})
+        (cookie,) = [header.split(';')[0].split('=', 1) for header in res.headers.getlist('Set-Cookie')
+                     if header.startswith('read_primary_until=')]
+
+        # a worker with a SECRET_KEY of its own
+        worker = create_app()
+        worker.config.update(SECRET_KEY=os.urandom(32), TESTING=True)
+        client = worker.test_client()
+        client.set_cookie('localhost', *cookie)
+        self.assertIn(b'New Artist', client.get('/artists').data)
+        listeners = [listener.__name__ for listener in db.session().dispatch.after_commit]
+        self.assertEqual(listeners.count('remember_write'), 1)
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,570 @@
+import functools
+import uuid
+from datetime import date, datetime, timedelta
+from flask import Blueprint, render_template, request, Response, flash, redirect, url_for, abort, stream_with_context, jsonify, current_app, \
+  make_response, g
+from models import db, Venue, Artist, Show, BookingConflict, SoldOut, area_cache, genre_choices, page_views, \
+  trending_scores, typeahead_indexes, book_show, confirm_reservation, find_conflicts, find_genres, \
+  find_nearby_venues, format_show, load_artists, load_recommendations, load_shows, load_show_sections, \
+  release_reservation, reserve_tickets, search_names, show_window, tickets_available, trending_areas, \
+  trending_artists
+from paging import KeysetPage, decode_cursor
+from filters import parse_datetime
+from conditional import conditional
+
+#----------------------------------------------------------------------------#
+# Helpers.
+#----------------------------------------------------------------------------#
+
+# forms (and wtforms under them) are imported by the views that use them,
+# not by every worker at boot
+
+def venue_form(**kwargs):
+  from forms import VenueForm
+  form = VenueForm(**kwargs)
+  form.genres.choices = genre_choices.get()
+  return form
+
+def artist_form(**kwargs):
+  from forms import ArtistForm
+  form = ArtistForm(**kwargs)
+  form.genres.choices = genre_choices.get()
+  return form
+
+def trending():
+  return request.args.get('order') == 'trending'
+
+def listing_validator(model):
+  # a listing changes when a row is added, edited or removed, and in trending
+  # order whenever the scores are recomputed. The (count, last_modified) read
+  # is kept in g.listing_version, for views rendering from a cache.
+  def validator():
+    count, last_modified = db.session.query(
+      db.func.count(model.id),
+      db.func.max(model.updated_at)
+    ).one()
+    g.listing_version = (count, last_modified)
+    if trending():
+      computed = trending_scores.get(model)[0]
+      return (count, last_modified, computed), max(last_modified or computed, computed)
+    return (count, last_modified), last_modified
+  return validator
+
+def detail_validator(model, show_column):
+  # a detail page changes on writes to the entity or its shows (tracked by
+  # version), and whenever one of its shows moves from upcoming to past
+  def validator(**view_args):
+    # routes name their id argument after the Show column, e.g. venue_id
+    entity_id = view_args[show_column.key]
+    passed = db.session.query(db.func.max(Show.start_time))\
+      .filter(show_column == entity_id, Show.start_time <= datetime.now())\
+      .as_scalar()
+    row = db.session.query(model.version, model.updated_at, passed)\
+      .filter(model.id == entity_id).first()
+    if row is None:
+      abort(404)
+    (version, updated_at, passed) = row
+    return (version, passed), max(updated_at, passed or updated_at)
+  return validator
+
+# a random id per browser, so page views can be told apart by visitor
+VISITOR_COOKIE = 'visitor'
+VISITOR_COOKIE_MAX_AGE = 365 * 24 * 3600
+
+def counted(model, id_argument):
+  # counts a view of the page in page_views, a 304 included; placed outside
+  # conditional() so views answered from the browser's cache count too
+  def decorator(view):
+    @functools.wraps(view)
+    def wrapper(**kwargs):
+      response = make_response(view(**kwargs))
+      if response.status_code in (200, 304):
+        visitor = request.cookies.get(VISITOR_COOKIE)
+        if not visitor:
+          visitor = uuid.uuid4().hex
+          response.set_cookie(VISITOR_COOKIE, visitor, max_age=VISITOR_COOKIE_MAX_AGE,
+            httponly=True, samesite='Lax')
+        page_views.record((model, kwargs[id_argument], date.today()), visitor)
+      return response
+    return wrapper
+  return decorator
+
+def stream_template(template_name, **context):
+  # renders in chunks as the context's iterables are consumed
+  current_app.update_template_context(context)
+  stream = current_app.jinja_env.get_template(template_name).stream(context)
+  stream.enable_buffering(5)
+  return stream
+
+#----------------------------------------------------------------------------#
+# Controllers.
+#----------------------------------------------------------------------------#
+
+main = Blueprint('main', __name__)
+
+@main.route('/')
+def index():
+  return render_template('pages/home.html')
+
+
+#  Venues
+#  ----------------------------------------------------------------
+
+@main.route('/venues')
+@conditional(listing_validator(Venue))
+def venues():
+  # TODO: replace with real venues data.
+  #       num_shows should be aggregated based on number of upcoming shows per venue.  
+  genre = request.args.get('genre') or None
+  if genre is not None and (genre, genre) not in genre_choices.get():
+    areas = []
+  else:
+    # the areas read for this ETag's version, not those another worker's
+    # write has made stale
+    areas = area_cache.get(genre, version=g.listing_version)
+  if trending():
+    areas = trending_areas(areas)
+
+  return render_template('pages/venues.html', areas=areas)
+
+def typeahead(model):
+  # ?q=<start of a name>&limit=; used by the show form's artist and venue pickers
+  limit = min(request.args.get('limit', type=int) or current_app.config['TYPEAHEAD_LIMIT'],
+    current_app.config['TYPEAHEAD_LIMIT'])
+  matches = typeahead_indexes.get(model).search(request.args.get('q', ''), limit)
+  return jsonify([{'id': id, 'name': name} for (id, name) in matches])
+
+@main.route('/venues/typeahead')
+def venue_typeahead():
+  return typeahead(Venue)
+
+@main.route('/venues/nearby')
+def nearby_venues():
+  # ?lat=&lng= in degrees, ?radius= in km, ?limit=; nearest first
+  lat = request.args.get('lat', type=float)
+  lng = request.args.get('lng', type=float)
+  radius = request.args.get('radius', current_app.config['NEARBY_DEFAULT_RADIUS_KM'], type=float)
+  if lat is None or lng is None or not (-90 <= lat <= 90 and -180 <= lng <= 180) \
+      or not 0 < radius <= current_app.config['NEARBY_MAX_RADIUS_KM']:
+    abort(400)
+  limit = min(request.args.get('limit', type=int) or current_app.config['NEARBY_LIMIT'],
+    current_app.config['NEARBY_LIMIT'])
+  return jsonify([{
+    'id': row.id,
+    'name': row.name,
+    'city': row.city,
+    'state': row.state,
+    'distance_km': round(distance, 2)
+  } for (distance, row) in find_nearby_venues(lat, lng, radius, limit)])
+
+@main.route('/venues/search', methods=['POST'])
+def search_venues():
+  # TODO: implement search on venues with partial string search. Ensure it is case-insensitive.
+  # seach for "A" should return "Guns N Petals", "Matt Quevado", and "The Wild Sax Band".
+  # search for "band" should return "The Wild Sax Band".
+  
+  search_term = request.form.get('search_term', '')
+  results = search_names(Venue, search_term, request.form.get('limit', type=int))
+  
+  response ={
+    "count": len(results),
+    "data": [{"id": id, "name": name} for (id, name) in results]
+  }
+  return render_template('pages/search_venues.html', results=response, search_term=search_term)
+
+@main.route('/venues/<int:venue_id>', methods=['GET'])
+@counted(Venue, 'venue_id')
+@conditional(detail_validator(Venue, Show.venue_id))
+def show_venue(venue_id):
+  # shows venue detail
+  data = {}
+  venue = Venue.query.get(venue_id)
+  if venue is None:
+    abort(404)
+
+  data = {
+    "id": venue.id,
+    "name": venue.name,
+    "genres": [genre.name for genre in venue.genres],
+    "city": venue.city,
+    "state": venue.state,
+    "phone": venue.phone,
+    "website": venue.site_link,
+    "facebook_link": venue.facebook_link,
+    "seeking_talent": venue.seeking_talent,
+    "seeking_description": venue.seeking_description,
+    "image_link": venue.image_link,
+    "upcoming_shows_count": venue.upcoming_shows_count,
+    "past_shows_count": venue.past_shows_count
+  }
+  data.update(load_show_sections(
+    Show.venue_id, venue_id, Artist, Show.artist_id, 'artist',
+    request.args.get('limit', type=int)
+  ))
+  data['recommended_artists'] = load_recommendations(Venue, venue_id, 'artist')
+
+  return render_template('pages/show_venue.html', venue=data)
+
+@main.route('/venues/<int:venue_id>/conflicts', methods=['GET'])
+def venue_conflicts(venue_id):
+  # shows a booking from ?start_time= for ?duration= minutes would overlap
+  try:
+    start = parse_datetime(request.args['start_time'])
+  except (KeyError, ValueError, OverflowError):
+    abort(400)
+  duration = request.args.get('duration', current_app.config['SHOW_DEFAULT_MINUTES'], type=int)
+  if duration <= 0:
+    # an empty slot overlaps nothing, so would always look available
+    abort(400)
+  conflicts = find_conflicts(venue_id, start, start + timedelta(minutes=duration))
+  return jsonify({
+    'available': not conflicts,
+    'conflicts': [{
+      'id': show.id,
+      'artist_id': show.artist_id,
+      'start_time': show.start_time.isoformat(),
+      'end_time': show.end_time.isoformat()
+    } for show in conflicts]
+  })
+
+#  Create Venue
+#  ----------------------------------------------------------------
+@main.route('/venues/create', methods=['GET'])
+def create_venue_form():
+  form = venue_form()
+  return render_template('forms/new_venue.html', form=form)
+
+@main.route('/venues/create', methods=['POST'])
+def create_venue_submission():
+  # TODO: insert form data as a new Venue record in the db, instead
+  error = False
+  body = {}
+
+  try:
+    data = request.form
+
+    venue = Venue(
+      name=data['name'],
+      city=data['city'],
+      state=data['state'],
+      address=data['address'],
+      phone=data['phone'],
+      genres=find_genres(request.form.getlist('genres')),
+      facebook_link=data['facebook_link'],
+      image_link=data['image_link'],
+      seeking_talent=data['seeking_talent'],
+      seeking_description=data['seeking_description'],
+      site_link=data['site_link']
+    )
+
+    db.session.add(venue)
+    db.session.commit()
+  except: 
+    error = True
+    db.session.rollback()
+    current_app.logger.exception('could not create venue')
+  finally:
+    db.session.close()
+
+  # TODO: modify data to be the data object returned from db insertion
+  body = { 'success': not error }
+
+  # on successful db insert, flash success
+  # TODO: on unsuccessful db insert, flash an error instead.
+  # e.g., flash('An error occurred. Venue ' + data.name + ' could not be listed.')
+  # see: http://flask.pocoo.org/docs/1.0/patterns/flashing/
+  if error:
+    flash('an error occured creating venue ' + data['name'])
+  else:
+    flash('Venue ' + request.form['name'] + ' was successfully listed!')
+  return render_template('pages/home.html', data=body)
+
+@main.route('/venues/<venue_id>', methods=['DELETE'])
+def delete_venue(venue_id):
+  # TODO: Complete this endpoint for taking a venue_id, and using
+  # SQLAlchemy ORM to delete a record. Handle cases where the session commit could fail.
+
+  # BONUS CHALLENGE: Implement a button to delete a Venue on a Venue Page, have it so that
+  # clicking that button delete it from the db then redirect the user to the homepage
+  return None
+
+#  Artists
+#  ----------------------------------------------------------------
+@main.route('/artists')
+@conditional(listing_validator(Artist))
+def artists():
+  # TODO: replace with real data returned from querying the database
+  data = load_artists(request.args.get('genre') or None)
+  if trending():
+    data = trending_artists(data)
+
+  return render_template('pages/artists.html', artists=data)
+
+@main.route('/artists/typeahead')
+def artist_typeahead():
+  return typeahead(Artist)
+
+@main.route('/artists/search', methods=['POST'])
+def search_artists():
+  # TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
+  # seach for "A" should return "Guns N Petals", "Matt Quevado", and "The Wild Sax Band".
+  # search for "band" should return "The Wild Sax Band".
+  search_term = request.form.get('search_term', '')
+  results = search_names(Artist, search_term, request.form.get('limit', type=int))
+
+  response ={
+    "count": len(results),
+    "data": [{"id": id, "name": name} for (id, name) in results]
+  }
+  return render_template('pages/search_artists.html', results=response, search_term=search_term)
+
+@main.route('/artists/<int:artist_id>')
+@counted(Artist, 'artist_id')
+@conditional(detail_validator(Artist, Show.artist_id))
+def show_artist(artist_id):
+  # shows the venue page with the given venue_id
+  # TODO: replace with real venue data from the venues table, using venue_id
+  data = {}
+  artist = Artist.query.get(artist_id)
+  if artist is None:
+    abort(404)
+
+  data = {
+    "id": artist.id,
+    "name": artist.name,
+    "genres": [genre.name for genre in artist.genres],
+    "city": artist.city,
+    "state": artist.state,
+    "phone": artist.phone,
+    "website": artist.site_link,
+    "facebook_link": artist.facebook_link,
+    "seeking_venue": artist.seeking_venue,
+    "seeking_description": artist.seeking_description,
+    "image_link": artist.image_link,
+    "upcoming_shows_count": artist.upcoming_shows_count,
+    "past_shows_count": artist.past_shows_count
+  }
+  data.update(load_show_sections(
+    Show.artist_id, artist_id, Venue, Show.venue_id, 'venue',
+    request.args.get('limit', type=int)
+  ))
+  data['recommended_venues'] = load_recommendations(Artist, artist_id, 'venue')
+  return render_template('pages/show_artist.html', artist=data)
+
+#  Update
+#  ----------------------------------------------------------------
+@main.route('/artists/<int:artist_id>/edit', methods=['GET'])
+def edit_artist(artist_id):
+  form = artist_form()
+  artist={
+    "id": 4,
+    "name": "Guns N Petals",
+    "genres": ["Rock n Roll"],
+    "city": "San Francisco",
+    "state": "CA",
+    "phone": "326-123-5000",
+    "website": "https://www.gunsnpetalsband.com",
+    "facebook_link": "https://www.facebook.com/GunsNPetals",
+    "seeking_venue": True,
+    "seeking_description": "Looking for shows to perform at in the San Francisco Bay Area!",
+    "image_link": "https://images.unsplash.com/photo-1549213783-8284d0336c4f?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=300&q=80"
+  }
+  # TODO: populate form with fields from artist with ID <artist_id>
+  return render_template('forms/edit_artist.html', form=form, artist=artist)
+
+@main.route('/artists/<int:artist_id>/edit', methods=['POST'])
+def edit_artist_submission(artist_id):
+  # TODO: take values from the form submitted, and update existing
+  # artist record with ID <artist_id> using the new attributes
+
+  return redirect(url_for('.show_artist', artist_id=artist_id))
+
+@main.route('/venues/<int:venue_id>/edit', methods=['GET'])
+def edit_venue(venue_id):
+  form = venue_form()
+  venue={
+    "id": 1,
+    "name": "The Musical Hop",
+    "genres": ["Jazz", "Reggae", "Swing", "Classical", "Folk"],
+    "address": "1015 Folsom Street",
+    "city": "San Francisco",
+    "state": "CA",
+    "phone": "123-123-1234",
+    "website": "https://www.themusicalhop.com",
+    "facebook_link": "https://www.facebook.com/TheMusicalHop",
+    "seeking_talent": True,
+    "seeking_description": "We are on the lookout for a local artist to play every two weeks. Please call us.",
+    "image_link": "https://images.unsplash.com/photo-1543900694-133f37abaaa5?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=400&q=60"
+  }
+  # TODO: populate form with values from venue with ID <venue_id>
+  return render_template('forms/edit_venue.html', form=form, venue=venue)
+
+@main.route('/venues/<int:venue_id>/edit', methods=['POST'])
+def edit_venue_submission(venue_id):
+  # TODO: take values from the form submitted, and update existing
+  # venue record with ID <venue_id> using the new attributes
+  return redirect(url_for('.show_venue', venue_id=venue_id))
+
+#  Create Artist
+#  ----------------------------------------------------------------
+
+@main.route('/artists/create', methods=['GET'])
+def create_artist_form():
+  form = artist_form()
+  return render_template('forms/new_artist.html', form=form)
+
+@main.route('/artists/create', methods=['POST'])
+def create_artist_submission():
+  # called upon submitting the new artist listing form
+  # TODO: insert form data as a new Venue record in the db, instead
+  # TODO: modify data to be the data object returned from db insertion
+  error = False
+  body = {}
+
+  try:
+    artist=Artist(
+      name=request.form['name'],
+      city=request.form['city'],
+      state=request.form['state'],
+      phone=request.form['phone'],
+      genres=find_genres(request.form.getlist('genres')),
+      image_link=request.form['image_link'],
+      facebook_link = request.form['facebook_link'],
+      site_link = request.form['site_link']
+    )
+    db.session.add(artist)
+    db.session.commit()
+  except:
+    error = True 
+    db.session.rollback()
+    current_app.logger.exception('could not create artist')
+  finally:
+    db.session.close()
+
+  body = { 'success': not error }
+
+  # on successful db insert, flash success
+  if not error:
+    flash('Artist ' + request.form['name'] + ' was successfully listed!')
+  else:
+    flash('Error adding artist ' + request.form['name'])
+  return render_template('pages/home.html', data=body)
+
+
+#  Shows
+#  ----------------------------------------------------------------
+
+@main.route('/shows')
+def shows():
+  # displays list of shows at /shows, one page of a start_time window at a time
+  #   ?from=2020-05-01&to=2020-06-01  only shows starting in [from, to)
+  #   ?after=<cursor>                 the page following a previous one
+  try:
+    (start, end) = show_window(request.args)
+    after = request.args.get('after')
+    after = decode_cursor(after) if after else None
+  except ValueError:
+    abort(400)
+
+  page = KeysetPage(
+    load_shows(start, end, after),
+    current_app.config['SHOWS_PAGE_SIZE'],
+    format_show
+  )
+  next_args = dict((k, request.args[k]) for k in ('from', 'to') if k in request.args)
+
+  return Response(stream_with_context(
+    stream_template('pages/shows.html', shows=page, next_args=next_args)
+  ))
+
+@main.route('/shows/create')
+def create_shows():
+  # renders form. do not touch.
+  from forms import ShowForm
+  form = ShowForm()
+  return render_template('forms/new_show.html', form=form)
+
+@main.route('/shows/create', methods=['POST'])
+def create_show_submission():
+  # called to create new shows in the db, upon submitting new show listing form
+  # TODO: insert form data as a new Show record in the db, instead
+  error = False
+  conflict = None
+  body = {}
+
+  try:
+    start = parse_datetime(request.form['start_time'])
+    duration = request.form.get('duration', type=int) or current_app.config['SHOW_DEFAULT_MINUTES']
+    book_show(
+      artist_id = request.form['artist_id'],
+      venue_id = request.form['venue_id'],
+      start = start,
+      end = start + timedelta(minutes=duration),
+      capacity = request.form.get('capacity', type=int)
+    )
+  except BookingConflict as e:
+    conflict = e
+    db.session.rollback()
+  except:
+    error = True
+    db.session.rollback()
+    current_app.logger.exception('could not create show')
+  finally:
+    db.session.close()
+  
+  if conflict:
+    flash(str(conflict))
+  elif error:
+    flash('Error creating show')
+  else:
+  # on successful db insert, flash success
+    flash('Show was successfully listed!')
+
+  body['success'] = not (error or conflict)
+
+  # TODO: on unsuccessful db insert, flash an error instead.
+  # e.g., flash('An error occurred. Show could not be listed.')
+  # see: http://flask.pocoo.org/docs/1.0/patterns/flashing/
+  return render_template('pages/home.html', data=body), 409 if conflict else 200
+
+#  Tickets
+#  ----------------------------------------------------------------
+
+@main.route('/shows/<int:show_id>/tickets')
+def show_tickets(show_id):
+  available = tickets_available(show_id)
+  if available is None:
+    abort(404)
+  return jsonify({'show_id': show_id, 'available': available})
+
+@main.route('/shows/<int:show_id>/tickets', methods=['POST'])
+def reserve_show_tickets(show_id):
+  # `quantity` tickets, held for TICKET_HOLD_SECONDS until confirmed
+  quantity = request.form.get('quantity', 1, type=int)
+  if not 0 < quantity <= current_app.config['TICKETS_PER_ORDER']:
+    abort(400)
+  try:
+    (reservation_id, expires_at) = reserve_tickets(show_id, quantity)
+  except SoldOut as e:
+    if tickets_available(show_id) is None:
+      abort(404)
+    return jsonify({'error': str(e), 'available': e.available, 'largest_order': e.largest}), 409
+  return jsonify({
+    'reservation': reservation_id,
+    'quantity': quantity,
+    'expires_at': expires_at.isoformat(),
+    'confirm': url_for('main.confirm_show_reservation', reservation_id=reservation_id)
+  }), 201
+
+@main.route('/reservations/<reservation_id>/confirm', methods=['POST'])
+def confirm_show_reservation(reservation_id):
+  if not confirm_reservation(reservation_id):
+    # expired, released or never made
+    abort(410)
+  return jsonify({'reservation': reservation_id, 'status': 'confirmed'})
+
+@main.route('/reservations/<reservation_id>', methods=['DELETE'])
+def release_show_reservation(reservation_id):
+  if not release_reservation(reservation_id):
+    abort(410)
+  return '', 204
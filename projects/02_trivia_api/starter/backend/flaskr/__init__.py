@@ -7,6 +7,7 @@ import random
 import sys
 
 from models import setup_db, Question, Category
+from sqlstats import init_sqlstats
 
 QUESTIONS_PER_PAGE = 10
 
@@ -15,6 +16,7 @@ def create_app(test_config=None):
   app = Flask(__name__, instance_relative_config=True)
   db = SQLAlchemy(app)
   setup_db(app)
+  init_sqlstats(app)
 
   CORS(app, resources={r"/*/": {"origins": "*"}})
 
@@ -176,11 +178,12 @@ def create_app(test_config=None):
   '''
   @app.route('/categories/<category_id>/questions')
   def get_questions_by_category(category_id):
-    if Category.query.get(category_id) is None:
+    category = Category.query.get(category_id)
+    if category is None:
       abort(404)
       
     questions = Question.query.filter(Question.category == category_id)
-    current_category = Category.query.get(category_id).type
+    current_category = category.type
 
     questions_formatted = [{
       "id": q.id,
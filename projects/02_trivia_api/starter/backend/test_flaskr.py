@@ -5,6 +5,7 @@ from flask_sqlalchemy import SQLAlchemy
 
 from flaskr import create_app
 from models import setup_db, Question, Category
+from sqlstats import capture, query_budget
 
 TEST_QUESTIONS = [
     {
@@ -239,6 +240,26 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(data["question"]["id"], 22)
         self.assertFalse(data["question"]["id"] in previous_questions)
 
+    ## QUERY COUNTS
+    def test_paginated_questions_query_count(self):
+        with capture() as stats:
+            res = self.client().get('/questions?page=1')
+        self.assertEqual(res.status_code, 200)
+        # every question, then every category
+        self.assertEqual(stats.count, 2, stats.describe())
+
+    def test_questionsbycategory_query_count(self):
+        with capture() as stats:
+            res = self.client().get('/categories/1/questions')
+        self.assertEqual(res.status_code, 200)
+        # the category, then its questions
+        self.assertEqual(stats.count, 2, stats.describe())
+
+    def test_query_budget_fails_over_budget(self):
+        with self.assertRaises(AssertionError):
+            with query_budget(1):
+                self.client().get('/questions?page=1')
+
     # ## SHOULD FAIL
 
     def test_addquestion_400(self):